@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+*********************
+The kinematics module
+*********************
+
+This module extracts the behavioural state of the specimen while it is being tracked.
+Unlike the functions of video_analysis, which work on the whole trajectory after the tracking,
+OnlineKinematics is updated with each new position and keeps only a rolling window of the
+last positions. The speed, acceleration, turning rate, immobility bouts and proximity to the
+wall of the arena are thus available at any time, in constant memory and for a constant cost per frame.
+
+Use as follows:
+
+>>> kinematics = OnlineKinematics(window=5, immobility_speed=10, immobility_min_duration=1)
+>>> kinematics.add_callback(lambda k: stimulate() if 'immobility_start' in k.events else None)
+>>> tracker = Tracker(..., kinematics=kinematics)
+>>> tracker.track()
+>>> kinematics.get_state()
+"""
+from __future__ import division
+
+import math
+from collections import deque, OrderedDict
+
+from pyper.exceptions.exceptions import PyperValueError
+
+EVENTS = ('immobility_start', 'immobility_end', 'wall_enter', 'wall_exit')
+
+
+class OnlineKinematics(object):
+    """
+    The kinematics of the specimen over a rolling window of positions.
+    Frames where the specimen was not found are skipped (the next step spans the gap).
+
+    The attributes (updated with each position) are:
+
+        * speed: the mean speed (pixels/s) over the window
+        * acceleration: the change of speed (pixels/s^2) since the previous position
+        * turning_rate: the mean absolute change of heading (radians/s) over the window
+        * is_immobile: whether the speed has stayed below immobility_speed for immobility_min_duration
+        * n_immobility_bouts, immobility_time: the number and the total duration (s) of the immobility bouts
+        * wall_distance: the distance to the border of the arena (NaN if no arena)
+        * is_near_wall, wall_time: whether the specimen is within near_wall_distance of the border \
+        and the total time (s) spent there (thigmotaxis)
+        * events: the EVENTS that occurred with the last position
+    """
+    def __init__(self, window=5, immobility_speed=5., immobility_min_duration=1., near_wall_distance=20.):
+        """
+        :param int window: The number of positions (at least 3) to average the speed and turning rate over
+        :param float immobility_speed: The speed (pixels/s) below which the specimen is considered still
+        :param float immobility_min_duration: The time (s) the specimen has to be still for an immobility bout
+        :param float near_wall_distance: The distance (pixels) to the border of the arena under which \
+        the specimen is considered along the wall
+        """
+        if window < 3:
+            raise PyperValueError('window must be at least 3, got {}'.format(window))
+        self.window = window
+        self.immobility_speed = immobility_speed
+        self.immobility_min_duration = immobility_min_duration
+        self.near_wall_distance = near_wall_distance
+        self.callbacks = []
+        self.reset()
+
+    def reset(self):
+        self._positions = deque(maxlen=self.window)
+        self._times = deque(maxlen=self.window)
+        self._steps = deque(maxlen=self.window - 1)  # The length of the steps between the positions
+        self._turns = deque(maxlen=self.window - 2)  # The absolute change of heading at each position
+        self._path_length = 0.  # The sum of self._steps
+        self._total_turn = 0.  # The sum of self._turns
+        self._last_heading = None
+        self._still_since = None
+
+        self.n_positions = 0
+        self.start_time = None
+        self.time = None
+        self.speed = float('NaN')
+        self.acceleration = float('NaN')
+        self.turning_rate = float('NaN')
+        self.is_immobile = False
+        self.n_immobility_bouts = 0
+        self.immobility_time = 0.
+        self.wall_distance = float('NaN')
+        self.is_near_wall = False
+        self.wall_time = 0.
+        self.events = []
+
+    def add_callback(self, callback):
+        """
+        :param callback: A function called with this object after each position (e.g. to trigger a \
+        stimulus on self.events)
+        """
+        self.callbacks.append(callback)
+
+    @staticmethod
+    def _push(deck, values, value):
+        """
+        Appends value to the bounded deque deck and returns the updated running sum
+        """
+        if len(deck) == deck.maxlen:
+            values -= deck[0]
+        deck.append(value)
+        return values + value
+
+    def _update_motion(self, position, time):
+        last_position = self._positions[-1]
+        dx, dy = position[0] - last_position[0], position[1] - last_position[1]
+        step = math.hypot(dx, dy)
+        self._path_length = self._push(self._steps, self._path_length, step)
+        if step > 0:
+            heading = math.atan2(dy, dx)
+            if self._last_heading is not None:
+                turn = abs((heading - self._last_heading + math.pi) % (2 * math.pi) - math.pi)
+                self._total_turn = self._push(self._turns, self._total_turn, turn)
+            self._last_heading = heading
+        self._positions.append(position)
+        self._times.append(time)
+
+        duration = self._times[-1] - self._times[0]
+        if duration <= 0:
+            return
+        previous_speed = self.speed
+        self.speed = self._path_length / duration
+        step_duration = self._times[-1] - self._times[-2]
+        if not math.isnan(previous_speed) and step_duration > 0:
+            self.acceleration = (self.speed - previous_speed) / step_duration
+        if self._turns:
+            self.turning_rate = self._total_turn / duration
+
+    def _update_immobility(self, time, elapsed):
+        if self.speed < self.immobility_speed:
+            if self._still_since is None:
+                self._still_since = self._times[-2] if len(self._times) > 1 else time
+            if not self.is_immobile and time - self._still_since >= self.immobility_min_duration:
+                self.is_immobile = True
+                self.n_immobility_bouts += 1
+                self.immobility_time += time - self._still_since
+                self.events.append('immobility_start')
+            elif self.is_immobile:
+                self.immobility_time += elapsed
+        else:
+            self._still_since = None
+            if self.is_immobile:
+                self.is_immobile = False
+                self.events.append('immobility_end')
+
+    def _update_wall(self, wall_distance, elapsed):
+        self.wall_distance = wall_distance
+        if wall_distance is None or math.isnan(wall_distance):
+            self.wall_distance = float('NaN')
+            return
+        if self.is_near_wall:
+            self.wall_time += elapsed
+        is_near_wall = wall_distance < self.near_wall_distance
+        if is_near_wall != self.is_near_wall:
+            self.events.append('wall_enter' if is_near_wall else 'wall_exit')
+        self.is_near_wall = is_near_wall
+
+    def add(self, position, time, wall_distance=None):
+        """
+        Updates the kinematics with a new position
+
+        :param tuple position: The (x, y) position of the specimen
+        :param float time: The time (s) of the position. The tracker uses the time of the frame in the video \
+        for recordings and the capture time for live streams (see Tracker._get_frame_time)
+        :param float wall_distance: The distance to the border of the arena (e.g. the second value of \
+        TrackingResults.distances_from_arena)
+        """
+        self.events = []
+        elapsed = 0. if self.time is None else time - self.time
+        if self._positions:
+            self._update_motion(position, time)
+            if not math.isnan(self.speed):
+                self._update_immobility(time, elapsed)
+        else:
+            self._positions.append(position)
+            self._times.append(time)
+        self._update_wall(wall_distance, elapsed)
+        if self.start_time is None:
+            self.start_time = time
+        self.time = time
+        self.n_positions += 1
+        for callback in self.callbacks:
+            callback(self)
+
+    @property
+    def wall_fraction(self):
+        """The fraction of the time spent along the wall (thigmotaxis index)"""
+        duration = 0. if self.time is None else self.time - self.start_time
+        return self.wall_time / duration if duration > 0 else 0.
+
+    def get_state(self):
+        """
+        :return: A dictionary of the current values
+        """
+        return OrderedDict((('time', self.time), ('speed', self.speed), ('acceleration', self.acceleration),
+                            ('turning_rate', self.turning_rate), ('is_immobile', self.is_immobile),
+                            ('n_immobility_bouts', self.n_immobility_bouts), ('immobility_time', self.immobility_time),
+                            ('wall_distance', self.wall_distance), ('is_near_wall', self.is_near_wall),
+                            ('wall_time', self.wall_time), ('wall_fraction', self.wall_fraction)))
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+********************
+The occupancy module
+********************
+
+This module builds the spatial occupancy map of the specimen while it is being tracked.
+Each new position increments a single bin of a 2D histogram, so that the map is available
+at any time (e.g. live in the GUI) for a constant cost per frame instead of a pass over
+the whole trajectory after the tracking.
+
+Use as follows:
+
+>>> occupancy = OccupancyMap(bin_size=10, weighting='time')
+>>> tracker.results.set_occupancy(occupancy)
+>>> tracker.track()
+>>> occupancy.get_map()  # (n_rows, n_cols) array
+"""
+from __future__ import division
+
+import math
+
+import numpy as np
+
+from pyper.exceptions.exceptions import PyperValueError
+
+WEIGHTINGS = ('frames', 'time', 'speed')
+
+
+class OccupancyMap(object):
+    """
+    A 2D histogram of the positions accumulated one position at a time.
+    The histogram grows (by doubling) when a position falls beyond its current extent,
+    so the frame size does not need to be known in advance.
+    """
+    def __init__(self, bin_size=10, weighting='frames', shape=None):
+        """
+        :param int bin_size: The side of the (square) bins in pixels
+        :param str weighting: What each position adds to its bin. One of WEIGHTINGS \
+        ('frames': 1, 'time': the time (s) spent at the position, i.e. until the next position, \
+        'speed': the speed (pixels/s) since the previous position)
+        :param tuple shape: The (height, width) of the frames if known (to allocate the histogram once)
+        """
+        if bin_size <= 0:
+            raise PyperValueError('bin_size must be positive, got {}'.format(bin_size))
+        if weighting not in WEIGHTINGS:
+            raise PyperValueError('Expected one of {} for weighting, got: {}'.format(WEIGHTINGS, weighting))
+        self.bin_size = bin_size
+        self.weighting = weighting
+        self.shape = None if shape is None else tuple(shape)
+        self.reset()
+
+    def reset(self):
+        if self.shape is None:
+            self.histogram = np.zeros((1, 1), dtype=np.float64)
+        else:
+            self.histogram = np.zeros(self._get_n_bins(self.shape), dtype=np.float64)
+        self.n_positions = 0
+        self._extent = (0, 0)  # The number of (rows, cols) reached by the positions
+        self._last_position = None
+        self._last_bin = None
+        self._last_time = None
+
+    def _get_n_bins(self, shape):
+        height, width = shape
+        return int(math.ceil(height / self.bin_size)), int(math.ceil(width / self.bin_size))
+
+    def _grow(self, row, col):
+        n_rows, n_cols = self.histogram.shape
+        new_shape = (max(n_rows, 2 ** int(math.ceil(math.log(row + 1, 2)))) if row >= n_rows else n_rows,
+                     max(n_cols, 2 ** int(math.ceil(math.log(col + 1, 2)))) if col >= n_cols else n_cols)
+        histogram = np.zeros(new_shape, dtype=np.float64)
+        histogram[:n_rows, :n_cols] = self.histogram
+        self.histogram = histogram
+
+    def _get_duration(self, time):
+        if self._last_time is None or time is None:
+            return 0.
+        return time - self._last_time
+
+    def _get_weight(self, position, time):
+        if self.weighting == 'frames':
+            return 1.
+        elif self.weighting == 'time':
+            return 0.  # Only known at the next position (see add)
+        duration = self._get_duration(time)
+        if duration <= 0:
+            return 0.
+        return math.hypot(position[0] - self._last_position[0], position[1] - self._last_position[1]) / duration
+
+    def add(self, position, time=None):
+        """
+        Adds one position to the map
+
+        :param tuple position: The (x, y) position
+        :param float time: The time (s) of the position (required for the 'time' and 'speed' weightings)
+        """
+        x, y = position
+        if x < 0 or y < 0:
+            return
+        row, col = int(y // self.bin_size), int(x // self.bin_size)
+        if self.shape is not None:
+            max_rows, max_cols = self._get_n_bins(self.shape)
+            if row >= max_rows or col >= max_cols:
+                return  # Outside of the frame
+        if row >= self.histogram.shape[0] or col >= self.histogram.shape[1]:
+            self._grow(row, col)
+        if self.weighting == 'time' and self._last_bin is not None:  # The time spent at the previous position
+            self.histogram[self._last_bin] += self._get_duration(time)
+        self.histogram[row, col] += self._get_weight(position, time)
+        self.n_positions += 1
+        self._extent = (max(self._extent[0], row + 1), max(self._extent[1], col + 1))
+        self._last_position = position
+        self._last_bin = (row, col)
+        self._last_time = time
+
+    def get_map(self, shape=None, normalise=False):
+        """
+        :param tuple shape: The (height, width) of the frames to crop (or pad) the map to \
+        (defaults to self.shape or the extent of the positions)
+        :param bool normalise: Whether to divide by the sum (to get a probability map)
+        :return: A copy of the histogram of shape (n_rows, n_cols)
+        """
+        shape = self.shape if shape is None else shape
+        if shape is None:
+            n_bins = (max(self._extent[0], 1), max(self._extent[1], 1))
+        else:
+            n_bins = self._get_n_bins(shape)
+        occupancy = np.zeros(n_bins, dtype=np.float64)
+        n_rows, n_cols = min(n_bins[0], self.histogram.shape[0]), min(n_bins[1], self.histogram.shape[1])
+        occupancy[:n_rows, :n_cols] = self.histogram[:n_rows, :n_cols]
+        if normalise:
+            total = occupancy.sum()
+            if total:
+                occupancy /= total
+        return occupancy
+
+    def save(self, dest_path):
+        """
+        Saves the map (see get_map) as a numpy .npy file
+
+        :param str dest_path: The destination file path
+        """
+        np.save(dest_path, self.get_map())
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+***********************
+The roi_analysis module
+***********************
+
+This module scores a trajectory against regions of interest after the tracking.
+Given the positions of the specimen and a RoiCollection, it computes, for every ROI at once,
+the membership of each frame, the entries and exits, the latency to the first entry,
+the duration of each bout and the total dwell time.
+Everything is vectorised over the whole trajectory so that new ROIs can be scored on long
+recordings without re-tracking.
+
+Use as follows:
+
+>>> rois = RoiCollection([Circle((250, 350), 25), Rectangle(0, 0, 100, 100)])
+>>> analysis = RoiAnalysis(tracker.results.positions, rois, fps=30)
+>>> analysis.membership  # (n_frames, n_rois) boolean array
+>>> analysis.get_stats(0).to_dict()
+"""
+from __future__ import division
+
+import numpy as np
+
+from pyper.contours.roi import Roi, RoiCollection
+from pyper.exceptions.exceptions import PyperValueError
+
+DEFAULT_POS = (-1, -1)
+
+
+def has_analytic_membership(roi):
+    """
+    Whether the ROI class implements its own vectorised contains_points (e.g. Circle, Rectangle, Ellipse)
+    """
+    return type(roi).contains_points is not Roi.contains_points
+
+
+def get_membership(positions, rois, shape=None, default_pos=DEFAULT_POS, fill_missing=False):
+    """
+    Whether the specimen is in each ROI at each frame
+
+    :param positions: The (x, y) position of the specimen for each frame
+    :param RoiCollection rois: The ROIs
+    :param tuple shape: The (height, width) of the frames, used to rasterise the ROIs without \
+    analytic membership (e.g. FreehandRoi). Defaults to the extent of the trajectory.
+    :param tuple default_pos: The position of the frames where the specimen was not found
+    :param bool fill_missing: Whether the frames where the specimen was not found take the membership \
+    of the last frame where it was found (they are considered outside of all the ROIs otherwise)
+    :return: A boolean array of shape (n_frames, n_rois)
+    """
+    if not isinstance(rois, RoiCollection):
+        rois = RoiCollection(list(rois))
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    found = (positions != default_pos).any(axis=1)
+    membership = np.zeros((len(positions), len(rois)), dtype=bool)
+    found_positions = positions[found]
+    if not len(found_positions):
+        return membership
+
+    rasterised_idx = [i for i, roi in enumerate(rois) if not has_analytic_membership(roi)]
+    if rasterised_idx:
+        if shape is None:
+            shape = (int(found_positions[:, 1].max()) + 2, int(found_positions[:, 0].max()) + 2)
+        index = RoiCollection([rois[i] for i in rasterised_idx]).get_index(shape)
+        membership[np.ix_(found, rasterised_idx)] = index.contains_points(found_positions)
+    for i, roi in enumerate(rois):
+        if has_analytic_membership(roi):
+            membership[found, i] = roi.contains_points(found_positions)
+
+    if fill_missing:
+        last_found_idx = np.maximum.accumulate(np.where(found, np.arange(len(found)), -1))
+        valid = last_found_idx >= 0
+        membership[valid] = membership[last_found_idx[valid]]
+    return membership
+
+
+def get_bouts(in_roi):
+    """
+    The contiguous runs of frames in the ROI
+
+    :param in_roi: The boolean membership of each frame
+    :return: (starts, ends) The first frame of each bout and the frame after its last frame
+    """
+    padded = np.concatenate(([0], np.asarray(in_roi, dtype=np.int8), [0]))
+    changes = np.diff(padded)
+    return np.flatnonzero(changes == 1), np.flatnonzero(changes == -1)
+
+
+class RoiStats(object):
+    """
+    The occupancy of one ROI (the times are in seconds from the first frame)
+    """
+    def __init__(self, in_roi, fps):
+        """
+        :param in_roi: The boolean membership of each frame
+        :param float fps: The frame rate of the trajectory
+        """
+        self.n_frames = len(in_roi)
+        self.fps = fps
+        self.starts, self.ends = get_bouts(in_roi)
+        self.bout_durations = (self.ends - self.starts) / fps
+        self.n_frames_in = int(self.ends.sum() - self.starts.sum())
+
+    @property
+    def n_entries(self):
+        """The number of entries (a trajectory starting in the ROI counts as an entry)"""
+        return len(self.starts)
+
+    @property
+    def entry_times(self):
+        return self.starts / self.fps
+
+    @property
+    def exit_times(self):
+        """The exits (the end of a trajectory in the ROI is not an exit)"""
+        return self.ends[self.ends < self.n_frames] / self.fps
+
+    @property
+    def latency(self):
+        """The time of the first entry (NaN if never entered)"""
+        return self.starts[0] / self.fps if len(self.starts) else float('NaN')
+
+    @property
+    def dwell_time(self):
+        return self.n_frames_in / self.fps
+
+    @property
+    def occupancy(self):
+        """The fraction of the frames in the ROI"""
+        return self.n_frames_in / self.n_frames if self.n_frames else 0.
+
+    @property
+    def mean_bout_duration(self):
+        return self.bout_durations.mean() if len(self.bout_durations) else 0.
+
+    def to_dict(self):
+        return {'n_entries': self.n_entries, 'latency': self.latency, 'dwell_time': self.dwell_time,
+                'occupancy': self.occupancy, 'mean_bout_duration': self.mean_bout_duration,
+                'max_bout_duration': self.bout_durations.max() if len(self.bout_durations) else 0.}
+
+
+class RoiAnalysis(object):
+    """
+    The occupancy of every ROI of a RoiCollection by a trajectory
+    """
+    def __init__(self, positions, rois, fps, shape=None, default_pos=DEFAULT_POS, fill_missing=False):
+        """
+        :param positions: The (x, y) position of the specimen for each frame (e.g. TrackingResults.positions)
+        :param RoiCollection rois: The ROIs to score
+        :param float fps: The frame rate of the trajectory
+
+        For the other parameters, see get_membership
+        """
+        if fps <= 0:
+            raise PyperValueError('fps must be positive, got {}'.format(fps))
+        self.rois = rois
+        self.fps = fps
+        self.membership = get_membership(positions, rois, shape, default_pos, fill_missing)
+        self._stats = [None] * self.membership.shape[1]
+
+    def get_stats(self, roi_idx):
+        """
+        :param int roi_idx: The index of the ROI in the collection
+        :rtype: RoiStats
+        """
+        if self._stats[roi_idx] is None:
+            self._stats[roi_idx] = RoiStats(self.membership[:, roi_idx], self.fps)
+        return self._stats[roi_idx]
+
+    def get_events(self):
+        """
+        The entries and exits of all the ROIs in chronological order
+
+        :return: A list of (frame_idx, roi_idx, event) with event one of ('entry', 'exit')
+        """
+        events = []
+        for roi_idx in range(self.membership.shape[1]):
+            stats = self.get_stats(roi_idx)
+            events.extend((int(frame_idx), roi_idx, 'entry') for frame_idx in stats.starts)
+            events.extend((int(frame_idx), roi_idx, 'exit')
+                          for frame_idx in stats.ends if frame_idx < stats.n_frames)
+        return sorted(events)
+
+    def get_summary(self):
+        """
+        :return: The list of the statistics (dictionaries) of each ROI
+        """
+        return [self.get_stats(i).to_dict() for i in range(self.membership.shape[1])]
@@ -13,12 +13,10 @@ is limited in this module.
 from __future__ import division
 
 import math
-import matplotlib.cm as cm
 import numpy as np
 import numpy.linalg as la
-from matplotlib import pyplot as plt
-from scipy.integrate import cumtrapz
-from scipy.ndimage.filters import gaussian_filter
+
+# matplotlib and scipy are imported in the functions that use them (slow imports)
 
 
 def vectors_to_angle(v1, v2):
@@ -57,6 +55,8 @@ def plot_track(positions, background_img):
     Plots the trajectory of the specimen from positions onto background_img
     Positions is a list of (x,y) coordinates pairs
     """
+    import matplotlib.cm as cm
+    from matplotlib import pyplot as plt
     plt.imshow(background_img, cmap=cm.Greys_r)
     
     xs = [p[0] for p in positions]
@@ -100,6 +100,7 @@ def read_positions(src_file_path):
 
 def filter_positions(positions, kernel):
     """Gaussian smoothes the positions using the supplied kernel"""
+    from scipy.ndimage import gaussian_filter
     xs = gaussian_filter([p[0] for p in positions], kernel)
     ys = gaussian_filter([p[1] for p in positions], kernel)
     positions = np.array(zip(xs, ys))
@@ -140,6 +141,7 @@ def plot_angles(angles, sampling_freq):
     :param angles:
     :param sampling_freq:
     """
+    from matplotlib import pyplot as plt
     x_vect = np.array(range(len(angles))) / sampling_freq
     zero_line = np.zeros(len(angles))
     plt.plot(x_vect, angles, linewidth=0.1)
@@ -157,6 +159,7 @@ def plot_distances(distances, sampling_freq):
     :param distances:
     :param sampling_freq:
     """
+    from matplotlib import pyplot as plt
     x_vect = np.array(range(len(distances))) / sampling_freq
     plt.ylim([0, 10])
     plt.ylabel('distance (pixels)')
@@ -181,6 +184,8 @@ def plot_integrals(angles, sampling_freq):
     :param angles:
     :param sampling_freq:
     """
+    from matplotlib import pyplot as plt
+    from scipy.integrate import cumtrapz
     angles_left = [get_positive(a) for a in angles]
     angles_right = [get_negative(a) for a in angles]
     left_turn_integral = cumtrapz(angles_left, dx=(1 / sampling_freq), axis=0)
@@ -1,13 +1,16 @@
 import numpy as np
 import os
 import platform
-from scipy import misc
+import hashlib
+from multiprocessing import Pool
 
 import cv2
 
+from pyper.contours.roi import FreehandRoi
 from pyper.exceptions.exceptions import CameraCalibrationException
 
 is_pi = (platform.machine()).startswith('arm')
+CALIBRATION_MODES = ('frame', 'points')  # Whether to undistort the full frames or only the tracked coordinates
 """
 Inspired by:
 http://opencv-python-tutroals.readthedocs.org/en/latest/py_tutorials/py_calib3d/py_calibration/py_calibration.html
@@ -28,6 +31,8 @@ class CameraCalibration(object):
     """
     
     VALID_IMAGE_TYPES = ('.png', '.jpg', '.jpeg', '.ppm', '.tiff', '.tif', '.bmp')
+    CORNERS_CACHE_NAME = '.pyper_corners_cache.npz'
+    IMG_SIZE_SUFFIX = '_img_size'  # The cache key of the size of an image is its corners key with this suffix
     INTERP_METHOD = cv2.INTER_NEAREST if is_pi else cv2.INTER_LINEAR
     
     def __init__(self, chess_width, chess_height):
@@ -38,6 +43,9 @@ class CameraCalibration(object):
         self.chess_width = chess_width
         self.chess_height = chess_height
         self.criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)  # termination criteria
+        self.src_imgs = []  # The images of the calibration (empty for a calibration loaded from a bundle)
+        self.detected_imgs = []
+        self.corrected_imgs = []
 
     @staticmethod
     def _get_ext(path):
@@ -50,61 +58,110 @@ class CameraCalibration(object):
 
     def get_images(self, src_folder):
         """
-        Load the images from the given folder. This function will load all images that are of
-        VALID_IMAGE_TYPES in the the folder.
+        List the images from the given folder. This function will select all images that are of
+        VALID_IMAGE_TYPES in the the folder. The images are only read from disk when accessed.
         
         :param string src_folder: The source folder where the images are stored
         """
         files = os.listdir(src_folder)
         images_names = sorted([f for f in files if self._get_ext(f) in CameraCalibration.VALID_IMAGE_TYPES])
-        imgs = []
-        img_paths = []
-        for fname in images_names:
-            img_path = os.path.join(src_folder, fname)
-            imgs.append(misc.imread(img_path))
-            img_paths.append(img_path)
-        if len(imgs) == 0:
+        img_paths = [os.path.join(src_folder, fname) for fname in images_names]
+        if len(img_paths) == 0:
             raise IOError("No images found in folder {}. Please check you path".format(src_folder))
         self.img_paths = img_paths
-        self.imgs = imgs
+        self.imgs = LazyImageList(img_paths, read_image)
 
-    def get_calibration_params(self, src_folder, return_imgs=False, sub_pixel=False):
+    def _get_cache_key(self, img_hash, sub_pixel):
+        return '{}_{}x{}_{}'.format(img_hash, self.chess_width, self.chess_height, int(sub_pixel))
+
+    def detect_corners(self, img_paths, sub_pixel=False, n_workers=None, cache_path=None):
+        """
+        Detects the chessboard corners in each image. The detection runs across a pool of processes
+        and the results are cached (in cache_path) by image file content so that only new or
+        modified images are processed the next time.
+
+        :param list img_paths: The paths of the images to process
+        :param bool sub_pixel: Use subpixel accuracy
+        :param int n_workers: The number of processes (defaults to the number of CPUs)
+        :param str cache_path: The .npz file to store the detected corners (no cache if None)
+        :return: (corners, img_size) where corners has one entry per image (None if no corners were found \
+        or if the image is not of size img_size). img_size is the size of the first image with corners.
+        """
+        cache = load_corners_cache(cache_path)
+        keys = [self._get_cache_key(hash_file(path), sub_pixel) for path in img_paths]
+        size_keys = [key + CameraCalibration.IMG_SIZE_SUFFIX for key in keys]
+        is_missing = [key not in cache or size_key not in cache for key, size_key in zip(keys, size_keys)]
+        missing = [(path, (self.chess_width, self.chess_height), sub_pixel, self.criteria)
+                   for path, missing_img in zip(img_paths, is_missing) if missing_img]
+        if missing:
+            if n_workers == 1 or len(missing) == 1:
+                detections = [_find_corners(args) for args in missing]
+            else:
+                pool = Pool(n_workers)
+                try:
+                    detections = pool.map(_find_corners, missing)
+                finally:
+                    pool.close()
+                    pool.join()
+            missing_keys = [(key, size_key) for key, size_key, missing_img in zip(keys, size_keys, is_missing)
+                            if missing_img]
+            for (key, size_key), (img_corners, size) in zip(missing_keys, detections):
+                cache[key] = img_corners
+                cache[size_key] = np.array(size)
+            if cache_path is not None:
+                try:
+                    np.savez_compressed(cache_path, **cache)
+                except IOError as err:  # e.g. read only folder, the cache is only an optimisation
+                    print('Could not save corners cache to {}: {}'.format(cache_path, err))
+        corners = [cache[key] if cache[key].size else None for key in keys]
+        img_sizes = [tuple(int(length) for length in cache[size_key]) for size_key in size_keys]
+        with_corners = [size for size, img_corners in zip(img_sizes, corners) if img_corners is not None]
+        img_size = with_corners[0] if with_corners else (img_sizes[0] if img_sizes else None)
+        for i, (path, size) in enumerate(zip(img_paths, img_sizes)):
+            if size != img_size and corners[i] is not None:
+                print('Image {}, size {} does not match the calibration size {}, skipped'.format(path, size, img_size))
+                corners[i] = None
+        return corners, img_size
+
+    def get_calibration_params(self, src_folder, return_imgs=False, sub_pixel=False, n_workers=None):
         """Compute the camera matrix, optimised camera matrix and distortion coefficients"""
         
         # prepare object points, like (0,0,0), (1,0,0), (2,0,0) ....,(6,5,0)
         n_corners = self.chess_width * self.chess_height
         objp = np.zeros((n_corners, 3), np.float32)
         objp[:, :2] = np.mgrid[:self.chess_width, :self.chess_height].T.reshape(-1, 2)
-        
-        # Arrays to store object points and image points from all the images.
-        obj_points = []  # 3d point in real world space
-        img_points = []  # 2d points in image plane.
-
-        src_imgs = []  # The list of images where corners were found
-        detected_imgs = []  # The list of images with the corners drawn
 
         self.get_images(src_folder)
-        original_images = [img.copy() for img in self.imgs]  # copy the list because openCV modifies in place
-        for img, img_path in zip(original_images, self.img_paths):
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            found, corners = cv2.findChessboardCorners(gray, (self.chess_width, self.chess_height))
-            if found:
+        cache_path = os.path.join(src_folder, CameraCalibration.CORNERS_CACHE_NAME)
+        corners, img_size = self.detect_corners(self.img_paths, sub_pixel, n_workers, cache_path)
+
+        found_paths = []
+        img_points = []  # 2d points in image plane.
+        for img_path, img_corners in zip(self.img_paths, corners):
+            if img_corners is not None:
                 print('Image {}, corners found'.format(img_path))
-                obj_points.append(objp)
-                if sub_pixel:
-                    corners = cv2.cornerSubPix(gray, corners, (11,11), (-1,-1), self.criteria)
-                img_points.append(corners)
-                src_imgs.append(img.copy())
-                cv2.drawChessboardCorners(img, (self.chess_width, self.chess_height), corners, found)
-                detected_imgs.append(img)
+                found_paths.append(img_path)
+                img_points.append(img_corners)
             else:
                 print('Image {}, no corners found'.format(img_path))
-        calibration_results = cv2.calibrateCamera(obj_points, img_points, gray.shape[::-1])
+        if not img_points:
+            raise CameraCalibrationException("Calibration failed, no corners found")
+        obj_points = [objp] * len(img_points)  # 3d point in real world space
+        calibration_results = cv2.calibrateCamera(obj_points, img_points, img_size, None, None)
         flag = calibration_results[0]
         if not flag:
             raise CameraCalibrationException("Calibration failed")
+
+        src_imgs = LazyImageList(found_paths, read_image)  # The list of images where corners were found
+        detected_imgs = LazyImageList(list(zip(found_paths, img_points)), self._draw_corners)  # With the corners drawn
         return calibration_results, src_imgs, detected_imgs
 
+    def _draw_corners(self, path_and_corners):
+        img_path, corners = path_and_corners
+        img = read_image(img_path)
+        cv2.drawChessboardCorners(img, (self.chess_width, self.chess_height), corners, True)
+        return img
+
     def optimise_matrix(self, img):
         """        
         :param img: The source image to take as reference
@@ -114,7 +171,7 @@ class CameraCalibration(object):
         self.optimal_camera_matrix = optimal_camera_matrix
         return optimal_camera_matrix
     
-    def calibrate(self, src_folder, sub_pixel=False):
+    def calibrate(self, src_folder, sub_pixel=False, n_workers=None):
         """
         Computes the camera matrix from the images in the source folder supplied as argument
         The arrangement of the internal corners in the image are determined by chessWidth and chessHeight
@@ -123,9 +180,12 @@ class CameraCalibration(object):
         :param int chess_width: The width of the internal chessboard pattern (minus the outer band)
         :param int chess_height: The height of the internal chessboard pattern (minus the outer band)
         :param bool sub_pixel: Use subpixel accuracy
+        :param int n_workers: The number of processes used to detect the corners (defaults to the number of CPUs)
         """
 
-        calibration_results, src_imgs, detected_imgs = self.get_calibration_params(src_folder, return_imgs=True)
+        calibration_results, src_imgs, detected_imgs = self.get_calibration_params(src_folder, return_imgs=True,
+                                                                                    sub_pixel=sub_pixel,
+                                                                                    n_workers=n_workers)
         flag, camera_matrix, distortion_coeffs, rvecs, tvecs = calibration_results
         self.camera_matrix = camera_matrix
         self.distortion_coeffs = distortion_coeffs
@@ -154,11 +214,41 @@ class CameraCalibration(object):
 
     def correct_imgs(self, imgs_list):
         """
-        Corrects distortion on a complete list of images
+        Corrects distortion on a complete list of images.
+        The correction of each image is only computed when the image is accessed.
         
         :param imgs_list: The list of images to correct
         """
-        return [self.remap(img) for img in imgs_list]
+        return LazyImageList(imgs_list, self.remap)
+
+    def save(self, dest_path):
+        """
+        Saves the calibration (matrices, distortion coefficients and maps) to a single .npz bundle
+        that can be reloaded with CameraCalibration.load() without recalibrating
+
+        :param str dest_path: The path of the bundle
+        """
+        np.savez(dest_path, chess_size=np.array((self.chess_width, self.chess_height)),
+                 camera_matrix=self.camera_matrix, distortion_coeffs=self.distortion_coeffs,
+                 optimal_camera_matrix=self.optimal_camera_matrix, map_x=self.map_x, map_y=self.map_y)
+
+    @staticmethod
+    def load(src_path):
+        """
+        Loads a calibration bundle saved with CameraCalibration.save()
+        The images of the calibration are not saved, so the image lists of the loaded calibration are empty
+
+        :param str src_path: The path of the bundle
+        :rtype: CameraCalibration
+        """
+        try:
+            with np.load(src_path) as bundle:
+                calib = CameraCalibration(*bundle['chess_size'])
+                for name in ('camera_matrix', 'distortion_coeffs', 'optimal_camera_matrix', 'map_x', 'map_y'):
+                    setattr(calib, name, bundle[name])
+        except (IOError, KeyError, ValueError) as err:
+            raise CameraCalibrationException("Could not load calibration from {}: {}".format(src_path, err))
+        return calib
 
     def in_place_remap(self, frame):
         """
@@ -178,3 +268,162 @@ class CameraCalibration(object):
         :returns: The undistorted image
         """
         return cv2.remap(frame.copy(), self.map_x, self.map_y, CameraCalibration.INTERP_METHOD)
+
+    def undistort_points(self, points):
+        """
+        Converts coordinates from the source (distorted) image to the corrected image (as returned by remap())
+
+        :param points: The (x, y) points to convert (array like of shape (n, 2) or OpenCV contour)
+        :returns: The corrected points as an array of shape (n, 2)
+        """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 1, 2)
+        undistorted = cv2.undistortPoints(points, self.camera_matrix, self.distortion_coeffs,
+                                          P=self.optimal_camera_matrix)
+        return undistorted.reshape(-1, 2)
+
+    def distort_points(self, points):
+        """
+        Converts coordinates from the corrected image (as returned by remap()) to the source (distorted) image.
+        This is the inverse of undistort_points()
+
+        :param points: The (x, y) points to convert (array like of shape (n, 2) or OpenCV contour)
+        :returns: The distorted points as an array of shape (n, 2)
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        homogeneous_points = np.column_stack((points, np.ones(len(points))))
+        normalised_points = homogeneous_points.dot(np.linalg.inv(self.optimal_camera_matrix).T)
+        distorted, _ = cv2.projectPoints(normalised_points.reshape(-1, 1, 3), np.zeros(3), np.zeros(3),
+                                         self.camera_matrix, self.distortion_coeffs)
+        return distorted.reshape(-1, 2)
+
+    def distort_roi(self, roi, max_step=2):
+        """
+        Converts an ROI drawn on the corrected image to the source (distorted) image.
+        The outline is resampled first because straight edges become curves.
+
+        :param Roi roi: The roi to convert
+        :param float max_step: The maximum distance in pixels between consecutive points of the outline
+        :rtype: FreehandRoi
+        """
+        points = self.distort_points(densify_polygon(roi.points.reshape(-1, 2), max_step))
+        return FreehandRoi(np.round(points))
+
+    def undistort_roi(self, roi, max_step=2):
+        """
+        Converts an ROI from the source (distorted) image to the corrected image.
+
+        :param Roi roi: The roi to convert
+        :param float max_step: The maximum distance in pixels between consecutive points of the outline
+        :rtype: FreehandRoi
+        """
+        points = self.undistort_points(densify_polygon(roi.points.reshape(-1, 2), max_step))
+        undistorted_roi = FreehandRoi(np.round(points))
+        undistorted_roi.centre = tuple(self.undistort_points([roi.centre])[0])
+        return undistorted_roi
+
+
+def densify_polygon(points, max_step):
+    """
+    Adds points along the edges of a closed polygon so that consecutive points are at most max_step apart
+
+    :param points: The vertices of the polygon as an array of shape (n, 2)
+    :param float max_step: The maximum distance between consecutive points
+    :returns: The resampled polygon as an array of shape (m, 2)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    next_points = np.roll(points, -1, axis=0)
+    resampled = []
+    for start, end in zip(points, next_points):
+        n_steps = max(int(np.ceil(np.linalg.norm(end - start) / max_step)), 1)
+        fractions = np.arange(n_steps, dtype=np.float64)[:, np.newaxis] / n_steps
+        resampled.append(start + fractions * (end - start))
+    return np.vstack(resampled)
+
+
+class LazyImageList(object):
+    """
+    A read only list of images that are only computed (e.g. read from disk or corrected) when accessed.
+    The last image accessed is kept in memory.
+    """
+    def __init__(self, sources, func):
+        """
+        :param list sources: The arguments to func (one per image)
+        :param func: The function that returns the image from its source
+        """
+        self.sources = sources
+        self.func = func
+        self._last_idx = None
+        self._last_img = None
+
+    def __len__(self):
+        return len(self.sources)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("Image index {} out of range".format(idx))
+        if idx != self._last_idx:
+            self._last_img = self.func(self.sources[idx])
+            self._last_idx = idx
+        return self._last_img
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def read_image(img_path):
+    """
+    Reads an image from disk in RGB order
+
+    :param str img_path: The path of the image
+    """
+    img = cv2.imread(img_path)
+    if img is None:
+        raise IOError("Could not read image {}".format(img_path))
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def hash_file(file_path, block_size=2**20):
+    """
+    The sha1 digest of the content of the file
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as in_file:
+        for block in iter(lambda: in_file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_corners_cache(cache_path):
+    """
+    :param str cache_path: The .npz file of cached corners (may not exist yet)
+    :return: A dictionary of cache key: corners (empty array if no corners were found)
+    """
+    if cache_path is None or not os.path.exists(cache_path):
+        return {}
+    try:
+        with np.load(cache_path) as cache:
+            return dict(cache.items())
+    except (IOError, ValueError):  # Corrupted cache, start from scratch
+        return {}
+
+
+def _find_corners(args):
+    """
+    Detects the chessboard corners in a single image. Module level to be usable from a process pool.
+
+    :param tuple args: (img_path, chess_size, sub_pixel, criteria)
+    :return: (corners, img_size) where corners is an empty array if no corners were found
+    """
+    img_path, chess_size, sub_pixel, criteria = args
+    gray = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise IOError("Could not read image {}".format(img_path))
+    found, corners = cv2.findChessboardCorners(gray, chess_size)
+    if not found:
+        return np.empty((0, 1, 2), dtype=np.float32), gray.shape[::-1]
+    if sub_pixel:
+        corners = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria)
+    return corners, gray.shape[::-1]
@@ -14,7 +14,8 @@ import tempfile
 from pyper.tracking.tracking import Tracker
 from pyper.tracking.viewer import Viewer
 from pyper.contours.roi import Circle
-from pyper.analysis.video_analysis import *
+from pyper.analysis.video_analysis import (filter_positions, get_angles, plot_angles, plot_distances,
+                                           plot_integrals, plot_track, pos_to_distances, write_data_list)
 from pyper.config import conf
 
 
@@ -158,6 +159,7 @@ if __name__ == '__main__':
     positions = tracker.track(roi=roi)
 
     # ANALYSIS
+    from matplotlib import pyplot as plt  # Imported once the tracking is done (slow import)
     os.chdir(dest_folder)
     positions = filter_positions(positions, args.one_d_kernel) if args.one_d_kernel else positions
     samplingFreq = 1.0/tracker._stream.fps
@@ -20,6 +20,14 @@ DEFAULT_POSITION = (-1, -1)
 
 class ObjectContour(object):
     """ A contour object to easily extract features from objects and draw """
+    COLORS = {'w': (255, 255, 255),
+              'r': (0, 0, 255),
+              'g': (0, 255, 0),
+              'b': (255, 0, 0),
+              'y': (0, 255, 255),
+              'c': (255, 255, 0),
+              'm': (255, 0, 255)}
+
     def __init__(self, contour, frame, contour_type='ellipse', color='w', line_thickness=1):
         """
         :param contour: The contour to make an ObjectContour
@@ -30,17 +38,10 @@ class ObjectContour(object):
         :param str color: The color to draw the contour. One of 'w', 'r', 'g', 'b', 'y', 'm'.
         :param int line_thickness: The thickness in pixels of the line to draw the contour
         """
-        colors = {'w': (255, 255, 255),
-                  'r': (0, 0, 255),
-                  'g': (0, 255, 0),
-                  'b': (255, 0, 0), 
-                  'y': (0, 255, 255),
-                  'c': (255, 255, 0),
-                  'm': (255, 0, 255)}
         self.contour = contour
         self.frame = frame
         self.contour_type = contour_type
-        self.color = colors[color]
+        self.color = ObjectContour.COLORS[color]
         self.line_thickness = line_thickness
         self._fit()
 
@@ -15,23 +15,54 @@ import tarfile
 import tempfile
 
 import numpy as np
-from math import radians, cos, sin, sqrt
+from math import cos, sin
 import cv2
 from cv2 import norm
 
+from pyper.exceptions.exceptions import PyperValueError
+
 try:
     from cv2 import cv
     FILLED = cv.CV_FILLED
 except ImportError:  # removes dependency to cv2.cv outside of video_writer
     FILLED = -1
 
+STATISTICS = ('mean', 'median', 'max', 'min')
+
+
+def compute_statistics(img, mask, statistics=('mean',)):
+    """
+    Computes the statistics of the pixels of img selected by mask.
+    The pixels are only copied out if the median is requested
+
+    :param img: A single channel image
+    :param mask: A uint8 mask of the same shape (non zero for the selected pixels)
+    :param tuple statistics: The names of the statistics (in STATISTICS)
+    :return: A list of the values of the statistics (NaN if the mask is empty)
+    """
+    for stat in statistics:
+        if stat not in STATISTICS:
+            raise ValueError('Expected statistics in {}, got "{}"'.format(STATISTICS, stat))
+    if not mask.size or not cv2.countNonZero(mask):
+        return [float('NaN')] * len(statistics)
+    values = {}
+    if 'mean' in statistics:
+        values['mean'] = cv2.mean(img, mask=mask)[0]
+    if 'max' in statistics or 'min' in statistics:
+        values['min'], values['max'] = cv2.minMaxLoc(img, mask=mask)[:2]
+    if 'median' in statistics:
+        values['median'] = float(np.median(img[mask.astype(bool)]))
+    return [values[stat] for stat in statistics]
+
 
 class RoiCollection(object):
     def __init__(self, rois_list=None):
         self.rois = [] if rois_list is None else rois_list
+        self._index = None
+        self._index_key = None  # The frame shape and ROIs the index was built for
 
     def __len__(self):
-        return len(self)
+        return len(self.rois)
 
     def __iter__(self):
         for roi in self.rois:
@@ -43,6 +74,38 @@ class RoiCollection(object):
     def append(self, item):
         self.rois.append(item)
 
+    def get_index(self, shape):
+        """
+        The RoiIndex of the ROIs for frames of shape. It is built once per frame shape
+        (and rebuilt if the ROIs change).
+
+        :param tuple shape: The shape of the frames (only the height and width are used)
+        :rtype: RoiIndex
+        """
+        shape = tuple(shape[:2])
+        key = (shape, tuple((id(roi), id(roi.points)) for roi in self.rois))
+        if self._index_key != key:
+            self._index = RoiIndex(self.rois, shape)
+            self._index_key = key
+        return self._index
+
+    def contains_points(self, points, shape):
+        """
+        :param points: The (x, y) points, array of shape (n_points, 2)
+        :param tuple shape: The shape of the frames
+        :return: A boolean array of shape (n_points, n_rois), whether each point is in each ROI
+        """
+        return self.get_index(shape).contains_points(points)
+
+    def dists_from_border(self, points, shape):
+        """
+        :param points: The (x, y) points, array of shape (n_points, 2)
+        :param tuple shape: The shape of the frames
+        :return: An array of shape (n_points, n_rois) of the signed distances (positive inside) \
+        from each point to the border of each ROI
+        """
+        return self.get_index(shape).dists_from_border(points)
+
     def fmt_is_available(self, fmt):
         fmts = (fmt for fmt, _ in shutil.get_archive_formats())
         return fmt in fmts
@@ -79,13 +142,118 @@ class RoiCollection(object):
         shutil.rmtree(tmp_dir)
 
 
+class RoiIndex(object):
+    """
+    A rasterised index of a list of ROIs for a given frame shape:
+
+        * a label image where bit i of each pixel is set if the pixel is in ROI i
+        * a signed distance field per ROI (positive inside, built on first use)
+
+    so that the membership and the distance to the border of points are array lookups
+    whatever the number and the shape of the ROIs.
+    The points outside the frame fall back to the methods of the ROIs.
+    """
+    MAX_N_ROIS = 64
+
+    def __init__(self, rois, shape):
+        """
+        :param list rois: The ROIs
+        :param tuple shape: The (height, width) of the frames
+        """
+        if len(rois) > RoiIndex.MAX_N_ROIS:
+            raise PyperValueError('At most {} ROIs can be indexed, got {}'.format(RoiIndex.MAX_N_ROIS, len(rois)))
+        self.rois = list(rois)
+        self.shape = tuple(shape[:2])
+        dtype = next(t for t in (np.uint8, np.uint16, np.uint32, np.uint64) if np.dtype(t).itemsize * 8 >= len(rois))
+        self.labels = np.zeros(self.shape, dtype=dtype)
+        for i, roi in enumerate(self.rois):
+            mask, bounding_box = roi.get_mask(self.shape)
+            self.labels[bounding_box][mask > 0] |= dtype(1 << i)
+        self._distance_fields = [None] * len(self.rois)
+
+    def get_distance_field(self, roi_idx):
+        """
+        The signed distance (positive inside) from each pixel to the border of ROI roi_idx
+        """
+        if self._distance_fields[roi_idx] is None:
+            inside = ((self.labels >> roi_idx) & 1).astype(np.uint8)
+            inside_dist = cv2.distanceTransform(inside, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+            outside_dist = cv2.distanceTransform(1 - inside, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+            half_pixel = np.where(inside, np.float32(-0.5), np.float32(0.5))  # The border is between the pixels
+            self._distance_fields[roi_idx] = inside_dist - outside_dist + half_pixel
+        return self._distance_fields[roi_idx]
+
+    def dist_from_border(self, point, roi_idx=0):
+        """
+        The signed distance (positive inside) from a single point to the border of ROI roi_idx,
+        bilinearly interpolated from the distance field
+
+        :param tuple point: The (x, y) point
+        :param int roi_idx: The index of the ROI
+        :rtype: float
+        """
+        x, y = float(point[0]), float(point[1])
+        height, width = self.shape
+        if not (0 <= x <= width - 1 and 0 <= y <= height - 1):
+            return self.rois[roi_idx].dist_from_border((x, y))
+        field = self.get_distance_field(roi_idx)
+        x0, y0 = min(int(x), width - 2), min(int(y), height - 2)
+        dx, dy = x - x0, y - y0
+        top = field[y0, x0] * (1 - dx) + field[y0, x0 + 1] * dx
+        bottom = field[y0 + 1, x0] * (1 - dx) + field[y0 + 1, x0 + 1] * dx
+        return float(top * (1 - dy) + bottom * dy)
+
+    def _to_pixels(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        cols = np.rint(points[:, 0]).astype(np.intp)
+        rows = np.rint(points[:, 1]).astype(np.intp)
+        height, width = self.shape
+        in_frame = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+        return points, rows, cols, in_frame
+
+    def get_labels(self, points):
+        """
+        :return: The label (bit i set if in ROI i) of each point (0 outside the frame)
+        """
+        points, rows, cols, in_frame = self._to_pixels(points)
+        labels = np.zeros(len(points), dtype=self.labels.dtype)
+        labels[in_frame] = self.labels[rows[in_frame], cols[in_frame]]
+        return labels
+
+    def contains_points(self, points):
+        """
+        :return: A boolean array of shape (n_points, n_rois)
+        """
+        points, rows, cols, in_frame = self._to_pixels(points)
+        labels = self.labels[rows[in_frame], cols[in_frame]]
+        result = np.zeros((len(points), len(self.rois)), dtype=bool)
+        for i, roi in enumerate(self.rois):
+            result[in_frame, i] = (labels >> i) & 1
+            if not in_frame.all():
+                result[~in_frame, i] = roi.contains_points(points[~in_frame])
+        return result
+
+    def dists_from_border(self, points):
+        """
+        :return: An array of shape (n_points, n_rois) of signed distances (positive inside)
+        """
+        points, rows, cols, in_frame = self._to_pixels(points)
+        result = np.empty((len(points), len(self.rois)), dtype=np.float64)
+        for i, roi in enumerate(self.rois):
+            result[in_frame, i] = self.get_distance_field(i)[rows[in_frame], cols[in_frame]]
+            for j in np.flatnonzero(~in_frame):
+                result[j, i] = roi.dist_from_border(tuple(points[j]))
+        return result
+
+
 class Roi(object):
     """
     A generic ROI object meant to be sub-classed by specific ROI shapes.
     It is used to obtain information about points relative to itself.
     """
     def __init__(self):
-        pass
+        self._masks = {}  # The rasterised masks indexed by frame shape (see get_mask)
+        self._masks_points = None  # The points the masks were computed from
     
     def contains_point(self, point):
         """
@@ -93,13 +261,18 @@ class Roi(object):
         
         :param tuple point: the (x, y) point to check
         """
-        return cv2.pointPolygonTest(self.points, point, False) > 0
+        return cv2.pointPolygonTest(self.points, (float(point[0]), float(point[1])), False) > 0
+
+    def contains_points(self, points):
+        """
+        :param points: The (x, y) points, array of shape (n_points, 2)
+        :return: A boolean array, whether each point is in the ROI
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return np.array([self.contains_point(tuple(p)) for p in points], dtype=bool)
 
     def contains_contour(self, contour):
-        for p in contour:
-            if not self.contains_point(tuple(p[0])):  # at least one point outside self
-                return False
-        return True
+        return bool(self.contains_points(contour).all())  # i.e. no point outside self
         
     def dist_from_border(self, point):
         """
@@ -107,7 +280,7 @@ class Roi(object):
         
         :param tuple point: the (x, y) point to check
         """
-        return cv2.pointPolygonTest(self.points, point, True)
+        return cv2.pointPolygonTest(self.points, (float(point[0]), float(point[1])), True)
         
     def dist_from_centre(self, point):
         """
@@ -117,12 +290,56 @@ class Roi(object):
         """
         return norm(self.centre, point)
 
+    def get_mask(self, shape):
+        """
+        The ROI rasterised in its bounding box. The result is cached for each frame shape.
+
+        :param tuple shape: The shape of the frames (only the height and width are used)
+        :return: (mask, bounding_box) where mask is a uint8 image of the size of the bounding box \
+        and bounding_box is (slice(y0, y1), slice(x0, x1)), the bounding box clipped to the frame
+        """
+        if self._masks_points is not self.points:  # The shape of the ROI changed
+            self._masks = {}
+            self._masks_points = self.points
+        shape = tuple(shape[:2])
+        if shape not in self._masks:
+            height, width = shape
+            x, y, w, h = cv2.boundingRect(self.points)
+            x0, y0 = min(max(x, 0), width), min(max(y, 0), height)
+            x1, y1 = max(min(x + w, width), x0), max(min(y + h, height), y0)
+            mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+            cv2.drawContours(mask, [self.points], 0, 255, FILLED, offset=(-x0, -y0))
+            self._masks[shape] = (mask, (slice(y0, y1), slice(x0, x1)))
+        return self._masks[shape]
+
     def to_mask(self, frame):
-        mask = frame.copy()  # TODO: extract to roi.to_mask
-        mask.fill(0)
-        cv2.drawContours(mask, [self.points], 0, 255, FILLED)
+        """
+        :param frame: The frame to get the shape and type of the mask from
+        :return: An image like frame with 255 (first channel only for colour frames) inside the ROI
+        """
+        mask = np.zeros_like(frame)
+        roi_mask, bounding_box = self.get_mask(frame.shape)
+        if mask.ndim == 3:
+            mask[bounding_box + (0,)] = roi_mask
+        else:
+            mask[bounding_box] = roi_mask
         return mask
 
+    def measure(self, frame, statistics=('mean',)):
+        """
+        Computes the statistics of the pixels of frame within the ROI (using only its bounding box)
+        For colour frames, the first channel is used (like to_mask)
+
+        :param frame: The frame to measure
+        :param tuple statistics: The names of the statistics (in STATISTICS)
+        :return: The list of values (one per statistic)
+        """
+        mask, bounding_box = self.get_mask(frame.shape)
+        crop = frame[bounding_box]
+        if crop.ndim == 3:
+            crop = crop[:, :, 0]
+        return compute_statistics(crop, mask, statistics)
+
     def save(self, dest):  # FIXME: should be class specific
         t = str(type(self)).strip("'<>").split('.')[-1].lower()
         with open(dest, 'w') as out_file:
@@ -190,6 +407,17 @@ class Circle(Roi):
         points = self.get_points().astype(np.int32)
         self.points = np.expand_dims(points, axis=1)
         
+    def contains_point(self, point):
+        return bool(self.contains_points(point)[0])
+
+    def contains_points(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        sq_dists = ((points - self.centre) ** 2).sum(axis=1)
+        return sq_dists < self.radius ** 2
+
+    def dist_from_border(self, point):
+        return self.radius - math.hypot(point[0] - self.centre[0], point[1] - self.centre[1])
+
     def circle_point(self, angle):
         """
         Gets a point on the circle at the given angle
@@ -208,11 +436,10 @@ class Circle(Roi):
         
         :return np.array points: the list of points.
         """
-        n_points = 360
-        points = np.empty((n_points, 2), dtype=np.float32)
-        for i in range(n_points):
-            points[i] = self.circle_point(radians(i))
-        return points
+        angles = np.radians(np.arange(360))
+        points = np.column_stack((self.centre[0] + self.radius * np.cos(angles),
+                                  self.centre[1] + self.radius * np.sin(angles)))
+        return points.astype(np.float32)
 
 
 class Rectangle(Roi):
@@ -226,6 +453,25 @@ class Rectangle(Roi):
         points = self.get_points().astype(np.int32)
         self.points = np.expand_dims(points, axis=1)
 
+    def contains_point(self, point):
+        return bool(self.contains_points(point)[0])
+
+    def contains_points(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x0, y0 = self.top_left_point
+        return ((points[:, 0] > x0) & (points[:, 0] < x0 + self.width) &
+                (points[:, 1] > y0) & (points[:, 1] < y0 + self.height))
+
+    def dist_from_border(self, point):
+        x0, y0 = self.top_left_point
+        x1, y1 = x0 + self.width, y0 + self.height
+        x, y = point
+        if x0 <= x <= x1 and y0 <= y <= y1:
+            return min(x - x0, x1 - x, y - y0, y1 - y)
+        dx = max(x0 - x, 0, x - x1)
+        dy = max(y0 - y, 0, y - y1)
+        return -math.hypot(dx, dy)
+
     def get_points(self):
         n_points = 4  # the 4 corners
         points = np.empty((n_points, 2), dtype=np.float32)
@@ -256,7 +502,15 @@ class Ellipse(Roi):
         self.points = np.expand_dims(points, axis=1)
 
     def __compute_ellipse(self, semi_major, semi_minor, xs):
-        return np.array([(semi_major / semi_minor) * sqrt(semi_minor**2 - x**2) for x in xs])
+        return (semi_major / semi_minor) * np.sqrt(np.maximum(semi_minor**2 - xs**2, 0))
+
+    def contains_point(self, point):
+        return bool(self.contains_points(point)[0])
+
+    def contains_points(self, points):  # The distance to the border has no closed form (polygon test)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        semi_axes = np.array((self.width / 2., self.height / 2.))
+        return (((points - self.centre) / semi_axes) ** 2).sum(axis=1) < 1
 
     def get_points(self):
         n_points = 200
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+**************************
+The data_decimation module
+**************************
+
+This module reduces long data series (e.g. electrophysiology aligned to the video) to the
+points that can actually be displayed.
+A MinMaxPyramid is computed once per series. Each level halves (by default) the number of
+samples of the previous one and keeps the minimum and maximum of each bin, so that peaks are
+never lost. A window of the series is then served from the coarsest level that still has at
+least one bin per pixel, i.e. at most 2 points per pixel whatever the length of the series.
+"""
+from __future__ import division
+
+import numpy as np
+
+from pyper.exceptions.exceptions import PyperValueError
+
+
+class MinMaxPyramid(object):
+    """
+    The min/max decimation levels of a 1D series
+
+    Use as follows:
+
+    >>> pyramid = MinMaxPyramid(data)
+    >>> xs, ys = pyramid.get_window(0, len(data), n_pixels=800)
+    """
+    def __init__(self, data, factor=2):
+        """
+        :param data: The 1D series
+        :param int factor: The number of bins of a level merged into one bin of the next level
+        """
+        if factor < 2:
+            raise PyperValueError('factor must be at least 2, got {}'.format(factor))
+        data = np.asarray(data, dtype=np.float32).ravel()
+        if not len(data):
+            raise PyperValueError('Cannot decimate an empty series')
+        self.factor = factor
+        self.n_samples = len(data)
+        self.levels = [(data, data)]  # The (mins, maxs) of each level, the bin size of level k is factor ** k
+        mins, maxs = data, data
+        while len(mins) > 1:
+            mins, maxs = self._reduce(mins, np.minimum), self._reduce(maxs, np.maximum)
+            self.levels.append((mins, maxs))
+
+    def _reduce(self, values, func):
+        n_bins = -(-len(values) // self.factor)  # ceil
+        padded = np.pad(values, (0, n_bins * self.factor - len(values)), mode='edge')
+        return func.reduce(padded.reshape(n_bins, self.factor), axis=1)
+
+    def get_level_idx(self, n_samples, n_pixels):
+        """
+        The coarsest level with at least one bin per pixel for n_samples of the series
+
+        :param int n_samples: The number of samples in the window
+        :param int n_pixels: The width of the viewport in pixels
+        :rtype: int
+        """
+        level_idx = 0
+        while level_idx + 1 < len(self.levels) and n_samples / self.factor ** (level_idx + 1) >= n_pixels:
+            level_idx += 1
+        return level_idx
+
+    def get_window(self, start, stop, n_pixels):
+        """
+        The points to draw samples start to stop of the series on n_pixels
+
+        :param int start: The first sample of the window
+        :param int stop: The sample after the last one of the window
+        :param int n_pixels: The width of the viewport in pixels
+        :return: (xs, ys) The sample indices (float64) and values (float32). In decimated levels, \
+        each bin gives two points (its min and its max) at the position of the bin.
+        """
+        start, stop = max(int(start), 0), min(int(stop), self.n_samples)
+        if stop <= start:
+            return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.float32)
+        level_idx = self.get_level_idx(stop - start, max(int(n_pixels), 1))
+        mins, maxs = self.levels[level_idx]
+        if level_idx == 0:
+            return np.arange(start, stop, dtype=np.float64), mins[start:stop]
+        bin_size = self.factor ** level_idx
+        first_bin, last_bin = start // bin_size, -(-stop // bin_size)
+        xs = np.repeat(np.arange(first_bin, last_bin, dtype=np.float64) * bin_size, 2)
+        ys = np.empty(len(xs), dtype=np.float32)
+        ys[0::2] = mins[first_bin:last_bin]
+        ys[1::2] = maxs[first_bin:last_bin]
+        return xs, ys
+
+    def get_window_bytes(self, start, stop, n_pixels):
+        """
+        The points of get_window with the x coordinates as fractions of the series,
+        packed as interleaved (x, y) little-endian float32 (for a binary transfer to the interface)
+
+        :rtype: bytes
+        """
+        xs, ys = self.get_window(start, stop, n_pixels)
+        points = np.empty((len(xs), 2), dtype='<f4')
+        points[:, 0] = xs / max(self.n_samples - 1, 1)
+        points[:, 1] = ys
+        return points.tobytes()
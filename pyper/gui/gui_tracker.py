@@ -2,6 +2,7 @@ import cv2
 import numpy as np  # required for dynamic subclassing
 
 from pyper.tracking.tracking import Tracker
+from pyper.video.annotation_layer import TrajectoryOverlay
 
 
 class GuiTracker(Tracker):
@@ -16,10 +17,14 @@ class GuiTracker(Tracker):
                  n_background_frames=1, n_sds=5.0,
                  clear_borders=False, normalise=False,
                  plot=False, fast=False, extract_arena=False,
-                 camera_calibration=None,
-                 callback=None, requested_fps=None):
+                 camera_calibration=None, calibration_mode='frame',
+                 callback=None, requested_fps=None, scheduling_policy='all', pyramid_level=0,
+                 trajectory_tail=None, occupancy_bin_size=None, occupancy_weighting='frames', kinematics=None,
+                 recording_policy=None, recording_triggers=('roi',), motion_threshold=5., save_raw=True):
         """
         :param TrackerInterface ui_iface: the interface this tracker is called from
+        :param float trajectory_tail: If not None, only the last trajectory_tail seconds of the \
+        trajectory are displayed (the full trajectory otherwise)
 
         For the other parameters, see Tracker
         """
@@ -30,11 +35,17 @@ class GuiTracker(Tracker):
                          n_background_frames=n_background_frames, n_sds=n_sds,
                          clear_borders=clear_borders, normalise=normalise,
                          plot=plot, fast=fast, extract_arena=extract_arena,
-                         camera_calibration=camera_calibration,
-                         callback=callback, requested_fps=requested_fps)
+                         camera_calibration=camera_calibration, calibration_mode=calibration_mode,
+                         callback=callback, requested_fps=requested_fps,
+                         scheduling_policy=scheduling_policy, pyramid_level=pyramid_level,
+                         occupancy_bin_size=occupancy_bin_size, occupancy_weighting=occupancy_weighting,
+                         kinematics=kinematics, recording_policy=recording_policy,
+                         recording_triggers=recording_triggers, motion_threshold=motion_threshold,
+                         save_raw=save_raw)
         self.ui_iface = ui_iface
         self.record = dest_file_path is not None
-        self.plt_curve = None
+        tail_length = None if trajectory_tail is None else max(int(round(trajectory_tail * self._stream.fps)), 2)
+        self.trajectory = TrajectoryOverlay(tail_length=tail_length, default_pos=self.results.default_pos)
         self.curve_update_period = 1  # FIXME: add to config, default to 1
 
     def read(self):
@@ -60,14 +71,15 @@ class GuiTracker(Tracker):
             return
         if result is not None:
             img, position, distances = result
+            if self.should_update_vid():  # Only rasterise the annotations of the frames that are displayed
+                self.annotations.flush(img)
             self.current_frame = img
             return img
 
     def _plot(self):  # FIXME: document that not for each frame
-        self.paint(self.silhouette, 'c')
-        if self.plt_curve is None or self.is_update_frame() or (not self.fast):  # do only every x pnts in fast mode
-            self.plt_curve = self.results.plot_positions()
-        self.silhouette.paint(curve=self.plt_curve)
+        self.annotate('c')
+        self.trajectory.update(self.results.positions, self.silhouette.shape[:2])  # Only draws the new segments
+        self.annotations.add_overlay(self.trajectory)
 
     def is_update_frame(self):
         return self.current_frame_idx % self.curve_update_period == 0
@@ -148,6 +148,8 @@ class PyplotImageProvider(TrackingImageProvider):
     If supplied it will use the pyplot graph to get the next image.
     If it cannot get an image, a random image (noise) of the proper size will be generated as
     a place holder.
+    The rendered graph is cached until the figure is marked dirty (see set_figure() and mark_dirty()).
+    Live plots (see live_plots.LivePlot) are rendered incrementally (blitting) on request.
     """
     
     def __init__(self, requestedImType='pixmap', fig=None):
@@ -157,16 +159,45 @@ class PyplotImageProvider(TrackingImageProvider):
         """
         TrackingImageProvider.__init__(self, requestedImType=requestedImType)
         self._fig = fig
+        self._live_plot = None
+        self._img = None  # The cached rendering of self._fig
+        self._placeholder = None
+        self.dirty = True
+
+    def set_figure(self, fig):
+        """
+        :param fig: The pyplot figure to display (rendered on the next request)
+        """
+        self._fig = fig
+        self._live_plot = None
+        self.mark_dirty()
+
+    def set_live_plot(self, live_plot):
+        """
+        :param live_plot: The plot to display, updated with its new data on each request
+        :type live_plot: live_plots.LivePlot
+        """
+        self._live_plot = live_plot
+        self._fig = live_plot.fig
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        """
+        Forces the figure to be rendered again on the next request (e.g. after modifying it)
+        """
+        self.dirty = True
 
     def getArray(self):
         """
         Return the graph drawn on self._fig as a raw rgb image (numpy array)
         """
-        self._fig.canvas.draw()
-        width, height = self._fig.canvas.get_width_height()
-        img = self._fig.canvas.tostring_rgb()
-        img = np.fromstring(img, dtype=np.uint8).reshape(height, width, 3)
-        return img
+        if self._live_plot is not None:
+            return self._live_plot.get_array()
+        if self.dirty or self._img is None:
+            self._fig.canvas.draw()
+            self._img = np.ascontiguousarray(np.asarray(self._fig.canvas.buffer_rgba())[:, :, :3])
+            self.dirty = False
+        return self._img
 
     def getBaseImg(self, size):
         """
@@ -180,7 +211,9 @@ class PyplotImageProvider(TrackingImageProvider):
             img = self.getArray()
             size = img.shape[:2]
         else:
-            img = self.getRndmImg(size)
+            if self._placeholder is None or self._placeholder.shape[:2] != size:
+                self._placeholder = self.getRndmImg(size)
+            img = self._placeholder
         w, h = size
         qimg = QImage(img, h, w, QImage.Format_RGB888)
         return qimg
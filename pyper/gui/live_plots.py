@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+*********************
+The live_plots module
+*********************
+
+This module provides plots that are extended while the tracking progresses.
+Only the points added since the last render are drawn (blitted) onto a cached copy of the axes,
+so the cost of a render does not grow with the length of the session. The whole figure is only
+redrawn when the axes have to be rescaled (which happens a logarithmic number of times).
+
+The figures are rendered off screen (Agg), independently of the pyplot state, so that they can be
+served as images to the QT interface (see image_providers.PyplotImageProvider).
+"""
+from __future__ import division
+
+import numpy as np
+
+
+def _make_figure(figsize):
+    from matplotlib.figure import Figure  # Imported on first use (slow import)
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)  # Attaches itself as fig.canvas
+    return fig
+
+
+class LivePlot(object):
+    """
+    A line plot of a quantity that grows with the tracking (e.g. the angles or the distances)
+
+    Use as follows:
+
+    >>> plot = LivePlot(lambda start: get_angles(results.positions[start:]), sampling_freq=30)
+    >>> img = plot.get_array()  # Pulls the new values and draws them
+    """
+    def __init__(self, get_data, sampling_freq, xlabel='time (s)', ylabel='', ylim=None, reference_line=None,
+                 initial_duration=10., figsize=(6.4, 4.8)):
+        """
+        :param get_data: A function that returns the values from index start (its argument) to the end
+        :param float sampling_freq: The number of values per second (to compute the time axis)
+        :param str xlabel: The label of the x axis
+        :param str ylabel: The label of the y axis
+        :param tuple ylim: The fixed (min, max) of the y axis (expanded to the data if None)
+        :param float reference_line: The y value of a horizontal reference line (None for no line)
+        :param float initial_duration: The initial duration (s) of the x axis (doubled when exceeded)
+        :param tuple figsize: The size of the figure in inches
+        """
+        self.get_data = get_data
+        self.sampling_freq = sampling_freq
+        self.fixed_ylim = ylim
+        self.initial_duration = initial_duration
+
+        self.fig = _make_figure(figsize)
+        self.canvas = self.fig.canvas
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        if reference_line is not None:
+            self.ax.axhline(reference_line, color='g', linewidth=1, linestyle='--')
+        self.line, = self.ax.plot([], [], color='b', linewidth=0.5)
+        self.segment, = self.ax.plot([], [], color='b', linewidth=0.5, animated=True)  # Only drawn by blitting
+        self.reset()
+
+    def reset(self):
+        self.xs = []
+        self.ys = []
+        self._n_drawn = 0  # The number of points already in self._background
+        self._background = None  # The cached pixels of the axes (with the points drawn so far)
+        self._img = None
+        self.ax.set_xlim(0, self.initial_duration)
+        self.ax.set_ylim(*(self.fixed_ylim if self.fixed_ylim is not None else (-1, 1)))
+
+    def __len__(self):
+        return len(self.ys)
+
+    def _fits(self, xs, ys):
+        """
+        Whether the values are within the current limits of the axes
+        """
+        x_max = self.ax.get_xlim()[1]
+        if xs[-1] > x_max:
+            return False
+        ys = np.asarray(ys, dtype=np.float64)
+        ys = ys[np.isfinite(ys)]
+        if self.fixed_ylim is None and len(ys):
+            y_min, y_max = self.ax.get_ylim()
+            return y_min <= ys.min() and ys.max() <= y_max
+        return True
+
+    def _rescale(self):
+        x_max = self.ax.get_xlim()[1]
+        while self.xs[-1] > x_max:
+            x_max *= 2
+        self.ax.set_xlim(0, x_max)
+        ys = np.asarray(self.ys, dtype=np.float64)
+        ys = ys[np.isfinite(ys)]
+        if self.fixed_ylim is None and len(ys):
+            y_min, y_max = self.ax.get_ylim()
+            data_min, data_max = ys.min(), ys.max()
+            margin = max((data_max - data_min) * 0.1, 1)
+            if data_min < y_min:
+                y_min = data_min - margin
+            if data_max > y_max:
+                y_max = data_max + margin
+            self.ax.set_ylim(y_min, y_max)
+
+    def _redraw(self):
+        """
+        Redraws the whole figure and caches the axes
+        """
+        self.line.set_data(self.xs, self.ys)
+        self.canvas.draw()
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._n_drawn = len(self)
+
+    def _blit(self):
+        """
+        Draws the points added since the last render onto the cached axes
+        """
+        start = max(self._n_drawn - 1, 0)  # Joins with the last drawn point
+        self.canvas.restore_region(self._background)
+        self.segment.set_data(self.xs[start:], self.ys[start:])
+        self.ax.draw_artist(self.segment)
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._n_drawn = len(self)
+        self.line.set_data(self.xs, self.ys)  # For the next full redraw
+
+    def update(self):
+        """
+        Pulls the new values and draws them
+
+        :return: Whether the figure changed
+        """
+        new_ys = list(self.get_data(len(self)))
+        if self._background is not None and not new_ys:
+            return False
+        start = len(self)
+        new_xs = [(start + i) / self.sampling_freq for i in range(len(new_ys))]
+        self.xs.extend(new_xs)
+        self.ys.extend(new_ys)
+        if self._background is None:
+            if self.ys:
+                self._rescale()
+            self._redraw()
+        elif self._fits(new_xs, new_ys):
+            self._blit()
+        else:
+            self._rescale()
+            self._redraw()
+        return True
+
+    def get_array(self):
+        """
+        :return: The figure (with the latest values) as an RGB image of shape (height, width, 3)
+        """
+        if self.update() or self._img is None:
+            self._img = np.ascontiguousarray(np.asarray(self.canvas.buffer_rgba())[:, :, :3])
+        return self._img
+
+
+
+class MapPlot(object):
+    """
+    A heat map (e.g. the occupancy map) that is replaced in place by each update,
+    so that a single figure is kept however many times the map is displayed
+
+    Use as follows:
+
+    >>> plot = MapPlot(title='Occupancy')
+    >>> plot.update(results.get_occupancy(normalise=True), bin_size=10)
+    >>> image_provider.set_figure(plot.fig)
+    """
+    def __init__(self, title='', cmap='hot', figsize=(6.4, 4.8)):
+        """
+        :param str title: The title of the axes
+        :param str cmap: The name of the colour map
+        :param tuple figsize: The size of the figure in inches
+        """
+        self.fig = _make_figure(figsize)
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_title(title)
+        self.cmap = cmap
+        self.im = None
+
+    def update(self, data, bin_size=1):
+        """
+        :param data: The 2D map to display
+        :param int bin_size: The size of a cell of the map in pixels (to label the axes in pixels)
+        """
+        extent = (0, data.shape[1] * bin_size, data.shape[0] * bin_size, 0)
+        if self.im is None:
+            self.im = self.ax.imshow(data, cmap=self.cmap, interpolation='nearest', extent=extent)
+        else:
+            self.im.set_data(data)
+            self.im.set_extent(extent)
+            self.im.autoscale()  # The colour range of the new data
+
+
+class TextPlot(object):
+    """
+    A block of text (e.g. the behavioural state) that is replaced in place by each update
+    """
+    def __init__(self, figsize=(6.4, 4.8)):
+        """
+        :param tuple figsize: The size of the figure in inches
+        """
+        self.fig = _make_figure(figsize)
+        ax = self.fig.add_subplot(111)
+        ax.axis('off')
+        self.text = ax.text(0.05, 0.95, '', va='top', family='monospace')
+
+    def update(self, lines):
+        """
+        :param list lines: The lines of text to display
+        """
+        self.text.set_text('\n'.join(lines))
@@ -52,6 +52,7 @@ class ParamsIface(QObject):
         self.objects_min_area = config['tracker']['detection']['min_area']
         self.objects_max_area = config['tracker']['detection']['max_area']
         self.teleportation_threshold = config['tracker']['detection']['teleportation_threshold']
+        self.pyramid_level = config['tracker']['detection']['pyramid_level']
 
         self.n_sds = config['tracker']['sd_mode']['n_sds']
 
@@ -61,6 +62,13 @@ class ParamsIface(QObject):
         self.infer_location = config['tracker']['checkboxes']['infer_location']
 
         self.timer_period = config['global']['timer_period']
+        self.scheduling_policy = config['tracker']['live']['scheduling_policy']
+        self.recording_config = config['tracker']['recording']
+        self.trajectory_tail = config['tracker']['display']['trajectory_tail']
+        self.occupancy_bin_size = config['analysis']['occupancy']['bin_size']
+        self.occupancy_weighting = config['analysis']['occupancy']['weighting']
+        self.kinematics_config = config['analysis']['kinematics']
+        self.calibration_mode = config['calibration']['mode']
 
     def __del__(self):
         """
@@ -75,6 +83,24 @@ class ParamsIface(QObject):
     @pyqtSlot(result=int)
     def get_timer_period(self):
         return self.timer_period
+
+    @pyqtSlot(str)
+    def set_scheduling_policy(self, policy):
+        self.scheduling_policy = policy
+        config['tracker']['live']['scheduling_policy'] = policy
+
+    @pyqtSlot(result=str)
+    def get_scheduling_policy(self):
+        return self.scheduling_policy
+
+    @pyqtSlot(str)
+    def set_calibration_mode(self, mode):
+        self.calibration_mode = mode
+        config['calibration']['mode'] = mode
+
+    @pyqtSlot(result=str)
+    def get_calibration_mode(self):
+        return self.calibration_mode
         
     @pyqtSlot(str)
     def set_ref_source(self, ref_path):
@@ -168,6 +194,15 @@ class ParamsIface(QObject):
         self.objects_max_area = int(area)
         config['tracker']['detection']['max_area'] = int(area)
 
+    @pyqtSlot(result=QVariant)
+    def get_pyramid_level(self):
+        return self.pyramid_level
+
+    @pyqtSlot(QVariant)
+    def set_pyramid_level(self, level):
+        self.pyramid_level = int(level)
+        config['tracker']['detection']['pyramid_level'] = int(level)
+
     @pyqtSlot(result=QVariant)
     def get_max_movement(self):
         return self.teleportation_threshold
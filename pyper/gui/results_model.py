@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+************************
+The results_model module
+************************
+
+This module provides the QT model of the tracking results for the results view of the analysis tab.
+The model reads the columns of the TrackingResults object directly. Only the cells that the view
+displays are formatted (on request) and the rows appended by the tracking are announced to the view
+incrementally (rowsInserted) instead of the view polling the interface for each row.
+"""
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt, pyqtSlot
+
+from pyper.tracking.tracking_results import CELL_COLUMNS
+
+ROLES = ('frameId', 'time', 'x', 'y', 'area', 'centerDist', 'borderDist', 'measure', 'inRoi', 'dropped')
+
+
+class ResultsTableModel(QAbstractListModel):
+    """
+    A list model with one role per column of the results (for the QtQuick TableView)
+    """
+    def __init__(self, get_results, parent=None):
+        """
+        :param get_results: A function returning the current TrackingResults (or None). \
+        The results object can change (e.g. new tracker)
+        """
+        QAbstractListModel.__init__(self, parent)
+        self.get_results = get_results
+        self._results = None
+        self._n_rows = 0  # The number of rows the view knows about
+        self._role_columns = {Qt.UserRole + 1 + i: column for i, column in enumerate(CELL_COLUMNS)}
+
+    def roleNames(self):
+        return {Qt.UserRole + 1 + i: name.encode() for i, name in enumerate(ROLES)}
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._n_rows
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or self._results is None or not 0 <= index.row() < self._n_rows:
+            return None
+        column = self._role_columns.get(role)
+        if column is None:
+            return None
+        if column == 'frame':
+            return index.row()
+        elif column == 'in_roi':
+            return bool(self._results.in_tracking_roi[index.row()])
+        elif column == 'dropped':
+            return bool(self._results.dropped[index.row()])
+        return self._results.get_cell(index.row(), column)
+
+    @pyqtSlot()
+    def sync(self):
+        """
+        Announces the rows appended to the results since the last call (or resets the view if the results
+        were reset or replaced). This is cheap when nothing changed and can be called at every frame.
+        """
+        results = self.get_results()
+        n_rows = 0 if results is None else len(results)
+        if results is not self._results or n_rows < self._n_rows:
+            self.beginResetModel()
+            self._results = results
+            self._n_rows = n_rows
+            self.endResetModel()
+        elif n_rows > self._n_rows:
+            self.beginInsertRows(QModelIndex(), self._n_rows, n_rows - 1)
+            self._n_rows = n_rows
+            self.endInsertRows()
+
+    @pyqtSlot(int, result=int)
+    def row_of_frame(self, frame_idx):
+        """
+        The row of frame frame_idx (the results have one row per frame), clipped to the rows of the view
+
+        :param int frame_idx: The index of the frame
+        :return: The row (-1 if the model is empty)
+        """
+        self.sync()
+        if not self._n_rows:
+            return -1
+        return min(max(frame_idx, 0), self._n_rows - 1)
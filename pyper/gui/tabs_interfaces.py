@@ -21,25 +21,29 @@ from scipy.io import loadmat
 from skimage.io import imsave
 
 matplotlib.use('qt5agg')  # For OSX otherwise, the default backend doesn't allow to draw to buffer
-from matplotlib import pyplot as plt
 
 from PyQt5.QtWidgets import QFileDialog
-from PyQt5.QtCore import QObject, pyqtSlot, QVariant, QTimer
+from PyQt5.QtCore import QObject, pyqtSlot, QVariant, QTimer, QByteArray, QMetaObject
 
 from pyper.utilities.utils import qurl_to_str
 from pyper.utilities.utils import un_file
+from pyper.gui.data_decimation import MinMaxPyramid
 from pyper.gui.gui_tracker import GuiTracker
+from pyper.gui.live_plots import LivePlot, MapPlot, TextPlot
+from pyper.gui.results_model import ResultsTableModel
 from pyper.tracking.tracker_plugins import PupilGuiTracker
 from pyper.video.video_stream import QuickRecordedVideoStream
 from pyper.video.video_stream import RecordedVideoStream
 from pyper.video.video_stream import ImageListVideoStream
+from pyper.video.recording_policy import create_recording_policy
 from pyper.contours.roi import Rectangle, Ellipse, FreehandRoi, Roi, RoiCollection
 from pyper.analysis import video_analysis
+from pyper.analysis.kinematics import OnlineKinematics
 from pyper.camera.camera_calibration import CameraCalibration
 from pyper.gui.image_providers import CvImageProvider
 from pyper.video.cv_wrappers import helpers as cv_helpers
 
-from pyper.exceptions.exceptions import VideoStreamIOException, PyperError
+from pyper.exceptions.exceptions import VideoStreamIOException, PyperError, CameraCalibrationException
 from pyper.config import conf
 config = conf.config
 
@@ -327,9 +331,53 @@ class CalibrationIface(PlayerInterface):
         dest_path = dest_path[0]
         if dest_path:
             if self.matrix_type == 'normal':
-                np.save(dest_path, self.camera_matrix)
+                np.save(dest_path, self.calib.camera_matrix)
             elif self.matrix_type == 'optimized':
-                np.save(dest_path, self.optimal_camera_matrix)
+                np.save(dest_path, self.calib.optimal_camera_matrix)
+
+    @pyqtSlot()
+    def save_calibration(self):
+        """
+        Save the complete calibration (matrices and maps) to be reloaded without recalibrating
+        """
+        diag = QFileDialog()
+        dest_path = diag.getSaveFileName(parent=diag,
+                                         caption='Save calibration',
+                                         directory=os.getenv('HOME'),
+                                         filter='Numpy archive (*.npz)')
+        dest_path = dest_path[0]
+        if dest_path:
+            self.calib.save(dest_path)
+
+    @pyqtSlot(result=bool)
+    def load_calibration(self):
+        """
+        Load a calibration saved with save_calibration() and use it for tracking.
+        The bundle has no images, so there is nothing to display afterwards
+
+        :return: Whether a calibration was loaded
+        """
+        diag = QFileDialog()
+        src_path = diag.getOpenFileName(parent=diag,
+                                        caption='Load calibration',
+                                        directory=os.getenv('HOME'),
+                                        filter='Numpy archive (*.npz)')
+        src_path = src_path[0]
+        if src_path:
+            try:
+                self.calib = CameraCalibration.load(src_path)
+            except CameraCalibrationException as err:  # e.g. corrupt or incomplete bundle
+                print(err)
+                error_screen = self.win.findChild(QObject, 'calibrationLoadingErrorScreen')
+                error_screen.setProperty('text', str(err))
+                error_screen.setProperty('doFlash', True)
+                return False
+            self.params.calib = self.calib
+            self.timer.stop()
+            self.stream = None  # The images of the previous calibration do not match
+            self.n_frames = 0
+            return True
+        return False
 
     @pyqtSlot(QVariant)
     def set_frame_type(self, frame_type):
@@ -339,6 +387,8 @@ class CalibrationIface(PlayerInterface):
         :param string frame_type: The selected frame type. One of ['source', 'detected', 'corrected']
         """
         frame_type = frame_type.lower()
+        if self.stream is None:  # e.g. loaded calibration (no images)
+            return
         current_index = self.stream.current_frame_idx
         frame_types = {"source": self.calib.src_imgs,
                        "detected": self.calib.detected_imgs,
@@ -372,8 +422,14 @@ class TrackerIface(BaseInterface):
 
         self.analysis_image_provider = analysis_provider_1
         self.analysisImageProvider2 = analysis_provider_2
+        self.angles_plot = None  # The LivePlot objects, updated incrementally during the tracking
+        self.distances_plot = None
+        self.occupancy_plot = None  # The MapPlot and TextPlot objects, updated in place when displayed again
+        self.kinematics_plot = None
+        self.results_model = ResultsTableModel(self._get_results, self)  # The model of the results view
 
         self.graph_data = None
+        self.graph_pyramid = None  # The MinMaxPyramid of self.graph_data (served by get_graph_window)
 
         self.current_frame_idx = 0
         self.output_type = "Raw"
@@ -386,10 +442,21 @@ class TrackerIface(BaseInterface):
         if hasattr(self, 'image_provider'):
             self.image_provider.reuse_on_next_load = True
 
+    def _get_results(self):
+        return None if self.tracker is None else self.tracker.results
+
+    @pyqtSlot()
+    def update_results_model(self):
+        """
+        Announces the new rows of the results to the results view (see ResultsTableModel.sync)
+        """
+        self.results_model.sync()
+
     @pyqtSlot(QVariant, result=QVariant)
     def get_row(self, idx):  # TODO: see id idx could be declared as int
         """
         Get the data (position ... from the TrackingResults object) at row idx
+        (prefer self.results_model which formats only the displayed cells)
         
         :param int idx: The index of the row to return
         """
@@ -400,7 +467,7 @@ class TrackerIface(BaseInterface):
             print("No tracker instance, make sure you have selected the correct result type; {}".format(err))
             return -1
         if 0 <= idx < len(results):
-            return map(str, results.get_row(idx))
+            return list(map(str, results.get_row(idx)))
         else:
             return -1
 
@@ -420,7 +487,11 @@ class TrackerIface(BaseInterface):
             self.tracker = self.params.tracker_class(self, src_file_path=self.params.src_path, dest_file_path=None,
                                                      n_background_frames=1, plot=True,
                                                      fast=True, camera_calibration=self.params.calib,
-                                                     callback=None)
+                                                     calibration_mode=self.params.calibration_mode,
+                                                     callback=None, trajectory_tail=self.params.trajectory_tail,
+                                                     occupancy_bin_size=self.params.occupancy_bin_size,
+                                                     occupancy_weighting=self.params.occupancy_weighting,
+                                                     kinematics=self._get_kinematics())
         except VideoStreamIOException:
             self.tracker = None
             error_screen = self.win.findChild(QObject, 'videoLoadingErrorScreen')
@@ -498,6 +569,7 @@ class TrackerIface(BaseInterface):
             self.tracker.min_area = self.params.objects_min_area
             self.tracker.max_area = self.params.objects_max_area
             self.tracker.teleportation_threshold = self.params.teleportation_threshold
+            self.tracker.pyramid_level = self.params.pyramid_level
 
             self.tracker.n_sds = self.params.n_sds
             self.tracker.clear_borders = self.params.clear_borders
@@ -531,6 +603,10 @@ class TrackerIface(BaseInterface):
     def _reset_measures(self):
         if self.tracker is not None:
             self.tracker.results.reset()   # reset between runs
+        self.results_model.sync()
+        for plot in (self.angles_plot, self.distances_plot):
+            if plot is not None:
+                plot.reset()
 
     def pre_track(self):
         """
@@ -548,6 +624,8 @@ class TrackerIface(BaseInterface):
             duration = float(self.end_track_time - self.start_track_time)
             fps = n_frames / duration
             print("Acquired {0} frames in {1:.2f} seconds (fps={2:.2f})".format(n_frames, duration, fps))
+        if self.tracker.scheduler is not None:
+            print("{} frames dropped to keep up with the camera".format(self.tracker.results.get_n_dropped()))
 
     @pyqtSlot()
     def start(self):
@@ -751,19 +829,39 @@ class TrackerIface(BaseInterface):
             if extension == '.npy':
                 self.graph_data = np.load(src_path)
             elif extension == '.mat':
-                self.graph_data = loadmat(src_path)  # TEST:
+                mat_vars = [v for k, v in loadmat(src_path).items() if not k.startswith('__')]  # TEST:
+                self.graph_data = mat_vars[0]
             elif extension == '.csv':
-                self.graph_data = np.genfromtext(src_path, delimiter=',')  # TEST:
+                self.graph_data = np.genfromtxt(src_path, delimiter=',')  # TEST:
             else:
                 raise PyperError("Unknown extension: {}".format(extension))
+            self.graph_pyramid = MinMaxPyramid(self.graph_data)  # Computed once, the graph requests windows of it
             graph_object = self.win.findChild(QObject, "dataGraph")
-            data_str = ";".join([str(d) for d in self.graph_data])
-            graph_object.setProperty("points", data_str)
+            graph_object.setProperty("nSamples", self.graph_pyramid.n_samples)
+            QMetaObject.invokeMethod(graph_object, "reload")  # nSamples does not change if the length is the same
             return True
         else:
             return False
         # FIXME: add resampling to fit video length
 
+    @pyqtSlot(float, float, int, result=QByteArray)
+    def get_graph_window(self, start, end, n_pixels):
+        """
+        The points of the graph data needed to draw the window [start, end] on n_pixels
+        (see MinMaxPyramid.get_window_bytes)
+
+        :param float start: The start of the window as a fraction of the series
+        :param float end: The end of the window as a fraction of the series
+        :param int n_pixels: The width of the graph in pixels
+        :return: Interleaved (x, y) float32 with x as a fraction of the series
+        """
+        if self.graph_pyramid is None:
+            return QByteArray()
+        n_samples = self.graph_pyramid.n_samples
+        start_idx = int(start * n_samples)
+        end_idx = int(np.ceil(end * n_samples))
+        return QByteArray(self.graph_pyramid.get_window_bytes(start_idx, end_idx, n_pixels))
+
     @pyqtSlot(QVariant)
     def set_frame_type(self, output_type):
         """
@@ -773,27 +871,84 @@ class TrackerIface(BaseInterface):
         """
         self.output_type = output_type.lower()
 
+    def _get_new_angles(self, start):
+        return video_analysis.get_angles(self.tracker.results.positions[start:])
+
+    def _get_new_distances(self, start):
+        return video_analysis.pos_to_distances(self.tracker.results.positions[start:])
+
     @pyqtSlot()
     def analyse_angles(self):
         """
-        Compute and plot the angles between the segment Pn -> Pn+1 and Pn+1 -> Pn+2
+        Plot the angles between the segment Pn -> Pn+1 and Pn+1 -> Pn+2.
+        The plot is then extended with the new angles each time it is displayed (during the tracking)
         """
         if self.tracker is not None:
-            fig, ax = plt.subplots()
-            angles = video_analysis.get_angles(self.tracker.results.positions)
-            video_analysis.plot_angles(angles, self.get_sampling_freq())
-            self.analysis_image_provider._fig = fig
+            if self.angles_plot is None or self.angles_plot.sampling_freq != self.get_sampling_freq():
+                self.angles_plot = LivePlot(self._get_new_angles, self.get_sampling_freq(),
+                                            ylabel='angle (degrees)', ylim=(-180, 180), reference_line=0)
+            self.analysis_image_provider.set_live_plot(self.angles_plot)
 
     @pyqtSlot()
     def analyse_distances(self):
         """
-        Compute and plot the distances between the points Pn and Pn+1
+        Plot the distances between the points Pn and Pn+1.
+        The plot is then extended with the new distances each time it is displayed (during the tracking)
         """
         if self.tracker is not None:
-            fig, ax = plt.subplots()
-            distances = video_analysis.pos_to_distances(self.tracker.results.positions)
-            video_analysis.plot_distances(distances, self.get_sampling_freq())
-            self.analysisImageProvider2._fig = fig
+            if self.distances_plot is None or self.distances_plot.sampling_freq != self.get_sampling_freq():
+                self.distances_plot = LivePlot(self._get_new_distances, self.get_sampling_freq(),
+                                               ylabel='distance (pixels)', ylim=(0, 10))
+            self.analysisImageProvider2.set_live_plot(self.distances_plot)
+
+    @pyqtSlot()
+    def analyse_occupancy(self):
+        """
+        Plot the occupancy map accumulated so far (available during the tracking)
+        """
+        if self.tracker is not None and self.tracker.results.occupancy is not None:
+            if self.occupancy_plot is None:
+                self.occupancy_plot = MapPlot(title='Occupancy')
+            self.occupancy_plot.update(self.tracker.results.get_occupancy(normalise=True),
+                                       bin_size=self.tracker.results.occupancy.bin_size)
+            self.analysisImageProvider2.set_figure(self.occupancy_plot.fig)  # Marks it dirty
+
+    def _get_kinematics(self):
+        """
+        :return: The OnlineKinematics configured in the [analysis][[kinematics]] section of the config (or None)
+        """
+        kinematics_config = self.params.kinematics_config
+        if not kinematics_config['enabled']:
+            return None
+        return OnlineKinematics(window=kinematics_config['window'],
+                                immobility_speed=kinematics_config['immobility_speed'],
+                                immobility_min_duration=kinematics_config['immobility_min_duration'],
+                                near_wall_distance=kinematics_config['near_wall_distance'])
+
+    @pyqtSlot(result=QVariant)
+    def get_kinematics(self):
+        """
+        The current behavioural state of the specimen (available during the tracking)
+
+        :return: A list of 'name: value' strings (empty if the kinematics are disabled)
+        """
+        if self.tracker is None or self.tracker.results.kinematics is None:
+            return []
+        state = self.tracker.results.kinematics.get_state()
+        return ['{}: {:.2f}'.format(name, value) if isinstance(value, float) else '{}: {}'.format(name, value)
+                for name, value in state.items() if value is not None]
+
+    @pyqtSlot()
+    def analyse_kinematics(self):
+        """
+        Display the current behavioural state of the specimen (see get_kinematics)
+        """
+        lines = self.get_kinematics()
+        if lines:
+            if self.kinematics_plot is None:
+                self.kinematics_plot = TextPlot()
+            self.kinematics_plot.update(lines)
+            self.analysis_image_provider.set_figure(self.kinematics_plot.fig)
 
     @pyqtSlot()
     def save_angles_fig(self):
@@ -808,7 +963,7 @@ class TrackerIface(BaseInterface):
                                              filter="Image (*.png *.jpg)")
             dest_path = dest_path[0]
             if dest_path:
-                imsave(dest_path, self.analysis_image_provider.get_array())
+                imsave(dest_path, self.analysis_image_provider.getArray())
 
     def get_sampling_freq(self):
         return self.tracker._stream.fps
@@ -817,6 +972,7 @@ class TrackerIface(BaseInterface):
         if self.tracker._stream.current_frame_idx < self.n_frames:
             self.display.reload()
             self._update_display_idx()
+            self.results_model.sync()
         else:
             self._stop('End of recording reached')
 
@@ -877,7 +1033,18 @@ class RecorderIface(TrackerIface):
                                                  clear_borders=clear_borders, normalise=normalise,
                                                  plot=True, fast=True, extract_arena=extract_arena,
                                                  camera_calibration=self.params.calib,
-                                                 callback=None, requested_fps=requested_fps)
+                                                 calibration_mode=self.params.calibration_mode,
+                                                 callback=None, requested_fps=requested_fps,
+                                                 scheduling_policy=self.params.scheduling_policy,
+                                                 pyramid_level=self.params.pyramid_level,
+                                                 trajectory_tail=self.params.trajectory_tail,
+                                                 occupancy_bin_size=self.params.occupancy_bin_size,
+                                                 occupancy_weighting=self.params.occupancy_weighting,
+                                                 kinematics=self._get_kinematics(),
+                                                 recording_policy=self._get_recording_policy(requested_fps),
+                                                 recording_triggers=self.params.recording_config['triggers'],
+                                                 motion_threshold=self.params.recording_config['motion_threshold'],
+                                                 save_raw=self.params.recording_config['save_raw'])
         self.stream = self.tracker  # to comply with BaseInterface
         self._set_display()
         self._update_img_provider()
@@ -890,6 +1057,17 @@ class RecorderIface(TrackerIface):
         self.timer.start(self.timer_speed)
         return True
         
+    def _get_recording_policy(self, fps):
+        """
+        :param float fps: The frame rate of the recording
+        :return: The RecordingPolicy configured in the [tracker][[recording]] section of the config
+        """
+        recording_config = self.params.recording_config
+        return create_recording_policy(recording_config['policy'], fps=fps,
+                                       period=recording_config['decimation'],
+                                       pre_trigger=recording_config['pre_trigger'],
+                                       post_trigger=recording_config['post_trigger'])
+
     def get_sampling_freq(self):
         """
         Return the sampling frequency (note this is a maximum and can be limited by a slower CPU)
@@ -905,3 +1083,4 @@ class RecorderIface(TrackerIface):
 
     def get_img(self):
         self.display.reload()
+        self.results_model.sync()
@@ -107,6 +107,8 @@ def main():
     context.setContextProperty('py_viewer', viewer)
     context.setContextProperty('py_tracker', tracker)
     context.setContextProperty('py_recorder', recorder)
+    context.setContextProperty('py_tracker_results', tracker.results_model)
+    context.setContextProperty('py_recorder_results', recorder.results_model)
     context.setContextProperty('py_calibration', calibrater)
     context.setContextProperty('py_editor', editor)
     context.setContextProperty('py_transcoder', transcoder)
@@ -10,53 +10,18 @@ TableView{
     alternatingRowColors: true
     sortIndicatorVisible : false
 
-    function getRow(iface, idx){}
+    // The model is a python ResultsTableModel (py_tracker_results or py_recorder_results).
+    // It formats only the displayed rows and inserts the new rows itself as the tracking progresses.
 
-    function getData(iface){
-        var idx=0;
-        var result;
-        mod.clear();
-        while (true){
-            result = getRow(iface, idx);
-            if (result === -1){
-                break;
-            } else if (result === undefined){
-                break;
-            } else {
-                mod.append({"frameId": parseInt(result[0]),
-                            "time": result[1],
-                            "x": result[2],
-                            "y": result[3],
-                            "area": result[4],
-                            "centerDist": result[5],
-                            "borderDist": result[6],
-                            "measure": result[7],
-                            "inRoi": result[8] == "True"
-                           }
-                           );
-                idx += 1;
-            }
+    function jumpToFrame(frameIdx){
+        var row = model.row_of_frame(frameIdx);
+        if (row !== -1){
+            positionViewAtRow(row, ListView.Center);
+            selection.clear();
+            selection.select(row);
         }
     }
 
-    model: ListModel {
-        id: mod
-        ListElement{ // Necessary to create model with one item at beginnning otherwise all empty (type)
-            frameId: 0  // uint
-            time: "0.0"
-            x: "0.0"  // unsigned float
-            y: "0.0"
-            area: "0.0"
-            centerDist: "-1.0"  // signed float
-            boderDist: "-1.0"
-            measure: "-1.0"
-            inRoi: false
-        }
-    }
-    Component.onCompleted: {
-        getData();
-    }
-
     TableViewColumn{
         role: "frameId"
         title: "Frame"
@@ -102,4 +67,9 @@ TableView{
         title: "in roi"
         width: 60
     }
+    TableViewColumn{
+        role: "dropped"
+        title: "dropped"
+        width: 60
+    }
 }
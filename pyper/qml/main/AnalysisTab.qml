@@ -10,6 +10,18 @@ Rectangle {
     color: Theme.background
     anchors.fill: parent
 
+    property bool livePlots: false  // Whether the live plots (angles, distances) are displayed
+
+    Timer {  // The live plots only draw the data added since the last reload
+        interval: 1000
+        repeat: true
+        running: background.livePlots && background.visible
+        onTriggered: {
+            analysisImage.reload();
+            analysisImage2.reload();
+        }
+    }
+
     Label{
         id: mainLabel
         anchors.horizontalCenter: parent.horizontalCenter
@@ -82,7 +94,7 @@ Rectangle {
                 anchors.left: parent.left
 
                 columns: 2
-                rows: 2
+                rows: 4
                 spacing: 10
                 CustomLabeledButton{
                     width: 80
@@ -90,9 +102,9 @@ Rectangle {
                     label: "Update"
                     onClicked: {
                         if (trackingLabel.checked){
-                            positionsView.getData("tracker")
+                            py_tracker.update_results_model()
                         } else if (recordingLabel.checked){
-                            positionsView.getData("recorder")
+                            py_recorder.update_results_model()
                         }
                     }
                 }
@@ -118,6 +130,7 @@ Rectangle {
                         } else if (recordingLabel.checked){
                             py_recorder.analyse_angles();
                         }
+                        background.livePlots = true;
                         analysisImage.reload();
                     }
                 }
@@ -131,9 +144,45 @@ Rectangle {
                         } else if (recordingLabel.checked){
                             py_recorder.analyse_distances();
                         }
+                        background.livePlots = true;
                         analysisImage2.reload();
                     }
                 }
+                IntInput {
+                    id: frameInput
+                    width: 170
+                    label: "Frame"
+                    tooltip: "Jump to the results of this frame"
+                    minimumValue: 0
+                    onEdited: { positionsView.jumpToFrame(value); }
+                }
+                Item { width: 1; height: 1 }
+                CustomLabeledButton{
+                    width: 80
+                    height: 30
+                    label: "Occupancy"
+                    onClicked: {
+                        if (trackingLabel.checked){
+                            py_tracker.analyse_occupancy();
+                        } else if (recordingLabel.checked){
+                            py_recorder.analyse_occupancy();
+                        }
+                        analysisImage2.reload();
+                    }
+                }
+                CustomLabeledButton{
+                    width: 80
+                    height: 30
+                    label: "Kinematics"
+                    onClicked: {
+                        if (trackingLabel.checked){
+                            py_tracker.analyse_kinematics();
+                        } else if (recordingLabel.checked){
+                            py_recorder.analyse_kinematics();
+                        }
+                        analysisImage.reload();
+                    }
+                }
             }
             AnalysisResultsView {
                 id: positionsView
@@ -143,13 +192,7 @@ Rectangle {
 
                 height: parent.height - trackingControlsGrid.height - parent.spacing - 10  // x for parent.margin
 
-                function getRow(iface, idx){
-                    if (iface === "tracker"){
-                        return py_tracker.get_row(idx);
-                    } else if (iface === "recorder"){
-                        return py_recorder.get_row(idx);
-                    }
-                }
+                model: trackingLabel.checked ? py_tracker_results : py_recorder_results
             }
         }
         Column{
@@ -23,6 +23,24 @@ Rectangle {
         visible: false
         anchors.centerIn: calibrateImage
     }
+    ErrorScreen{
+        id: calibrationErrorScreen
+        objectName: "calibrationLoadingErrorScreen"
+
+        anchors.centerIn: calibrateImage
+        width: 400
+        height: 200
+
+        text: "Loading calibration failed"
+        visible: false
+        z: 1
+        onDoFlashChanged: {
+            if (doFlash) {
+                flash(3000)
+            }
+            doFlash = false
+        }
+    }
 
     Row {
         id: loadControls
@@ -52,6 +70,24 @@ Rectangle {
             anchors.verticalCenter: pathBtn.verticalCenter
             text: "..."
         }
+        CustomButton {
+            id: loadCalibrationBtn
+            width: 40
+            height: width
+            anchors.top: parent.top
+            anchors.topMargin: 10
+
+            iconSource: IconHandler.getPath("document-open.png")
+
+            tooltip: "Load a previously saved calibration (skips the calibration)"
+            onClicked: {
+                if (py_calibration.load_calibration()){  // No images to display with a loaded calibration
+                    vidControls.enabled = false;
+                    displayControls.enabled = false;
+                    matrixControls.enabled = true;
+                }
+            }
+        }
     }
     Video {
         id: calibrateImage
@@ -216,6 +252,18 @@ Rectangle {
                         }
                     }
                 }
+                CustomButton {
+                    id: saveCalibration
+                    width: 25
+                    height: width
+
+                    iconSource: IconHandler.getPath("document-save-as.png")
+
+                    tooltip: "Save the complete calibration (matrices and maps) to reload it later"
+                    onClicked: {
+                        py_calibration.save_calibration();
+                    }
+                }
             }
         }
     }
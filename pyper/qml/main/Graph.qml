@@ -12,53 +12,43 @@ import "../config"
 Rectangle {    
     color: Theme.background
     
-    property string points
+    property var py_iface  // The python interface serving the (decimated) data (get_graph_window)
+    property int nSamples: 0  // The length of the loaded series (set from python, which then calls reload())
+    property real windowStart: 0  // The displayed window of the series (fractions of its length)
+    property real windowEnd: 1
 
-    onPointsChanged: {
-        setPath(points);
-    }
-    onWidthChanged: {
-        setPath(points);
+    onWidthChanged: { reload(); }
+    onWindowStartChanged: { reload(); }
+    onWindowEndChanged: { reload(); }
+
+    function reload() {  // Only the points needed for the width of the graph are transferred (as binary)
+        if (nSamples === 0 || py_iface === undefined || width <= 0) {
+            return;
+        }
+        var buffer = py_iface.get_graph_window(windowStart, windowEnd, Math.round(width));
+        setPath(new Float32Array(buffer));
     }
-    
-    function setPath(points) {
+    function setPath(points) {  // points: interleaved x (fraction of the series), y
         graphCanvas.resetPath();
-        var pointsString = points.split(";");
-        var ptString;
-        var x;
-        var y;
-        var ys = [];
-        var xs = [];
-        for (var i=0; i < pointsString.length; i++) {
-            ptString = pointsString[i];
-            y = parseFloat(ptString);
-            ys.push(y);
-            xs.push(i);
+        if (points.length < 4) {
+            return;
+        }
+        var minY = Infinity;
+        var maxY = -Infinity;
+        for (var i=1; i < points.length; i+=2) {
+            minY = Math.min(minY, points[i]);
+            maxY = Math.max(maxY, points[i]);
         }
-        scalePath(xs, ys);
-        for (var i=0; i < ys.length; i++) {
-            x = xs[i];
-            y = ys[i];
+        var scalingY = (50 - 10) / ((maxY - minY) || 1);  // the graph height in pixels  // FIXME: use height
+        var scalingX = width / (windowEnd - windowStart);
+        for (var i=0; i < points.length; i+=2) {
+            var x = (points[i] - windowStart) * scalingX;
+            var y = (points[i + 1] - minY) * scalingY + 5; // FIXME:
             graphCanvas.path.push(Qt.point(x, y));
         }
+        graphCanvas.clearCanvas();
         graphCanvas.drawPath();
-    }
-    function scalePath(xs, ys) {
-        var minX = Math.min.apply(null, xs);
-        var maxX = Math.max.apply(null, xs);
-        var minY = Math.min.apply(null, ys);
-        var maxY = Math.max.apply(null, ys);
-        var scalingY = (50 - 10) / (maxY - minY);  // the graph height in pixels  // FIXME: use height
-        var scalingX = graph.width / (maxX - minX);  // FIXME: use width - prograsbarlabel.width
-        
-        for (var i=0; i < ys.length; i++) {
-            ys[i] -= minY;
-            ys[i] *= scalingY;
-            ys[i] +=5; // FIXME:
-            
-            //                xs[i] -= minX;
-            xs[i] *= scalingX;
-        }
+        graphCanvas.requestPaint();
     }
     
     Canvas {
@@ -88,11 +78,10 @@ Rectangle {
                 ctx.lineWidth = 3.0;
                 ctx.strokeStyle = drawingColor;
                 ctx.beginPath();
+                ctx.moveTo(lastX, lastY);
 
                 for (var i=1; i < path.length; i++) {
                     currentPoint = path[i];
-
-                    ctx.moveTo(lastX, lastY);
                     ctx.lineTo(currentPoint.x, currentPoint.y);
 
                     lastX = currentPoint.x;
@@ -140,6 +140,7 @@ Rectangle {
     Graph {
         id: graph
         objectName: "dataGraph"
+        py_iface: py_tracker
 
         width: trackerDisplay.progressBarWidth
         anchors.left: trackerDisplay.left
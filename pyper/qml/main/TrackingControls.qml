@@ -193,6 +193,22 @@ Column {
                     root.updateTracker();
                 }
             }
+            IntInput {
+                width: parent.width
+                label: "Pyr."
+                tooltip: "Pyramid level: detect on frames downscaled by 2^level, then refine at full resolution (0 to disable)"
+                value: root.py_params_iface.get_pyramid_level()
+                minimumValue: 0
+                maximumValue: 3
+                onEdited: {
+                    root.py_params_iface.set_pyramid_level(value);
+                    root.updateTracker();
+                }
+                function reload() {
+                    root.py_params_iface.get_pyramid_level();
+                    root.updateTracker();
+                }
+            }
         }
     }
     Frame {
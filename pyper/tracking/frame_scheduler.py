@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+**************************
+The frame_scheduler module
+**************************
+
+This module decides which frames of a live video stream get tracked.
+When the tracking cannot keep up with the acquisition rate of the camera, frames
+accumulate in the camera buffer and the results drift from the real time.
+The FrameScheduler makes the behaviour explicit through one of the following policies:
+
+    * 'all': Every frame is processed (the default, the acquisition may lag behind)
+    * 'latest': All the frames that accumulated while the previous frame was processed are dropped
+    * 'adaptive': The processing is first degraded (as with the `fast` option of the Tracker) and, \
+    if this is not enough, only every Nth frame is processed with N adapted to the processing time.
+
+The dropped frames are still counted so that the results stay aligned with the frame indices.
+"""
+
+from __future__ import division
+
+import math
+from time import time
+
+from pyper.exceptions.exceptions import PyperValueError
+
+SCHEDULING_POLICIES = ('all', 'latest', 'adaptive')
+
+
+class FrameScheduler(object):
+    """
+    Computes the number of frames to drop before the next read of a live stream
+    based on the duration of the processing of the previous frames.
+    """
+    RESTORE_RATIO = 0.5  # fraction of the frame period under which full processing is restored
+
+    def __init__(self, fps, policy='all', max_step=8, smoothing=0.2):
+        """
+        :param float fps: The acquisition rate of the stream
+        :param str policy: One of SCHEDULING_POLICIES
+        :param int max_step: The maximum N for the 'adaptive' policy (process 1 frame every N)
+        :param float smoothing: The weight of the last frame in the moving average of the processing duration
+        """
+        if policy not in SCHEDULING_POLICIES:
+            raise PyperValueError("Expected one of {} for policy, got: {}".format(SCHEDULING_POLICIES, policy))
+        self.fps = fps
+        self.period = 1. / fps
+        self.policy = policy
+        self.max_step = max_step
+        self.smoothing = smoothing
+        self.reset()
+
+    def reset(self):
+        self.start_time = None
+        self.avg_duration = None
+        self.step = 1
+        self.degrade = False  # Whether the processing should be reduced (i.e. `fast`)
+        self.n_dropped = 0
+
+    def start(self, start_time=None):
+        """
+        Sets the reference time of the first frame of the stream
+
+        :param float start_time: The time of the first frame (now if None)
+        """
+        self.start_time = time() if start_time is None else start_time
+
+    def get_n_late_frames(self, current_frame_idx, now=None):
+        """
+        The number of frames that the camera acquired since current_frame_idx was read
+
+        :param int current_frame_idx: The index of the last frame read from the stream
+        :param float now: The current time
+        :rtype: int
+        """
+        if self.start_time is None:
+            self.start(now)
+            return 0
+        now = time() if now is None else now
+        latest_frame_idx = int((now - self.start_time) * self.fps)  # The last frame the camera should have sent
+        if latest_frame_idx < current_frame_idx:  # The camera is slower than its nominal rate, re-anchor the clock
+            self.start_time = now - current_frame_idx * self.period
+            return 0
+        return max(latest_frame_idx - current_frame_idx - 1, 0)
+
+    def get_n_frames_to_drop(self, current_frame_idx, now=None):
+        """
+        The number of frames to drop before reading the next frame to process
+
+        :param int current_frame_idx: The index of the last frame read from the stream
+        :param float now: The current time
+        :rtype: int
+        """
+        if self.policy == 'all':
+            return 0
+        n_late = self.get_n_late_frames(current_frame_idx, now)
+        if self.policy == 'latest':
+            n_frames = n_late
+        else:  # Only drop what actually accumulated (dropping future frames would block)
+            n_frames = min(self.step - 1, n_late)
+        self.n_dropped += n_frames
+        return n_frames
+
+    def frame_processed(self, duration):
+        """
+        Updates the processing duration estimate and, for the 'adaptive' policy, the processing mode
+
+        :param float duration: The time (s) it took to process the last frame
+        """
+        if self.avg_duration is None:
+            self.avg_duration = duration
+        else:
+            self.avg_duration += self.smoothing * (duration - self.avg_duration)
+        if self.policy == 'adaptive':
+            self._adapt()
+
+    def _adapt(self):
+        n_periods = self.avg_duration / self.period
+        if n_periods > 1:
+            if not self.degrade:
+                self.degrade = True
+                self.avg_duration = None  # Measure the new mode from scratch
+            else:
+                self.step = min(self.max_step, int(math.ceil(n_periods)))
+        elif self.step > 1:
+            self.step = max(1, int(math.ceil(n_periods)))
+        elif self.degrade and n_periods < FrameScheduler.RESTORE_RATIO:
+            self.degrade = False
+            self.avg_duration = None
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+**************************
+The instrumentation module
+**************************
+
+This module records where the time goes during the tracking.
+The duration of each stage of the processing of a frame (e.g. read, preprocess, contours...)
+is accumulated in a histogram with logarithmic bins and events (e.g. missed frames,
+size rejections) are counted. The overhead is a couple of calls to time() per stage.
+
+The data is available as:
+
+    * a summary at the end of the run (get_summary() / print_summary())
+    * a rate limited log line during the run (log_if_due())
+    * a machine readable JSON dump (dump())
+"""
+from __future__ import division, print_function
+
+import bisect
+import json
+from collections import OrderedDict
+from time import time
+
+HISTOGRAM_EDGES = [10 ** (exponent / 4.) for exponent in range(-24, 5)]  # 1us to 10s, 4 bins per decade
+
+
+class StageStats(object):
+    """
+    The durations of one stage as a histogram with logarithmic bins plus the exact count, total, min and max
+    """
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_EDGES) + 1)
+        self.n = 0
+        self.total = 0.
+        self.min = float('inf')
+        self.max = 0.
+
+    def add(self, duration):
+        self.counts[bisect.bisect_right(HISTOGRAM_EDGES, duration)] += 1
+        self.n += 1
+        self.total += duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+
+    def get_mean(self):
+        return self.total / self.n if self.n else 0.
+
+    def get_percentile(self, percentile):
+        """
+        The percentile estimated from the histogram (upper edge of the bin, clipped to the max)
+
+        :param float percentile: The percentile (0-100)
+        :rtype: float
+        """
+        if not self.n:
+            return 0.
+        target = self.n * percentile / 100.
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                upper_edge = HISTOGRAM_EDGES[i] if i < len(HISTOGRAM_EDGES) else self.max
+                return min(upper_edge, self.max)
+        return self.max
+
+    def to_dict(self):
+        return OrderedDict((('n', self.n), ('total', self.total), ('mean', self.get_mean()),
+                            ('min', self.min if self.n else 0.), ('max', self.max),
+                            ('p50', self.get_percentile(50)), ('p95', self.get_percentile(95)),
+                            ('histogram', self.counts)))
+
+
+class _StageTimer(object):
+    """
+    The context manager returned by Instrumentation.stage() (one instance per stage, reused)
+    """
+    def __init__(self, stats):
+        self.stats = stats
+        self.start = None
+
+    def __enter__(self):
+        self.start = time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:  # e.g. the read that raises EOFError is not a frame
+            self.stats.add(time() - self.start)
+        return False
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class Instrumentation(object):
+    """
+    Collects the per stage durations and the event counters of a Tracker
+
+    Use as follows:
+
+    >>> instrumentation = Instrumentation()
+    >>> with instrumentation.stage('read'):
+    ...     frame = stream.read()
+    >>> instrumentation.count('misses')
+    >>> instrumentation.frame_done()
+    >>> instrumentation.log_if_due()
+    >>> instrumentation.print_summary()
+    """
+    NULL_TIMER = _NullTimer()
+
+    def __init__(self, enabled=True, log_period=5.):
+        """
+        :param bool enabled: Whether to record anything (a disabled instance has no overhead)
+        :param float log_period: The minimum time (s) between two log lines
+        """
+        self.enabled = enabled
+        self.log_period = log_period
+        self.reset()
+
+    def reset(self):
+        self.stages = OrderedDict()
+        self.counters = OrderedDict()
+        self._timers = {}
+        self.n_frames = 0
+        self.start_time = time()
+        self._last_log_time = self.start_time
+        self._last_log_n_frames = 0
+
+    def stage(self, name):
+        """
+        :param str name: The name of the stage
+        :return: A context manager that records the duration of its block under name
+        """
+        if not self.enabled:
+            return Instrumentation.NULL_TIMER
+        try:
+            return self._timers[name]
+        except KeyError:
+            self.stages[name] = StageStats()
+            timer = self._timers[name] = _StageTimer(self.stages[name])
+            return timer
+
+    def add_duration(self, name, duration):
+        """
+        Records a duration that was measured elsewhere
+
+        :param str name: The name of the stage
+        :param float duration: The duration (s)
+        """
+        if self.enabled:
+            if name not in self.stages:
+                self.stage(name)
+            self.stages[name].add(duration)
+
+    def count(self, name, n=1):
+        """
+        Increments the counter name by n
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def frame_done(self):
+        self.n_frames += 1
+
+    def get_fps(self):
+        duration = time() - self.start_time
+        return self.n_frames / duration if duration > 0 else 0.
+
+    def log_if_due(self, now=None):
+        """
+        Prints a single line with the processing rate and the average duration of each stage
+        if log_period has elapsed since the last line
+
+        :param float now: The current time
+        :return: Whether a line was printed
+        """
+        if not self.enabled:
+            return False
+        now = time() if now is None else now
+        elapsed = now - self._last_log_time
+        if elapsed < self.log_period:
+            return False
+        fps = (self.n_frames - self._last_log_n_frames) / elapsed
+        print(self._format_line(fps))
+        self._last_log_time = now
+        self._last_log_n_frames = self.n_frames
+        return True
+
+    def _format_line(self, fps):
+        stages = ', '.join('{} {:.2f}ms'.format(name, stats.get_mean() * 1000) for name, stats in self.stages.items())
+        counters = ', '.join('{} {}'.format(name, value) for name, value in self.counters.items())
+        line = '{:.1f} fps | {}'.format(fps, stages)
+        if counters:
+            line += ' | ' + counters
+        return line
+
+    def get_summary(self):
+        """
+        :return: A dictionary with the number of frames, the overall rate, the statistics of each stage \
+        and the counters
+        """
+        return OrderedDict((('n_frames', self.n_frames), ('fps', self.get_fps()),
+                            ('stages', OrderedDict((name, stats.to_dict()) for name, stats in self.stages.items())),
+                            ('counters', OrderedDict(self.counters)),
+                            ('histogram_edges', HISTOGRAM_EDGES)))
+
+    def print_summary(self):
+        print('{} frames at {:.1f} fps'.format(self.n_frames, self.get_fps()))
+        print('{:15s} {:>8s} {:>10s} {:>10s} {:>10s} {:>10s}'.format('stage', 'n', 'mean (ms)', 'p50 (ms)',
+                                                                     'p95 (ms)', 'max (ms)'))
+        for name, stats in self.stages.items():
+            print('{:15s} {:8d} {:10.3f} {:10.3f} {:10.3f} {:10.3f}'
+                  .format(name, stats.n, stats.get_mean() * 1000, stats.get_percentile(50) * 1000,
+                          stats.get_percentile(95) * 1000, stats.max * 1000))
+        for name, value in self.counters.items():
+            print('{}: {}'.format(name, value))
+
+    def dump(self, dest_path):
+        """
+        Saves the summary as JSON
+
+        :param str dest_path: The destination file path
+        """
+        with open(dest_path, 'w') as out_file:
+            json.dump(self.get_summary(), out_file, indent=2)
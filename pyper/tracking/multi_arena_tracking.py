@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+*******************************
+The multi_arena_tracking module
+*******************************
+
+This module allows tracking one specimen in each of several arenas (e.g. cages) filmed by the same camera.
+Instead of running one Tracker per arena, which decodes and pre-processes the video once per arena,
+the MultiArenaTracker decodes and pre-processes each frame once, computes the difference with the
+background once and labels the objects of the resulting mask once.
+The best object of each arena is then selected from that single label map.
+"""
+from __future__ import division
+
+import numpy as np
+import cv2
+
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.tracking.tracking import Tracker
+from pyper.tracking.tracking_results import TrackingResults
+
+
+class MultiArenaTracker(Tracker):
+    """
+    A Tracker that tracks one specimen per arena and produces one TrackingResults per arena.
+
+    .. note:: The position of the specimen is the centroid of the pixels of the selected object \
+    and its area the number of these pixels (instead of the moments of its contour).
+
+    .. note:: The positions, areas, measures and distances are stored in self.arenas_results. \
+    self.results only keeps the frame times (its positions stay at their default).
+
+    .. note:: The 'points' calibration mode, the pyramid detection (pyramid_level) and the tracking region ROI \
+    are not supported (the arenas delimit the detection instead).
+
+    Use as follows:
+
+    >>> arenas = RoiCollection([Rectangle(0, 0, 320, 480), Rectangle(320, 0, 320, 480)])
+    >>> tracker = MultiArenaTracker(arenas, src_file_path='cages.avi', threshold=30)
+    >>> left_positions, right_positions = tracker.track()
+    """
+    def __init__(self, arenas, *args, **kwargs):
+        """
+        :param RoiCollection arenas: The arenas each containing one specimen
+
+        For the other parameters, see Tracker
+        """
+        Tracker.__init__(self, *args, **kwargs)
+        if self._calibrate_points_only():
+            raise PyperValueError("The 'points' calibration mode is not supported with multiple arenas, "
+                                  "use calibration_mode='frame'")
+        if self.pyramid_level > 0:
+            raise PyperValueError('The pyramid detection is not supported with multiple arenas, '
+                                  'got pyramid_level={}'.format(self.pyramid_level))
+        self.arenas = arenas
+        self.arenas_results = [TrackingResults() for _ in arenas]
+        self._arenas_map = None  # The image of arena indices (0 is outside all arenas)
+
+    def track(self, roi=None, record=False, check_fps=False, reset=True):
+        """
+        See Tracker.track
+
+        :returns: The list of positions of each arena
+        """
+        Tracker.track(self, roi=roi, record=record, check_fps=check_fps, reset=reset)
+        return [results.positions for results in self.arenas_results]
+
+    def track_frame(self, pbar=None, record=False, requested_output='raw'):
+        """
+        See Tracker.track_frame
+
+        :returns: (frame, positions, distances) where positions and distances (from the arena) \
+        hold the last value of each arena
+        """
+        result = Tracker.track_frame(self, pbar=pbar, record=record, requested_output=requested_output)
+        if result is None:
+            return None
+        return (result[0], [results.get_last_position() for results in self.arenas_results],
+                [results.get_last_dist_from_arena_pair() for results in self.arenas_results])
+
+    def set_tracking_region_roi(self, roi):
+        if roi is not None:
+            raise PyperValueError('The tracking region ROI is not supported with multiple arenas '
+                                  '(each arena is a tracking region)')
+        Tracker.set_tracking_region_roi(self, roi)
+
+    def _set_default_results(self, t=None):
+        Tracker._set_default_results(self, t)
+        for results in self.arenas_results:
+            if self.infer_location:
+                results.repeat_last(t)
+            else:
+                results.append_defaults(t)
+
+    def _set_dropped_results(self):
+        Tracker._set_dropped_results(self)
+        for results in self.arenas_results:
+            results.append_dropped()
+
+    def set_measure_rois(self, rois, statistics=('mean',)):
+        Tracker.set_measure_rois(self, rois, statistics)
+        for results in self.arenas_results:
+            results.set_measure_names(self.results.measure_names)
+
+    def _get_arenas_map(self, shape):
+        """
+        Rasterises the arenas once per frame shape. Where arenas overlap, the last one wins.
+
+        :param tuple shape: The shape of the silhouette
+        :return: The image of arena indices (arena i is labelled i + 1)
+        """
+        if self._arenas_map is None or self._arenas_map.shape != shape[:2]:
+            arenas_map = np.zeros(shape[:2], dtype=np.int32)
+            for i, arena in enumerate(self.arenas):
+                cv2.drawContours(arenas_map, [arena.points], 0, i + 1, -1)
+            self._arenas_map = arenas_map
+        return self._arenas_map
+
+    def _get_objects_per_arena(self, silhouette):
+        """
+        Labels the objects of the silhouette and counts, in a single pass, the pixels of each object in each arena
+
+        :param silhouette: The binary mask of the current frame
+        :return: (counts, areas, centroids) where counts has shape (n_arenas + 1, n_objects)
+        """
+        n_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(np.asarray(silhouette, dtype=np.uint8))
+        arenas_map = self._get_arenas_map(silhouette.shape)
+        n_arenas = len(self.arenas)
+        counts = np.bincount((arenas_map * n_labels + labels).ravel(), minlength=(n_arenas + 1) * n_labels)
+        counts = counts.reshape(n_arenas + 1, n_labels)
+        counts[:, 0] = 0  # The background label
+        return counts, stats[:, cv2.CC_STAT_AREA], centroids
+
+    def _track_frame(self, frame, requested_color='r', requested_output='raw'):
+        """
+        Get the position of the specimen in each arena and append to the results of each arena
+        Returns the mask of the current frame with the specimens potentially drawn
+
+        See Tracker._track_frame
+        """
+        processed_frame = self._pre_process_frame(frame)
+        silhouette, diff = self._get_silhouette(processed_frame)
+        counts, areas, centroids = self._get_objects_per_arena(silhouette)
+
+        plot_silhouette, color_is_default = self._get_plot_silhouette(requested_output, frame, diff, silhouette)
+        color = 'w' if color_is_default else requested_color
+
+        measure = self.measure_callback(frame)
+        contour_found = False
+        for i, (arena, results) in enumerate(zip(self.arenas, self.arenas_results)):
+            inside_areas = np.where(counts[i + 1] == areas, areas, 0)  # Only objects fully inside the arena
+            best_label = inside_areas.argmax()
+            area = inside_areas[best_label]
+            if self.plot:
+                self.annotations.add_contour(arena.points, 'm')
+            if area == 0:
+                self.instrumentation.count('misses')
+            elif self.min_area < area < self.max_area:
+                position = tuple(centroids[best_label])
+                distances = (arena.dist_from_centre(position), arena.dist_from_border(position))
+                results.update(position, float(area), measure, distances)
+                self._check_arena_teleportation(i, results)
+                if self.plot:
+                    self.annotations.add_circle(position, 3, color)
+                contour_found = True
+            else:
+                self._handle_bad_size_contour(area, plot_silhouette if self.plot else None)
+            results.accumulate()  # The results of the frame are final
+        return contour_found, plot_silhouette
+
+    def _check_arena_teleportation(self, arena_idx, results):
+        """
+        Contrary to Tracker._check_teleportation, the tracking is not stopped because the other arenas are not affected.
+        The position is reset to the default instead.
+        """
+        if len(results) < 2 or results.get_last_pos_pair()[0] == results.default_pos:
+            return
+        if (results.get_last_movement_vector() > self.teleportation_threshold).any():
+            self.instrumentation.count('teleportations')
+            self._fast_print('Frame: {}, arena {}, specimen teleported from {} to {}'
+                             .format(self._stream.current_frame_idx, arena_idx, *results.get_last_pos_pair()))
+            results.overwrite_last_pos(results.default_pos)
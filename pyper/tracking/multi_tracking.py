@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+*************************
+The multi_tracking module
+*************************
+
+This module allows tracking several video streams (cameras or video files) from a single process.
+Each stream gets its own Tracker (and thus its own results) and the frames of all the streams
+are processed concurrently by a shared pool of worker threads (OpenCV releases the GIL during
+most of the image processing).
+Because all the trackers share the same time reference, the results of the different streams
+can be synchronised on the capture timestamps after (or during) the acquisition.
+The timestamp of a frame of a camera is taken as soon as it is read from its stream, and the timestamp of
+a frame of a video file is its time in the video (see Tracker._get_frame_time), so it does not depend on
+how long the frame waits for a worker or takes to process.
+"""
+from __future__ import division
+
+import threading
+from multiprocessing.pool import ThreadPool
+from time import time
+
+import numpy as np
+
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.tracking.tracking import Tracker
+
+
+class MultiStreamTracker(object):
+    """
+    Manages one Tracker per stream and runs them concurrently on a shared pool of threads
+
+    Use as follows:
+
+    >>> multi_tracker = MultiStreamTracker([0, 1], dest_file_paths=['cam0.avi', 'cam1.avi'], threshold=30)
+    >>> positions = multi_tracker.track(record=True)  # One list of positions per camera
+    >>> multi_tracker.print_fps()
+    >>> frames_table = multi_tracker.get_synchronised_indices(tolerance=0.01)
+    """
+    def __init__(self, sources, dest_file_paths=None, n_workers=None, tracker_class=Tracker, **tracker_kwargs):
+        """
+        :param list sources: The camera indices (int) or video file paths (str) to track
+        :param list dest_file_paths: The path to save the video of each source to (required for cameras)
+        :param int n_workers: The number of threads in the pool (defaults to one per stream)
+        :param tracker_class: The Tracker (sub)class to instantiate for each stream
+        :param tracker_kwargs: The parameters (see Tracker) shared by all the trackers
+        """
+        if dest_file_paths is None:
+            dest_file_paths = [None] * len(sources)
+        if len(dest_file_paths) != len(sources):
+            raise PyperValueError("Expected {} destination paths, got {}".format(len(sources), len(dest_file_paths)))
+        self.sources = sources
+        self.trackers = [self._create_tracker(tracker_class, src, dest, tracker_kwargs)
+                         for src, dest in zip(sources, dest_file_paths)]
+        self.n_workers = len(sources) if n_workers is None else n_workers
+
+        self.start_time = None
+        self._reset_counters()
+        self._record = False
+        self._stop_requested = False
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+
+    @staticmethod
+    def _create_tracker(tracker_class, source, dest_file_path, tracker_kwargs):
+        if isinstance(source, int):
+            return tracker_class(src_file_path=None, dest_file_path=dest_file_path, cam_idx=source, **tracker_kwargs)
+        else:
+            return tracker_class(src_file_path=source, dest_file_path=dest_file_path, **tracker_kwargs)
+
+    def __len__(self):
+        return len(self.trackers)
+
+    def _reset_counters(self):
+        self.n_frames = [0] * len(self)
+        self.end_times = [None] * len(self)
+        self.errors = [None] * len(self)
+        self._n_active = len(self)
+
+    def track(self, record=False):
+        """
+        Tracks all the streams until they all reach their end (ctrl+c to stop if acquiring)
+
+        :param bool record: Whether to save the frames being processed
+        :returns: The list of positions of each stream
+        """
+        self._reset_counters()
+        self._record = record
+        self._stop_requested = False
+        self._finished.clear()
+
+        self.start_time = time()
+        for tracker in self.trackers:
+            tracker.prepare_run()
+            tracker.results.start_time = self.start_time  # Common reference for the capture times
+
+        pool = ThreadPool(self.n_workers)
+        for stream_idx in range(len(self)):
+            self._submit(pool, stream_idx)
+        try:
+            while not self._finished.wait(0.1):  # Timeout keeps the main thread responsive to ctrl+c
+                pass
+        except KeyboardInterrupt:
+            self.stop()
+            self._finished.wait()
+        pool.close()
+        pool.join()
+        for tracker in self.trackers:
+            tracker.close_pipelines()
+        for source, err in zip(self.sources, self.errors):
+            if err is not None:
+                print("Stream {} stopped because of error: {}".format(source, err))
+        return [tracker.results.positions for tracker in self.trackers]
+
+    def stop(self):
+        """
+        Requests all the streams to stop after their current frame
+        """
+        self._stop_requested = True
+
+    def _submit(self, pool, stream_idx):
+        pool.apply_async(self._track_stream_frame, (stream_idx,),
+                         callback=lambda is_running: self._on_frame_tracked(pool, stream_idx, is_running))
+
+    def _on_frame_tracked(self, pool, stream_idx, is_running):
+        """
+        Schedules the next frame of the stream or marks the stream as finished
+
+        :param pool: The pool to submit the next frame to
+        :param int stream_idx: The index of the stream (in self.trackers)
+        :param bool is_running: Whether the stream has more frames
+        """
+        if is_running and self._stop_requested:
+            self.trackers[stream_idx]._stream.stop_recording('Recording stopped by user')
+            is_running = False
+        if is_running:
+            self._submit(pool, stream_idx)
+        else:
+            self.end_times[stream_idx] = time()
+            with self._lock:
+                self._n_active -= 1
+                if self._n_active == 0:
+                    self._finished.set()
+
+    def _track_stream_frame(self, stream_idx):
+        """
+        Tracks the next frame of the stream at stream_idx
+
+        :param int stream_idx: The index of the stream (in self.trackers)
+        :return: Whether the stream has more frames
+        :rtype: bool
+        """
+        tracker = self.trackers[stream_idx]
+        try:
+            tracker.current_frame_idx = tracker._stream.current_frame_idx + 1
+            tracker.track_frame(record=self._record)
+            self.n_frames[stream_idx] += 1
+            return True
+        except EOFError:
+            return False
+        except Exception as err:  # Only this stream should stop
+            self.errors[stream_idx] = err
+            return False
+
+    def _get_duration(self, stream_idx):
+        end_time = self.end_times[stream_idx]
+        return (time() if end_time is None else end_time) - self.start_time
+
+    def get_fps(self):
+        """
+        The processing rate of each stream
+
+        :returns: The list of frames per second (one per stream)
+        """
+        if self.start_time is None:
+            return [0.] * len(self)
+        return [n_frames / self._get_duration(i) for i, n_frames in enumerate(self.n_frames)]
+
+    def get_aggregate_fps(self):
+        """
+        The total number of frames processed per second (all streams combined)
+        """
+        if self.start_time is None:
+            return 0.
+        duration = max(self._get_duration(i) for i in range(len(self)))
+        return sum(self.n_frames) / duration
+
+    def print_fps(self):
+        for source, fps in zip(self.sources, self.get_fps()):
+            print("Stream {}: {:.2f} fps".format(source, fps))
+        print("All streams: {:.2f} fps".format(self.get_aggregate_fps()))
+
+    def get_synchronised_indices(self, reference_idx=0, tolerance=None):
+        """
+        Matches each frame of the reference stream with the frame of each stream
+        that has the closest capture time (the time the frame was read, see results.times).
+
+        :param int reference_idx: The index of the stream to use as reference
+        :param float tolerance: The maximum time difference (s) for a match (unmatched frames are -1)
+        :returns: An array of frame indices of shape (n_reference_frames, n_streams)
+        """
+        ref_times = np.array(self.trackers[reference_idx].results.times)
+        indices = np.full((len(ref_times), len(self)), -1, dtype=np.int64)
+        for i, tracker in enumerate(self.trackers):
+            times = np.array(tracker.results.times)
+            if not len(times):
+                continue
+            right = np.clip(np.searchsorted(times, ref_times), 0, len(times) - 1)
+            left = np.clip(right - 1, 0, len(times) - 1)
+            use_left = np.abs(ref_times - times[left]) <= np.abs(times[right] - ref_times)
+            nearest = np.where(use_left, left, right)
+            if tolerance is not None:
+                nearest[np.abs(times[nearest] - ref_times) > tolerance] = -1
+            indices[:, i] = nearest
+        return indices
+
+    def get_synchronised_positions(self, reference_idx=0, tolerance=None):
+        """
+        The positions of all the streams resampled on the frames of the reference stream
+
+        :param int reference_idx: The index of the stream to use as reference
+        :param float tolerance: The maximum time difference (s) for a match
+        :returns: An array of shape (n_reference_frames, n_streams, 2) (NaN if unmatched or not detected)
+        """
+        indices = self.get_synchronised_indices(reference_idx, tolerance)
+        positions = np.full(indices.shape + (2,), np.nan)
+        for i, tracker in enumerate(self.trackers):
+            results = tracker.results
+            stream_positions = np.array(results.positions, dtype=np.float64).reshape(-1, 2)
+            stream_positions[(stream_positions == results.default_pos).all(axis=1)] = np.nan
+            matched = indices[:, i] >= 0
+            positions[matched, i] = stream_positions[indices[matched, i]]
+        return positions
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+**************************
+The parameter_sweep module
+**************************
+
+This module helps choosing the detection parameters for a new setup.
+Instead of tracking the whole video once per combination of parameters, the ParameterSweep
+decodes, pre-processes and compares each frame to the background once and evaluates a grid
+of detection parameters (threshold, min_area, max_area and n_sds) against that single
+difference image.
+Each set of parameters gets its own TrackingResults and a quality summary
+(detection rate, teleportations, size rejections).
+"""
+from __future__ import division
+
+import itertools
+
+import cv2
+
+from pyper.contours.object_contour import ObjectContour
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.tracking.tracking import Tracker
+from pyper.tracking.tracking_results import TrackingResults
+
+SWEEPABLE_PARAMETERS = ('threshold', 'min_area', 'max_area', 'n_sds')
+
+
+def expand_grid(param_grid):
+    """
+    Expands a grid of parameters to the list of all the combinations
+
+    :param dict param_grid: The values to test for each parameter (e.g. {'threshold': [20, 30], 'min_area': [50]})
+    :return: The list of parameter sets (one dictionary per combination)
+    """
+    for name in param_grid:
+        if name not in SWEEPABLE_PARAMETERS:
+            raise PyperValueError("Expected parameters in {}, got: {}".format(SWEEPABLE_PARAMETERS, name))
+    names = sorted(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+
+class SweepSummary(object):
+    """
+    The quality counters of the tracking with one set of parameters
+    """
+    def __init__(self, params):
+        """
+        :param dict params: The set of parameters
+        """
+        self.params = params
+        self.n_frames = 0
+        self.n_detected = 0
+        self.n_not_found = 0
+        self.n_too_small = 0
+        self.n_too_big = 0
+        self.n_teleportations = 0
+
+    def get_detection_rate(self):
+        return self.n_detected / self.n_frames if self.n_frames else 0.
+
+    def to_dict(self):
+        summary = dict(self.params)
+        summary.update(n_frames=self.n_frames, n_detected=self.n_detected, n_not_found=self.n_not_found,
+                       n_too_small=self.n_too_small, n_too_big=self.n_too_big,
+                       n_teleportations=self.n_teleportations, detection_rate=self.get_detection_rate())
+        return summary
+
+
+class ParameterSweep(Tracker):
+    """
+    A Tracker that evaluates several sets of detection parameters in a single pass over the video.
+    The parameters that are not in the grid are taken from the Tracker parameters.
+
+    .. note:: Contrary to the Tracker, a teleportation does not stop the sweep, it is counted \
+    and the position is reset to the default.
+
+    .. note:: The sets of parameters are always evaluated at full resolution (pyramid_level is ignored, \
+    the pyramid detection stays within pyramid_tolerance of the full resolution one).
+
+    Use as follows:
+
+    >>> sweep = ParameterSweep({'threshold': [20, 30, 40], 'min_area': [50, 100]}, src_file_path='rig.avi')
+    >>> sweep.track()
+    >>> sweep.print_summaries()
+    >>> best_params = sweep.get_best_params()
+    """
+    def __init__(self, param_grid, *args, **kwargs):
+        """
+        :param dict param_grid: The values to test for each parameter (in SWEEPABLE_PARAMETERS)
+
+        For the other parameters, see Tracker
+        """
+        Tracker.__init__(self, *args, **kwargs)
+        self.parameter_sets = []
+        for params in expand_grid(param_grid):
+            full_params = {'threshold': self.threshold, 'min_area': self.min_area,
+                           'max_area': self.max_area, 'n_sds': self.bg.n_sds}
+            full_params.update(params)
+            self.parameter_sets.append(full_params)
+        self.sweep_results = [TrackingResults() for _ in self.parameter_sets]
+        self.summaries = [SweepSummary(params) for params in self.parameter_sets]
+        self._threshold_maps = {}
+        self._threshold_maps_source = None  # The background std the threshold maps were computed from
+
+    def track(self, roi=None, record=False, check_fps=False, reset=True):
+        """
+        See Tracker.track
+
+        :returns: The list of positions of each set of parameters
+        """
+        if reset:
+            for results in self.sweep_results:
+                results.reset()
+            self.summaries = [SweepSummary(params) for params in self.parameter_sets]
+        Tracker.track(self, roi=roi, record=record, check_fps=check_fps, reset=reset)
+        return [results.positions for results in self.sweep_results]
+
+    def _set_default_results(self, t=None):
+        Tracker._set_default_results(self, t)
+        for results in self.sweep_results:
+            if self.infer_location:
+                results.repeat_last(t)
+            else:
+                results.append_defaults(t)
+
+    def _set_dropped_results(self):
+        Tracker._set_dropped_results(self)
+        for results in self.sweep_results:
+            results.append_dropped()
+
+    def set_measure_rois(self, rois, statistics=('mean',)):
+        Tracker.set_measure_rois(self, rois, statistics)
+        for results in self.sweep_results:
+            results.set_measure_names(self.results.measure_names)
+
+    def _get_threshold_map(self, n_sds):
+        """
+        The threshold map of the background (SD mode) for n_sds (computed once per value)
+        """
+        if self._threshold_maps_source is not self.bg.std:  # Background rebuilt
+            self._threshold_maps = {}
+            self._threshold_maps_source = self.bg.std
+        if n_sds not in self._threshold_maps:
+            bg_n_sds = self.bg.n_sds
+            self.bg.n_sds = n_sds
+            self._threshold_maps[n_sds] = self.bg.get_threshold_map()
+            self.bg.n_sds = bg_n_sds
+        return self._threshold_maps[n_sds]
+
+    def _get_mask_key(self, params):
+        """
+        The parameter that the mask depends on (the areas only filter the contours)
+        """
+        return ('n_sds', params['n_sds']) if self.bg.use_sd else ('threshold', params['threshold'])
+
+    def _get_mask(self, processed_frame, mask_key):
+        """
+        The mask of the frame for one value of the parameter it depends on,
+        computed with the same steps as the Tracker (see Tracker._get_silhouette)
+
+        :return: (mask, diff)
+        """
+        name, value = mask_key
+        if name == 'n_sds':
+            return self._get_silhouette(processed_frame, threshold_map=self._get_threshold_map(value))
+        else:
+            return self._get_silhouette(processed_frame, threshold=value)
+
+    def _track_frame(self, frame, requested_color='r', requested_output='raw'):
+        """
+        Evaluates each set of parameters on frame and appends to the results of each set
+        Returns the frame with the contours of the first set of parameters potentially drawn
+
+        See Tracker._track_frame
+        """
+        processed_frame = self._pre_process_frame(frame)  # Shared by all the masks
+
+        contours_per_mask = {}
+        diff = None
+        for params in self.parameter_sets:
+            mask_key = self._get_mask_key(params)
+            if mask_key not in contours_per_mask:
+                mask, mask_diff = self._get_mask(processed_frame, mask_key)
+                if diff is None:
+                    diff = mask_diff.copy()  # The same for all the masks
+                mask = mask.copy()  # The silhouette buffer is reused by the next mask
+                contour = self._get_biggest_contour(mask)
+                contours_per_mask[mask_key] = (mask, contour)
+
+        first_mask = contours_per_mask[self._get_mask_key(self.parameter_sets[0])][0]
+        plot_silhouette, _ = self._get_plot_silhouette(requested_output, frame, diff, first_mask)
+        measure = self.measure_callback(frame)
+        contour_found = False
+        for params, results, summary in zip(self.parameter_sets, self.sweep_results, self.summaries):
+            summary.n_frames += 1
+            mask, contour = contours_per_mask[self._get_mask_key(params)]
+            if contour is not None:
+                position, area = self._get_contour_geometry(contour)
+            if contour is None:
+                summary.n_not_found += 1
+            elif area <= params['min_area']:
+                summary.n_too_small += 1
+            elif area >= params['max_area']:
+                summary.n_too_big += 1
+            else:
+                results.update(position, area, measure, self._get_distances_from_arena(position))
+                summary.n_detected += 1
+                if self._check_sweep_teleportation(results):
+                    summary.n_teleportations += 1
+                contour_found = True
+        return contour_found, plot_silhouette
+
+    def _get_contour_geometry(self, contour):
+        """
+        The centre and area of the contour as computed by the Tracker (in the corrected space in points mode)
+        """
+        if self._calibrate_points_only():
+            return self._undistort_contour_geometry(contour)
+        return ObjectContour(contour, None, contour_type='raw').centre, cv2.contourArea(contour)
+
+    def _check_sweep_teleportation(self, results):
+        """
+        :return: Whether the specimen teleported (the position is then reset to the default)
+        """
+        if len(results) < 2 or results.get_last_pos_pair()[0] == results.default_pos:
+            return False
+        if (results.get_last_movement_vector() > self.teleportation_threshold).any():
+            results.overwrite_last_pos(results.default_pos)
+            return True
+        return False
+
+    def get_summaries(self):
+        """
+        :return: The list of summaries (dictionaries of parameters and counters) of each set of parameters
+        """
+        return [summary.to_dict() for summary in self.summaries]
+
+    def get_best_params(self):
+        """
+        The set of parameters with the highest detection rate (the fewest teleportations in case of a tie)
+
+        :rtype: dict
+        """
+        best_summary = max(self.summaries, key=lambda s: (s.get_detection_rate(), -s.n_teleportations))
+        return best_summary.params
+
+    def print_summaries(self):
+        for summary in self.summaries:
+            params = ', '.join('{}={}'.format(name, summary.params[name]) for name in SWEEPABLE_PARAMETERS)
+            print('{}: detection rate {:.1%}, {} not found, {} too small, {} too big, {} teleportations'
+                  .format(params, summary.get_detection_rate(), summary.n_not_found,
+                          summary.n_too_small, summary.n_too_big, summary.n_teleportations))
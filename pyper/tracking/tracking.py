@@ -13,26 +13,41 @@ instead of a usb camera by default. It also slightly optimises for speed.
 """
 from __future__ import division
 
+import math
 import os
 import platform
 from time import time
 
 import numpy as np
-from tqdm import tqdm
 import cv2
 
+from pyper.analysis.occupancy import OccupancyMap
+from pyper.camera.camera_calibration import CALIBRATION_MODES
 from pyper.contours.object_contour import ObjectContour
-from pyper.contours.roi import Circle
+from pyper.contours.roi import Circle, FreehandRoi, RoiIndex
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.tracking.frame_scheduler import FrameScheduler
+from pyper.tracking.instrumentation import Instrumentation
 from pyper.tracking.tracking_background import Background
 from pyper.tracking.tracking_results import TrackingResults
-from pyper.utilities import utils
-from pyper.utilities.utils import write_structure_not_found_msg, write_structure_size_incorrect_msg
+from pyper.video.cv_wrappers.helpers import find_contours
+from pyper.video.annotation_layer import AnnotationLayer
 from pyper.video.cv_wrappers.video_writer import VideoWriter
-from pyper.video.video_frame import Frame
+from pyper.video.recording_policy import ContinuousRecording, RECORDING_TRIGGERS
+from pyper.video.video_frame import Frame, PreprocessingPipeline
 from pyper.video.video_stream import PiVideoStream, UsbVideoStream, RecordedVideoStream, VideoStreamFrameException
+from pyper.video.video_stream import DEFAULT_CAM
 
 IS_PI = (platform.machine()).startswith('arm')  # We assume all ARM is a raspberry pi
 OPENCV_VERSION = int(cv2.__version__[0])
+ARENA_SHAPES = ('circle', 'contour')
+
+
+def get_recorded_frames_path(video_path):
+    """
+    The path of the csv file of the frames written to video_path (see Tracker.save_recorded_frames)
+    """
+    return '{}_frames.csv'.format(os.path.splitext(video_path)[0])
 
 
 class Tracker(object):
@@ -47,7 +62,13 @@ class Tracker(object):
                  clear_borders=False, normalise=False,
                  plot=False, fast=False, extract_arena=False,
                  infer_location=False,
-                 camera_calibration=None, callback=None, requested_fps=None):
+                 camera_calibration=None, callback=None, requested_fps=None,
+                 scheduling_policy='all', cam_idx=DEFAULT_CAM, calibration_mode='frame',
+                 n_preprocessing_stripes=1, pyramid_level=0, pyramid_margin=4,
+                 pyramid_tolerance=0.5, pyramid_check_period=100, stream=None,
+                 instrument=True, log_period=5., arena_shape='circle',
+                 occupancy_bin_size=None, occupancy_weighting='frames', kinematics=None,
+                 recording_policy=None, recording_triggers=('roi',), motion_threshold=5., save_raw=True):
         """
         :param str src_file_path: The source file path to read from (camera if None)
         :param str dest_file_path: The destination file path to save the video
@@ -71,26 +92,90 @@ class Tracker(object):
         the sake of acquisition speed.
         :param bool extract_arena: Whether to detect the arena (it should be brighter than\
         the surrounding) from the background as an ROI.
+        :param str arena_shape: The shape of the extracted arena. One of ('circle', 'contour'). \
+        'circle' uses the enclosing circle of the arena, 'contour' its outline.
         :param callback: The function to be executed upon finding the specimen in the ROI \
         during tracking.
         :type callback: `function`
+        :param str scheduling_policy: How to handle frames that arrive faster than they can be tracked \
+        (live streams only). One of ('all', 'latest', 'adaptive'). See frame_scheduler.
+        :param int cam_idx: The index of the usb camera to record from (if src_file_path is None)
+        :param str calibration_mode: How camera_calibration is applied. One of ('frame', 'points'). \
+        In 'frame' mode, every frame is undistorted before tracking. In 'points' mode, the tracking \
+        runs on the source frames and only the specimen coordinates are undistorted (the frames are \
+        only undistorted for display and recording).
+        :param int n_preprocessing_stripes: The number of horizontal stripes of the frame pre-processed \
+        in parallel (see video_frame.PreprocessingPipeline)
+        :param int pyramid_level: If > 0, the specimen is first detected on the frames downscaled \
+        by 2**pyramid_level and its centre and area are then computed at full resolution only inside \
+        the bounding box of the detected object. The full frame is used if the object is cut by the \
+        bounding box or not found. Not used with normalise.
+        :param int pyramid_margin: The number of pixels added around the bounding box of the coarse detection
+        :param float pyramid_tolerance: The maximum distance (pixels) between the centres of the pyramid \
+        and full resolution detections. Every pyramid_check_period frames, the full resolution detection \
+        is also run. If the centres differ by more than the tolerance, the full resolution result is used \
+        (counted as 'pyramid_mismatches') and the next frame is checked too.
+        :param int pyramid_check_period: The number of frames between two checks of the pyramid detection \
+        (0 to never check)
+        :param VideoStream stream: A stream to track instead of src_file_path or the camera \
+        (e.g. a SyntheticVideoStream). Its background range is set from bg_start and n_background_frames.
+        :param bool instrument: Whether to record the duration of each processing stage and the \
+        tracking events counters (see self.instrumentation)
+        :param float log_period: The minimum time (s) between two performance log lines (with check_fps)
+        :param int occupancy_bin_size: If not None, the occupancy map of the specimen is accumulated \
+        during the tracking with bins of this size in pixels (see self.results.get_occupancy())
+        :param str occupancy_weighting: What each position adds to the occupancy map \
+        (see pyper.analysis.occupancy.WEIGHTINGS)
+        :param kinematics: An online feature extractor updated with each tracked frame (e.g. speed, \
+        immobility, thigmotaxis), whose callbacks can trigger on the behaviour of the specimen
+        :type kinematics: pyper.analysis.kinematics.OnlineKinematics
+        :param recording_policy: Which of the frames are written when recording (all of them if None). \
+        e.g. one in n (DecimatedRecording) or only around the triggers (EventRecording). \
+        With these, the index and time of the frames written are saved to a '_frames.csv' file next to the video
+        :type recording_policy: pyper.video.recording_policy.RecordingPolicy
+        :param tuple recording_triggers: The events that trigger the recording of an EventRecording policy. \
+        Any of ('roi', 'motion', 'external'): the specimen is in the ROI, it moved more than motion_threshold \
+        or self.trigger_recording() was called (e.g. from a callback)
+        :param float motion_threshold: The displacement (pixels) between two frames for the 'motion' trigger
+        :param bool save_raw: Whether to also save the raw frames (without annotations) to a '_raw' file \
+        when recording from a USB camera (every frame read with the default policy, \
+        the frames selected by the recording policy otherwise)
         """
+        if arena_shape not in ARENA_SHAPES:
+            raise PyperValueError("Expected one of {} for arena_shape, got: {}".format(ARENA_SHAPES, arena_shape))
+        if calibration_mode not in CALIBRATION_MODES:
+            raise PyperValueError("Expected one of {} for calibration_mode, got: {}"
+                                  .format(CALIBRATION_MODES, calibration_mode))
+        unknown_triggers = set(recording_triggers) - set(RECORDING_TRIGGERS)
+        if unknown_triggers:
+            raise PyperValueError("Expected any of {} for recording_triggers, got: {}"
+                                  .format(RECORDING_TRIGGERS, sorted(unknown_triggers)))
 
         if callback is not None: self.handle_object_in_tracking_roi = callback
         track_range_params = (bg_start, n_background_frames)
         self.raw_out_stream = None
-        if src_file_path is None:  # i.e. we record
+        self.scheduler = None  # Recorded videos are never ahead of the tracking
+        if stream is not None:
+            self._stream = stream
+            self._stream.bg_start_frame = bg_start
+            self._stream.bg_end_frame = bg_start + n_background_frames - 1
+            if getattr(stream, 'is_live', False):
+                self.scheduler = FrameScheduler(self._stream.fps, scheduling_policy)
+        elif src_file_path is None:  # i.e. we record
             if IS_PI:
                 self._stream = PiVideoStream(dest_file_path, *track_range_params, requested_fps=requested_fps)
             else:
-                self._stream = UsbVideoStream(dest_file_path, *track_range_params, requested_fps=requested_fps)
-                base_path, ext = os.path.splitext(dest_file_path)
-                raw_out_path = "{}_raw{}".format(base_path, ext)
-                self.raw_out_stream = VideoWriter(raw_out_path,
-                                                  self._stream.video_writer.codec,
-                                                  self._stream.video_writer.fps,
-                                                  self._stream.video_writer.frame_shape,
-                                                  is_color=True)  # FIXME: make optional
+                self._stream = UsbVideoStream(dest_file_path, *track_range_params,
+                                              requested_fps=requested_fps, cam_idx=cam_idx)
+                if save_raw:
+                    base_path, ext = os.path.splitext(dest_file_path)
+                    raw_out_path = "{}_raw{}".format(base_path, ext)
+                    self.raw_out_stream = VideoWriter(raw_out_path,
+                                                      self._stream.video_writer.codec,
+                                                      self._stream.video_writer.fps,
+                                                      self._stream.video_writer.frame_shape,
+                                                      is_color=True)
+            self.scheduler = FrameScheduler(self._stream.fps, scheduling_policy)
         else:
             self._stream = RecordedVideoStream(src_file_path, *track_range_params)
         
@@ -106,23 +191,61 @@ class Tracker(object):
         self.normalise = normalise
         self.plot = plot
         self.fast = fast
+        self._requested_fast = fast  # self.fast may be temporarily forced by the scheduler
         self.extract_arena = extract_arena
+        self.arena_shape = arena_shape
         self.infer_location = infer_location
 
         self.bg = Background(n_sds)
+        self._pipelines = {  # Compiled once, indexed by `fast`
+            False: PreprocessingPipeline(('gray', 'denoise', 'blur'), n_stripes=n_preprocessing_stripes),
+            True: PreprocessingPipeline(('gray',))
+        }
+        self.pyramid_level = pyramid_level
+        self.pyramid_margin = pyramid_margin
+        self.pyramid_tolerance = pyramid_tolerance
+        self.pyramid_check_period = pyramid_check_period
+        self._n_frames_to_pyramid_check = 0  # The next pyramid detection is checked when this reaches 0
+        self._crop_size = (0, 0)  # The (width, height) of the source crops, only grows (see _get_crop_window)
+        self._coarse_pipelines = {}  # Indexed by (fast, scale), see _get_coarse_pipeline
+        self._crop_pipelines = {  # Compiled for the crop size (see _get_crop_window)
+            False: PreprocessingPipeline(('gray', 'denoise', 'blur')),
+            True: PreprocessingPipeline(('gray',))
+        }
+        self._coarse_bg = None
+        self._coarse_bg_source = None  # The background data the coarse background was computed from
+        self._pyramid_buffers = None
         
         self.camera_calibration = camera_calibration
+        self.calibration_mode = calibration_mode
 
         self.results = TrackingResults()
+        if occupancy_bin_size is not None:
+            self.results.set_occupancy(OccupancyMap(occupancy_bin_size, occupancy_weighting))
+        if kinematics is not None:
+            self.results.set_kinematics(kinematics)
+        self.instrumentation = Instrumentation(instrument, log_period)
+
+        self.recording_policy = recording_policy if recording_policy is not None else ContinuousRecording()
+        self.recording_triggers = tuple(recording_triggers)
+        self.motion_threshold = motion_threshold
+        self._external_trigger = False
+        self._specimen_in_roi = False  # Whether the specimen was found in the ROI in the current frame
+        self._raw_frame = None  # The frame saved to self.raw_out_stream with the current output frame
+        self.recorded_frames = []  # The (frame index, time) of each frame written (see save_recorded_frames)
 
         self.current_frame_idx = 0
         self.current_frame = None  # Give shape np.empty_like()
         self.silhouette = None  # np.empty_like()
+        self.annotations = AnnotationLayer()  # The drawings on self.silhouette, rasterised only if displayed or saved
 
         self.arena = None
+        self._arena_index = None  # The distance field of the arena (see _set_arena)
         self.roi = None
         self.tracking_region_roi = None
         self.measure_roi = None
+        self.measure_rois = []
+        self.measure_statistics = ('mean',)
 
     def set_roi(self, roi):
         """Set the region of interest and enable it"""
@@ -131,24 +254,86 @@ class Tracker(object):
             self._make_bottom_square()
 
     def set_tracking_region_roi(self, roi):
-        self.tracking_region_roi = roi
+        self.tracking_region_roi = self._to_source_roi(roi)
 
     def set_measure_roi(self, roi):
-        self.measure_roi = roi
+        self.set_measure_rois([] if roi is None else [roi])
+
+    def set_measure_rois(self, rois, statistics=('mean',)):
+        """
+        Sets the ROIs in which the frame is measured (see measure_callback).
+        With a single ROI and a single statistic, the measure is a number, otherwise it is a tuple
+        of the values of each statistic for each ROI (see TrackingResults.measure_names).
+
+        :param list rois: The measurement ROIs
+        :param tuple statistics: The statistics to compute in each ROI (see roi.STATISTICS)
+        """
+        self.measure_rois = [self._to_source_roi(roi) for roi in rois]
+        self.measure_roi = self.measure_rois[0] if self.measure_rois else None
+        self.measure_statistics = tuple(statistics)
+        self.results.set_measure_names(['roi_{}_{}'.format(i, stat) for i in range(len(rois)) for stat in statistics])
+
+    def _calibrate_points_only(self):
+        return self.camera_calibration is not None and self.calibration_mode == 'points'
+
+    def _to_source_roi(self, roi):
+        """
+        In 'points' calibration mode, the ROIs applied to the frames (drawn on the corrected images)
+        are converted once to the coordinates of the source frames
+
+        :param Roi roi: The roi in corrected coordinates
+        :rtype: Roi
+        """
+        if roi is not None and self._calibrate_points_only():
+            return self.camera_calibration.distort_roi(roi)
+        else:
+            return roi
+
+    def _get_output_frame(self, frame):
+        """
+        The frame as it should be saved or displayed (i.e. corrected for the optical distortion)
+
+        :param frame: The frame used for the tracking
+        """
+        if self._calibrate_points_only():
+            return Frame(self.camera_calibration.remap(frame))
+        else:
+            return frame
         
     def _extract_arena(self):
         """
-        Finds the arena in the current background frame and
+        Finds the arena in the (finalised) background and
         converts it to an roi object.
         
-        :return: arena
+        :return: arena (None if not found)
         :rtype: Roi
         """
-        if self.extract_arena:
-            mask = self.bg.to_mask(self.threshold)
-            cnt = self._get_biggest_contour(mask)
-            arena = Circle(*cv2.minEnclosingCircle(cnt))  # TODO: make more generic
-            self.arena = arena
+        mask = self.bg.to_mask(self.threshold)
+        cnt = self._get_biggest_contour(mask)
+        if cnt is None:
+            return None
+        if self.arena_shape == 'circle':
+            arena = Circle(*cv2.minEnclosingCircle(cnt))
+        else:
+            arena = FreehandRoi(cnt.reshape(-1, 2))
+            moments = cv2.moments(cnt)
+            if moments['m00']:
+                arena.centre = (moments['m10'] / moments['m00'], moments['m01'] / moments['m00'])
+        if self._calibrate_points_only():  # Distances are computed from the corrected positions
+            arena = self.camera_calibration.undistort_roi(arena)
+        return arena
+
+    def _set_arena(self):
+        """
+        Extracts the arena once the background is finalised and precomputes its distance field
+        so that the distances from the specimen to the border are lookups
+        """
+        self.arena = self._extract_arena()
+        if self.arena is None:
+            print('Arena not found in the background')
+            self._arena_index = None
+        else:
+            self._arena_index = RoiIndex([self.arena], self.bg.data.shape[:2])
         
     def _make_bottom_square(self):  # TODO: extract
         """
@@ -160,14 +345,35 @@ class Tracker(object):
         self.bottom_square = (top_left_pt, bottom_right_pt)
 
     def _create_pbar(self):
+        from tqdm import tqdm  # Imported on first use (slow import)
         pbar = tqdm(desc='Tracking frames: ', total=self._stream.n_frames)
         return pbar
 
-    def _set_default_results(self):
+    def _set_default_results(self, t=None):
+        """
+        Appends the row of the current frame to the results
+
+        :param float t: The time (s) of the frame (see _get_frame_time)
+        """
         if self.infer_location:
-            self.results.repeat_last()
+            self.results.repeat_last(t)
         else:
-            self.results.append_defaults()
+            self.results.append_defaults(t)
+
+    def _get_frame_time(self, read_time):
+        """
+        The time (s) of the current frame.
+        For a recording, this is the time of the frame in the video (frame index / fps), so that it does not
+        depend on the processing speed.
+        For a live stream, this is the time the frame was read (i.e. captured) relative to the start of
+        the results rather than the time the row is appended, so that the results of concurrent streams
+        can be aligned on it.
+
+        :param float read_time: The time (as returned by time.time()) the frame was read
+        """
+        if not self._stream.is_live and self._stream.fps:
+            return self._stream.current_frame_idx / self._stream.fps
+        return self.results.get_relative_time(read_time)
 
     def is_before_frame(self, fid):
         return fid < self._stream.bg_start_frame
@@ -180,7 +386,8 @@ class Tracker(object):
         
         :param roi: optional roi e.g. Circle((250, 350), 25)
         :type roi: roi sub-class
-        :param bool check_fps: Whether to print the current frame per second processing speed
+        :param bool check_fps: Whether to periodically print the processing speed and the duration \
+        of each stage (and a summary at the end)
         :param bool record: Whether to save the frames being processed
         :param bool reset: whether to reset the recording (restart the background and arena ...).\
         If this parameter is False, the recording will continue from the previous frame.
@@ -190,20 +397,46 @@ class Tracker(object):
         self.set_roi(roi)
         
         is_recording = type(self._stream) == RecordedVideoStream
-        self.bg.clear()
+        self.prepare_run(reset)
+        pbar = None
         if is_recording:
             pbar = self._create_pbar()
         elif IS_PI:
             self._stream.restart_recording(reset)
-            pbar = None
-        if check_fps: prev_time = time()
-        while True:
-            try:
-                if check_fps: prev_time = utils.check_fps(prev_time)
-                self.current_frame_idx = self._stream.current_frame_idx + 1
-                self.track_frame(pbar=pbar, record=record)  # TODO: requested_color='r'
-            except EOFError:
-                return self.results.positions
+        try:
+            while True:
+                try:
+                    if check_fps: self.instrumentation.log_if_due()
+                    self.current_frame_idx = self._stream.current_frame_idx + 1
+                    self.track_frame(pbar=pbar, record=record)  # TODO: requested_color='r'
+                except EOFError:
+                    if check_fps: self.instrumentation.print_summary()
+                    return self.results.positions
+        finally:
+            self.close_pipelines()
+
+    def close_pipelines(self):
+        """
+        Stops the threads of the pre-processing stripes (see n_preprocessing_stripes).
+        Called at the end of track(), the pipelines start them again if tracking resumes
+        """
+        for pipeline in self._pipelines.values():
+            pipeline.close()
+
+    def prepare_run(self, reset=True):
+        """
+        Clears the background and, if reset, the state of the previous run (scheduler, instrumentation,
+        recording policy and frames written). Called at the start of track() (and by the MultiStreamTracker)
+
+        :param bool reset: Whether to reset the state of the previous run (see track)
+        """
+        self.bg.clear()
+        if reset:
+            if self.scheduler is not None:
+                self.scheduler.reset()
+            self.instrumentation.reset()
+            self.recording_policy.reset()
+            self.recorded_frames = []
 
     def update_img(self, dest_img, src_img):
         if dest_img is None or dest_img.ndim != src_img.ndim:
@@ -218,39 +451,66 @@ class Tracker(object):
 
     def track_frame(self, pbar=None, record=False, requested_output='raw'):  # TODO: improve calls to "if record: self._stream.save(frame)"
         try:
-            frame = self._stream.read()
+            if self.scheduler is not None:
+                self._drop_late_frames()
+            timing = self.instrumentation
+            self.annotations.clear()
+            self._specimen_in_roi = False
+            with timing.stage('read'):
+                frame = self._stream.read()
+            read_time = time()
             self.current_frame = self.update_img(self.current_frame, frame)
-            self._set_default_results()
-            if self.camera_calibration is not None:
-                frame = Frame(self.camera_calibration.remap(frame))
+            self._set_default_results(self._get_frame_time(read_time))
+            if self.camera_calibration is not None and not self._calibrate_points_only():
+                with timing.stage('remap'):
+                    frame = Frame(self.camera_calibration.remap(frame))
             fid = self._stream.current_frame_idx
             if self.is_after_frame(fid):
                 raise EOFError("End of tracking reached")
 
             result_frame = frame  # image_provider colorises and copies
+            self._raw_frame = None
             if self.raw_out_stream is not None:
-                self.raw_out_stream.save_frame(frame)
+                if self._records_every_frame():  # The raw file has every frame read, as the source
+                    with timing.stage('write_raw'):
+                        self.raw_out_stream.save_frame(self._get_output_frame(frame))
+                else:  # The raw frames follow the frames selected by the policy
+                    self._raw_frame = frame
             if self.is_before_frame(fid):
                 pass
             elif self._stream.is_bg_frame():
                 self.bg.build(frame)
-                self.arena = self._extract_arena()
-                if record: self._stream.save(frame)
+                if record: self._save_frame(frame)
             elif self._stream.bg_end_frame < fid < self.track_from:
-                if record: self._stream.save(frame)
+                if record: self._save_frame(frame)
             else:  # Tracked frame
-                if fid == self.track_from: self.bg.finalise()
+                if fid == self.track_from:
+                    self.bg.finalise()
+                    if self.extract_arena: self._set_arena()
+                    if self.results.occupancy is not None:  # The map covers the whole frame
+                        self.results.occupancy.shape = self.bg.data.shape[:2]
                 contour_found, sil = self._track_frame(frame, 'b', requested_output=requested_output)
+                self.results.accumulate()  # The results of the frame are final
                 self.after_frame_track()
                 self.silhouette = self.update_img(self.silhouette, sil)
+                if self._calibrate_points_only() and (self.plot or record):
+                    self.annotations.flush_shapes(self.silhouette)  # The contour is in the source frame coordinates
+                    self.silhouette = self._get_output_frame(self.silhouette)  # The text is drawn after warping
                 if not contour_found:
-                    if record: self._stream.save(frame)
-                    write_structure_not_found_msg(self.silhouette, self.silhouette.shape[:2], self.current_frame_idx)
+                    if record: self._save_frame(frame)
+                    self.annotations.add_structure_not_found_msg(self.silhouette.shape[:2], self.current_frame_idx)
                 else:
                     self._check_specimen_in_roi()
-                    self._plot()
-                    if record: self._stream.save(self.silhouette)  # TODO: also save frame
+                    with timing.stage('draw'):  # One sample per frame (plot and flush)
+                        self._plot()
+                        if record:
+                            self.annotations.flush(self.silhouette)
+                    if record:
+                        self._save_frame(self.silhouette, is_output_frame=True)  # TODO: also save frame
                 result_frame = self.silhouette
+                timing.frame_done()
+            if self.scheduler is not None and fid >= self.track_from:
+                self._update_scheduler(time() - read_time)
             if pbar is not None: pbar.update(self._stream.current_frame_idx)
             return result_frame, self.results.get_last_position(), self.results.get_last_dist_from_arena_pair()
         except VideoStreamFrameException as e:
@@ -259,8 +519,103 @@ class Tracker(object):
             if pbar is not None: pbar.close()
             msg = "Recording stopped by user" if (type(e) == KeyboardInterrupt) else str(e)
             self._stream.stop_recording(msg)
+            if self.recorded_frames and not self._records_every_frame() and self._stream.is_live:
+                self.save_recorded_frames(get_recorded_frames_path(self._stream.save_path))
             raise EOFError
 
+    def _records_every_frame(self):
+        return isinstance(self.recording_policy, ContinuousRecording)
+
+    def _save_frame(self, frame, is_output_frame=False):
+        """
+        Submits frame (and the matching raw frame) to self.recording_policy and writes the frames it selects.
+        The frames are only converted (see _get_output_frame) once selected, so that the frames dropped
+        by the policy are not remapped.
+
+        :param frame: The frame to record
+        :param bool is_output_frame: Whether frame has already been converted by _get_output_frame
+        """
+        frame_info = (self._stream.current_frame_idx, self.results.times[-1])
+        with self.instrumentation.stage('write'):
+            for out_frame, raw_frame, written_frame_info, is_output in self.recording_policy.submit(
+                    (frame, self._raw_frame, frame_info, is_output_frame), self._is_recording_triggered()):
+                self._stream.save(out_frame if is_output else self._get_output_frame(out_frame))
+                if raw_frame is not None:
+                    self.raw_out_stream.save_frame(self._get_output_frame(raw_frame))
+                self.recorded_frames.append(written_frame_info)
+
+    def save_recorded_frames(self, dest):
+        """
+        Saves the index and time of each frame written to the video, so that a video with missing frames
+        (e.g. DecimatedRecording or EventRecording) can be mapped back to the time of its frames.
+        This is done automatically at the end of a live recording with such a policy.
+
+        :param str dest: The path of the csv file
+        """
+        with open(dest, 'w') as out_file:
+            out_file.write('frame,time\n')
+            for frame_idx, frame_time in self.recorded_frames:
+                out_file.write('{},{:.6f}\n'.format(frame_idx, frame_time))
+
+    def trigger_recording(self):
+        """
+        Triggers the recording of the next frame saved (with the 'external' recording trigger),
+        e.g. from a kinematics callback or a TTL input
+        """
+        self._external_trigger = True
+
+    def _is_recording_triggered(self):
+        """
+        Whether any of self.recording_triggers fired for the current frame.
+        The external trigger is consumed.
+        """
+        triggered = 'external' in self.recording_triggers and self._external_trigger
+        self._external_trigger = False
+        if 'roi' in self.recording_triggers and self._specimen_in_roi:
+            triggered = True
+        if 'motion' in self.recording_triggers and self._specimen_moved():
+            triggered = True
+        return triggered
+
+    def _specimen_moved(self):
+        """
+        Whether the specimen moved more than self.motion_threshold since the previous frame
+        (False if it was not found in either frame)
+        """
+        last_positions = self.results.get_last_pos_pair()
+        if len(last_positions) < 2 or self.results.default_pos in [tuple(pos) for pos in last_positions]:
+            return False
+        (x1, y1), (x2, y2) = last_positions
+        return math.hypot(x2 - x1, y2 - y1) > self.motion_threshold
+
+    def _drop_late_frames(self):
+        """
+        Skips the frames that the scheduler considers too late to be processed
+        and marks them as dropped in the results so that the results stay aligned with the frames.
+        The background frames are never dropped.
+        """
+        if self._stream.current_frame_idx < self.track_from:
+            return
+        n_frames = self.scheduler.get_n_frames_to_drop(self._stream.current_frame_idx)
+        for _ in range(n_frames):
+            self._stream.skip()
+            self._set_dropped_results()
+        if n_frames:
+            self.instrumentation.count('dropped', n_frames)
+
+    def _set_dropped_results(self):
+        self.results.append_dropped()
+
+    def _update_scheduler(self, duration):
+        """
+        Feeds the processing duration of the last frame to the scheduler
+        and applies the processing mode it selects
+
+        :param float duration: The time (s) spent processing the last frame
+        """
+        self.scheduler.frame_processed(duration)
+        self.fast = self._requested_fast or self.scheduler.degrade
+
     def _track_frame(self, frame, requested_color='r', requested_output='raw'):
         """
         Get the position of the specimen in frame and append to self.results
@@ -274,9 +629,17 @@ class Tracker(object):
         :returns: silhouette
         :rtype: binary mask or None
         """
-        processed_frame = self._pre_process_frame(frame)
-        silhouette, diff = self._get_silhouette(processed_frame)
-        biggest_contour = self._get_biggest_contour(silhouette)
+        timing = self.instrumentation
+        detection = None
+        if self.pyramid_level > 0 and not self.normalise:
+            with timing.stage('pyramid_detection'):
+                detection = self._detect_coarse_to_fine(frame)
+            if detection is not None and self._is_pyramid_check_due():
+                detection = self._check_pyramid_detection(frame, detection)
+        if detection is None:
+            silhouette, diff, biggest_contour = self._detect_full_resolution(frame)
+        else:
+            silhouette, diff, biggest_contour = detection
 
         if IS_PI and self.fast:
             requested_output = 'mask'
@@ -287,12 +650,16 @@ class Tracker(object):
         if biggest_contour is not None:
             area = cv2.contourArea(biggest_contour)
             specimen = ObjectContour(biggest_contour, plot_silhouette, contour_type='raw', color=color)
+            centre = specimen.centre
+            if self._calibrate_points_only():
+                centre, area = self._undistort_contour_geometry(biggest_contour)
             if self.plot:
-                specimen.draw()  # even if wrong size to held spot issues
-                self._draw_subregion_roi(plot_silhouette)
+                self.annotations.add_contour(biggest_contour, color)  # even if wrong size to held spot issues
+                self._draw_subregion_roi()
             if self.min_area < area < self.max_area:
-                distances = (self._get_distance_from_arena_center(), self._get_distance_from_arena_border())
-                self.results.update(specimen.centre, area, self.measure_callback(frame), distances)
+                with timing.stage('results'):
+                    distances = self._get_distances_from_arena(centre)
+                    self.results.update(centre, area, self.measure_callback(frame), distances)
                 self._check_teleportation(frame, silhouette)
                 contour_found = True
             else:
@@ -301,9 +668,61 @@ class Tracker(object):
                 else:
                     self._handle_bad_size_contour(area)
         else:
-            self._fast_print('Frame {}, no contour found'.format(self._stream.current_frame_idx))
+            timing.count('misses')  # Counted rather than printed (see Instrumentation.print_summary)
         return contour_found, plot_silhouette
 
+    def _detect_full_resolution(self, frame):
+        """
+        :return: (silhouette, diff, contour) where contour is None if no valid contour was found
+        """
+        timing = self.instrumentation
+        with timing.stage('preprocess'):
+            processed_frame = self._pre_process_frame(frame)
+        with timing.stage('silhouette'):  # The difference and threshold are fused (see Background)
+            silhouette, diff = self._get_silhouette(processed_frame)
+        with timing.stage('contours'):
+            biggest_contour = self._get_biggest_contour(silhouette)
+        return silhouette, diff, biggest_contour
+
+    def _is_pyramid_check_due(self):
+        if not self.pyramid_check_period:
+            return False
+        self._n_frames_to_pyramid_check -= 1
+        if self._n_frames_to_pyramid_check > 0:
+            return False
+        self._n_frames_to_pyramid_check = self.pyramid_check_period
+        return True
+
+    def _check_pyramid_detection(self, frame, detection):
+        """
+        Compares the pyramid detection to the full resolution detection of the same frame
+
+        :param detection: The (silhouette, diff, contour) of the pyramid detection
+        :return: detection if the centres are within self.pyramid_tolerance, the full resolution detection otherwise
+        """
+        full_detection = self._detect_full_resolution(frame)
+        full_contour = full_detection[2]
+        if full_contour is not None:
+            pyramid_centre = ObjectContour(detection[2], None, contour_type='raw').centre
+            full_centre = ObjectContour(full_contour, None, contour_type='raw').centre
+            distance = math.hypot(pyramid_centre[0] - full_centre[0], pyramid_centre[1] - full_centre[1])
+            if distance <= self.pyramid_tolerance:
+                return detection
+        self.instrumentation.count('pyramid_mismatches')
+        self._n_frames_to_pyramid_check = 1  # Until the detections agree again
+        return full_detection
+
+    def _undistort_contour_geometry(self, contour):
+        """
+        Computes the centre and area of the contour in the corrected image space
+
+        :param contour: The contour in the source frame coordinates
+        :return: (centre, area)
+        """
+        undistorted_contour = self.camera_calibration.undistort_points(contour).reshape(-1, 1, 2)
+        specimen = ObjectContour(undistorted_contour, None, contour_type='raw')
+        return specimen.centre, cv2.contourArea(undistorted_contour)
+
     def after_frame_track(self):
         """
         To be implemented in derived class to perform action after each frame track
@@ -321,33 +740,42 @@ class Tracker(object):
             if self.results.last_pos_is_default():
                 return
             if self.roi.contains_point(self.results.get_last_position()):
+                self._specimen_in_roi = True
                 self.handle_object_in_tracking_roi()
-                self.silhouette = self.silhouette.copy()  # OPTIMISE:
             
-    def _get_distance_from_arena_border(self):  # FIXME: merge and move
-        if self.results.last_pos_is_default():
-            return
-        if self.extract_arena:
-            last_pos = self.results.get_last_position()
-            return self.arena.dist_from_border(last_pos)
-            
-    def _get_distance_from_arena_center(self):  # FIXME: merge and move
-        if self.results.last_pos_is_default():
-            return
-        if self.extract_arena:
-            last_pos = self.results.get_last_position()
-            return self.arena.dist_from_centre(last_pos)
+    def _get_distances_from_arena(self, position):
+        """
+        The distances from position to the centre and to the border (lookup in the
+        precomputed distance field) of the arena
+
+        :param tuple position: The (x, y) position of the specimen in the current frame
+        :return: (distance_from_centre, distance_from_border) or (None, None) if no arena
+        """
+        if not self.extract_arena or self.arena is None:
+            return None, None
+        x, y = position
+        from_centre = math.hypot(x - self.arena.centre[0], y - self.arena.centre[1])
+        return from_centre, self._arena_index.dist_from_border(position)
             
     def paint(self, frame, roi_color='y', arena_color='m'):
         if self.roi is not None:
             roi_contour = ObjectContour(self.roi.points, frame, contour_type='raw',
                                         color=roi_color, line_thickness=2)
             roi_contour.draw()
-        if self.extract_arena:
+        if self.extract_arena and self.arena is not None:
             arena_contour = ObjectContour(self.arena.points, frame, contour_type='raw',
                                           color=arena_color, line_thickness=2)
             arena_contour.draw()
 
+    def annotate(self, roi_color='y', arena_color='m'):
+        """
+        Same as paint but the ROI and arena are added to self.annotations instead of being drawn
+        """
+        if self.roi is not None:
+            self.annotations.add_contour(self.roi.points, roi_color, line_thickness=2)
+        if self.extract_arena and self.arena is not None:
+            self.annotations.add_contour(self.arena.points, arena_color, line_thickness=2)
+
     def _plot(self):
         """
         Displays the current frame with the trajectory of the specimen and potentially the ROI and the
@@ -355,7 +783,8 @@ class Tracker(object):
         """
         if self.plot:
             sil = self.silhouette
-            self.paint(sil)
+            self.annotate()
+            self.annotations.flush(sil)
             sil.display(win_name='Diff', text='Frame: {}'.format(self._stream.current_frame_idx),
                         curve=self.results.positions)
 
@@ -365,21 +794,18 @@ class Tracker(object):
         This method is meant to be overwritten in subclasses of Tracker.
         """
         self.results.overwrite_last_in_tracking_roi(True)
-        cv2.rectangle(self.silhouette, self.bottom_square[0], self.bottom_square[1], (0, 255, 255), -1)
+        self.annotations.add_rectangle(self.bottom_square[0], self.bottom_square[1], (0, 255, 255), -1)
 
     def measure_callback(self, frame):
-        if self.measure_roi is not None:
-            mask = self.measure_roi.to_mask(frame)
-            values = np.extract(mask, frame)
-            return values.mean()
-        else:
+        if not self.measure_rois:
             return float('NaN')
+        values = []
+        for roi in self.measure_rois:
+            values.extend(roi.measure(frame, self.measure_statistics))
+        return values[0] if len(values) == 1 else tuple(values)
     
     def _pre_process_frame(self, frame):
-        treated_frame = frame.gray(self.fast)   # TODO: check if we should separate setting
-        if not self.fast:
-            treated_frame = treated_frame.denoise().blur()
-        return treated_frame
+        return self._pipelines[self.fast](frame)  # TODO: check if we should separate setting
 
     def _get_plot_silhouette(self, requested_output, frame, diff, silhouette):  # OPTIMISE:
         color_is_default = False
@@ -401,17 +827,17 @@ class Tracker(object):
 
     def _handle_bad_size_contour(self, area, img=None):
         if area > self.max_area:
+            self.instrumentation.count('too_big')
             msg = 'Biggest structure too big ({} > {})'.format(area, self.max_area)
         else:
+            self.instrumentation.count('too_small')
             msg = 'Biggest structure too small ({} < {})'.format(area, self.min_area)
-        self._fast_print(msg)
         if img is not None:
-            write_structure_size_incorrect_msg(img, img.shape[:2], msg)
+            self.annotations.add_structure_size_incorrect_msg(img.shape[:2], msg)
 
-    def _draw_subregion_roi(self, img, color='y'):
+    def _draw_subregion_roi(self, color='y'):
         if self.tracking_region_roi is not None:
-            test_roi = ObjectContour(self.tracking_region_roi.points, img, contour_type='raw', color=color)
-            test_roi.draw()
+            self.annotations.add_contour(self.tracking_region_roi.points, color)
 
     def _fast_print(self, in_str):
         """
@@ -441,6 +867,7 @@ class Tracker(object):
             return
         last_vector = self.results.get_last_movement_vector()
         if (last_vector > self.teleportation_threshold).any():
+            self.instrumentation.count('teleportations')
             # if self.infer_location:
             #     self.positions[-1] = self.positions[-2]
             # else:
@@ -452,23 +879,28 @@ class Tracker(object):
             self._stream.stop_recording(err_msg)
             raise EOFError('Teleportation')
 
-    def _get_biggest_contour(self, silhouette):
+    def _get_biggest_contour(self, silhouette, offset=(0, 0)):
         """
         We need to rerun if too many contours are found as it should means
         that the findContours function returned nonsense.
         
         :param silhouette: The binary mask in which to find the contours
         :type silhouette: video_frame.Frame
+        :param tuple offset: The (x, y) position of silhouette in the frame (if silhouette is a crop)
         
         :return: The contours and the biggest contour from the mask (None, None) if no contour found
         """
-        try:
-            if OPENCV_VERSION == 2:
-                contours, _ = cv2.findContours(np.copy(silhouette), mode=cv2.RETR_LIST, method=cv2.CHAIN_APPROX_NONE)  # TODO: is CHAIN_APPROX_SIMPLE better?
-            elif OPENCV_VERSION == 3:
-                _, contours, _ = cv2.findContours(np.copy(silhouette), mode=cv2.RETR_LIST, method=cv2.CHAIN_APPROX_NONE)
-        except ValueError:
-            contours = cv2.findContours(np.copy(silhouette), mode=cv2.RETR_LIST, method=cv2.CHAIN_APPROX_NONE)  # TODO: is CHAIN_APPROX_SIMPLE better?
+        contours = find_contours(silhouette, offset=offset)  # TODO: is CHAIN_APPROX_SIMPLE better?
+        return self._select_contour(contours)
+
+    def _select_contour(self, contours, scale=1):
+        """
+        Selects the biggest contour that is within the tracking region roi (if any)
+
+        :param list contours: The candidate contours
+        :param int scale: The factor to convert the contours coordinates to the frame coordinates
+        :return: The selected contour or None
+        """
         if contours:
             descending_contours = sorted(contours, key=cv2.contourArea, reverse=True)
             if self.tracking_region_roi is None:
@@ -476,34 +908,128 @@ class Tracker(object):
             else:
                 for cnt in descending_contours:  # use cv2.contourArea(c)
                     closed_contour = len(cnt) >= 4
-                    if closed_contour and self.tracking_region_roi.contains_contour(cnt):
+                    if closed_contour and self.tracking_region_roi.contains_contour(cnt * scale):
                         return cnt
                     else:
                         continue
                 return None  # all contours have failed
-        
-    def _get_silhouette(self, frame):
+
+    def _get_coarse_pipeline(self, scale):
+        key = (self.fast, scale)
+        if key not in self._coarse_pipelines:
+            if self.fast:
+                self._coarse_pipelines[key] = PreprocessingPipeline(('gray',))
+            else:  # The frame is already smoothed by the downscaling
+                self._coarse_pipelines[key] = PreprocessingPipeline(('gray', 'denoise', 'blur'), sigma=1.5 / scale)
+        return self._coarse_pipelines[key]
+
+    def _get_coarse_background(self, scale):
+        if self._coarse_bg is None or self._coarse_bg_source is not self.bg.data:  # Background rebuilt
+            self._coarse_bg = self.bg.downscale(scale)
+            self._coarse_bg_source = self.bg.data
+        return self._coarse_bg
+
+    def _get_pyramid_buffers(self, shape):
+        """
+        The full size silhouette and diff images that the refined crop is pasted into
+        """
+        if self._pyramid_buffers is None or self._pyramid_buffers[0].shape != shape:
+            self._pyramid_buffers = (Frame(np.zeros(shape, dtype=np.uint8)), Frame(np.zeros(shape, dtype=np.uint8)))
+        return self._pyramid_buffers
+
+    def _get_crop_window(self, box, halo, width, height, step=32):
+        """
+        The window of the frame to pre-process for the refinement of box. All the windows have the same size
+        (the largest so far, rounded up to step pixels) so that the crop pipeline keeps its buffers.
+        The window is centred on box and shifted to stay inside the frame.
+
+        :param tuple box: The (x0, y0, x1, y1) box to refine
+        :param int halo: The number of pixels the filters need around the pixels they compute
+        :param int width: The width of the frame
+        :param int height: The height of the frame
+        :return: (window, region) the (x0, y0, x1, y1) of the source window and of the region of the \
+        window that the filters compute exactly (i.e. away from the window borders inside the frame)
+        """
+        x0, y0, x1, y1 = box
+        crop_width = max(self._crop_size[0], -(-(x1 - x0 + 2 * halo) // step) * step)
+        crop_height = max(self._crop_size[1], -(-(y1 - y0 + 2 * halo) // step) * step)
+        self._crop_size = (crop_width, crop_height)
+        crop_width, crop_height = min(crop_width, width), min(crop_height, height)
+
+        src_x0 = min(max((x0 + x1 - crop_width) // 2, 0), width - crop_width)
+        src_y0 = min(max((y0 + y1 - crop_height) // 2, 0), height - crop_height)
+        src_x1, src_y1 = src_x0 + crop_width, src_y0 + crop_height
+        region = (src_x0 + halo if src_x0 > 0 else 0, src_y0 + halo if src_y0 > 0 else 0,
+                  src_x1 - halo if src_x1 < width else width, src_y1 - halo if src_y1 < height else height)
+        return (src_x0, src_y0, src_x1, src_y1), region
+
+    def _detect_coarse_to_fine(self, frame):
+        """
+        Detects the specimen on the downscaled frame and refines the detection at full resolution
+        only inside the bounding box of the detected object (see pyramid_level)
+
+        :param frame: The video frame to use.
+        :type: video_frame.Frame
+        :return: (silhouette, diff, contour) or None if the full frame needs to be processed
+        """
+        scale = 2 ** self.pyramid_level
+        height, width = frame.shape[:2]
+        small_frame = Frame(cv2.resize(frame, (width // scale, height // scale), interpolation=cv2.INTER_AREA))
+        processed_small_frame = self._get_coarse_pipeline(scale)(small_frame)
+        coarse_silhouette, _ = self._get_coarse_background(scale).get_silhouette(processed_small_frame,
+                                                                                 self.threshold)
+        coarse_contour = self._select_contour(find_contours(coarse_silhouette), scale)
+        if coarse_contour is None:
+            return None
+
+        x, y, w, h = cv2.boundingRect(coarse_contour)
+        margin = self.pyramid_margin + scale
+        box = (max(x * scale - margin, 0), max(y * scale - margin, 0),
+               min((x + w) * scale + margin, width), min((y + h) * scale + margin, height))
+        crop_pipeline = self._crop_pipelines[self.fast]
+        src_window, region_box = self._get_crop_window(box, crop_pipeline.get_halo(), width, height)
+        src_x0, src_y0, src_x1, src_y1 = src_window
+        x0, y0, x1, y1 = region_box
+        processed_crop = crop_pipeline(frame[src_y0:src_y1, src_x0:src_x1])  # Always the same shape
+        processed_crop = processed_crop[y0 - src_y0:y1 - src_y0, x0 - src_x0:x1 - src_x0]
+
+        region = (slice(y0, y1), slice(x0, x1))
+        crop_silhouette, crop_diff = self.bg.get_silhouette(processed_crop, self.threshold, region=region)
+        silhouette, diff = self._get_pyramid_buffers((height, width))
+        silhouette.fill(0)
+        diff.fill(0)
+        silhouette[region] = crop_silhouette
+        diff[region] = crop_diff
+        if self.clear_borders and (x0 == 0 or y0 == 0 or x1 == width or y1 == height):
+            silhouette = silhouette.clear_borders()  # In the frame coordinates, as in _get_silhouette
+        contour = self._get_biggest_contour(silhouette[region], offset=(x0, y0))
+        if contour is None:
+            return None
+        cx, cy, cw, ch = cv2.boundingRect(contour)
+        cut_by_crop = ((x0 > 0 and cx <= x0) or (y0 > 0 and cy <= y0) or
+                       (x1 < width and cx + cw >= x1) or (y1 < height and cy + ch >= y1))
+        if cut_by_crop:  # The object extends beyond the box, the coarse detection was not reliable
+            return None
+        return silhouette, diff, contour
+
+    def _get_silhouette(self, frame, threshold=None, threshold_map=None):
         """
         Get the binary mask (8bits) of the specimen
         from the thresholded difference between frame and the background
         
         :param frame: The current frame to analyse
         :type frame: video_frame.Frame
+        :param int threshold: The fixed threshold (self.threshold if None)
+        :param threshold_map: The threshold map of the SD mode (the one of the background if None)
         
         :returns: silhouette (the binary mask)
         :rtype: video_frame.Frame
         """
         if self.normalise:
             frame = frame.normalise(self.bg.global_avg)
-        diff = self.bg.diff(frame)
-        if self.bg.use_sd:
-            threshold = self.bg.get_std_threshold()
-            silhouette = diff > threshold
-            silhouette = silhouette.astype(np.uint8) * 255
-        else:
-            diff = diff.astype(np.uint8)  # OPTIMISE
-            silhouette = diff.threshold(self.threshold)
+        threshold = self.threshold if threshold is None else threshold
+        silhouette, diff = self.bg.get_silhouette(frame, threshold, threshold_map=threshold_map)
         if self.clear_borders:
-            silhouette.clear_borders()
+            silhouette = silhouette.clear_borders()
         return silhouette, diff
 
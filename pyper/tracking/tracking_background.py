@@ -13,14 +13,22 @@ class Background(object):
         self.global_avg = None
         self.n_sds = n_sds
         self.use_sd = False
+        self.threshold_map = None
+        self._clear_buffers()
 
     def clear(self):
         self.data = None
         self.std = None
         self.source = None
         self.global_avg = None
-        self.n_sds = 2
         self.use_sd = False
+        self.threshold_map = None
+        self._clear_buffers()
+
+    def _clear_buffers(self):
+        self._diff_buffer = None
+        self._diff = None
+        self._mask = None
 
     def build(self, frame):
         if __debug__:
@@ -44,6 +52,7 @@ class Background(object):
         if self.data.ndim > 2:
             self.get_std()
             self.flatten()
+            self.threshold_map = self.get_threshold_map()
         self.global_avg = self.data.mean()
 
     def get_std_threshold(self):
@@ -53,15 +62,120 @@ class Background(object):
         """
         return self.std * self.n_sds
 
+    def get_threshold_map(self):
+        """
+        The per pixel threshold of the std tracking method, in the type of the background
+        so that it can be compared directly to the (unrounded) difference with the background
+
+        :return: The threshold image
+        """
+        return np.asarray(self.get_std_threshold(), dtype=self.data.dtype)
+
     def diff(self, frame):
         return Frame(cv2.absdiff(frame, self.data))
 
+    def _allocate_buffers(self, frame):
+        if self._diff_buffer is None or self._diff_buffer.shape != frame.shape \
+                or self._diff_buffer.dtype != frame.dtype:
+            self._diff_buffer = np.empty(frame.shape, dtype=frame.dtype)
+            self._diff = Frame(np.empty(frame.shape, dtype=np.uint8))
+            self._mask = Frame(np.empty(frame.shape, dtype=np.uint8))
+
+    @staticmethod
+    def to_8_bits(abs_diff, dst=None):
+        """
+        Saturates abs_diff to 255 and truncates it to 8 bits (as astype(np.uint8) does, rather than rounding)
+
+        .. warning:: abs_diff is saturated in place
+
+        :param abs_diff: The absolute difference with the background
+        :param dst: The uint8 image to write to (allocated if None)
+        :return: dst
+        """
+        if dst is None:
+            dst = Frame(np.empty(abs_diff.shape, dtype=np.uint8))
+        if abs_diff.dtype == np.uint8:
+            dst[:] = abs_diff
+        else:
+            np.minimum(abs_diff, 255, out=abs_diff)
+            np.copyto(dst, abs_diff, casting='unsafe')
+        return dst
+
+    def threshold(self, abs_diff, threshold, threshold_map=None, mask=None, diff=None):
+        """
+        Thresholds the absolute difference with the background. In SD mode, the unrounded difference
+        is compared to the threshold map, otherwise the 8 bits difference is compared to the fixed threshold.
+
+        .. warning:: abs_diff is saturated in place (see to_8_bits)
+
+        :param abs_diff: The absolute difference with the background
+        :param int threshold: The fixed threshold
+        :param threshold_map: The threshold map of the SD mode (self.threshold_map if None)
+        :param mask: The uint8 image to write the mask to (allocated if None)
+        :param diff: The uint8 image to write the 8 bits difference to (allocated if None)
+        :return: (mask, diff)
+        """
+        if self.use_sd:  # Before abs_diff is saturated
+            threshold_map = self.threshold_map if threshold_map is None else threshold_map
+            mask = cv2.compare(abs_diff, threshold_map, cv2.CMP_GT, dst=mask)
+        diff = self.to_8_bits(abs_diff, diff)
+        if not self.use_sd:
+            mask = cv2.threshold(diff, threshold, 255, cv2.THRESH_BINARY, dst=mask)[1]
+        return mask, diff
+
+    def get_silhouette(self, frame, threshold, region=None, threshold_map=None):
+        """
+        Computes the binary mask of the pixels of frame that differ from the background.
+        The per pixel threshold map is used if the background has a standard deviation (see finalise()),
+        the fixed threshold otherwise.
+
+        .. warning:: The returned images are reused buffers that are overwritten by the next call \
+        (unless region is specified)
+
+        :param frame: The frame to compare to the background
+        :param int threshold: The fixed threshold (0<t<256)
+        :param tuple region: The (rows, columns) slices of the background that frame corresponds to \
+        (if frame is only a crop of the full frame)
+        :param threshold_map: The threshold map of the SD mode (self.threshold_map if None), \
+        e.g. for another number of standard deviations
+        :return: (silhouette, diff) the binary mask and the absolute difference with the background (both 8 bits)
+        """
+        if self.use_sd and threshold_map is None:
+            threshold_map = self.threshold_map
+        if region is not None:
+            threshold_map = threshold_map[region] if self.use_sd else None
+            silhouette, diff = self.threshold(cv2.absdiff(frame, self.data[region]), threshold, threshold_map)
+            return Frame(silhouette), diff
+        self._allocate_buffers(frame)
+        cv2.absdiff(frame, self.data, dst=self._diff_buffer)
+        self.threshold(self._diff_buffer, threshold, threshold_map, mask=self._mask, diff=self._diff)
+        return self._mask, self._diff
+
     def to_mask(self, threshold):
         bg = self.data.copy()
         bg = bg.astype(np.uint8)
         mask = bg.threshold(threshold)
         return mask
 
+    def downscale(self, scale):
+        """
+        A copy of this (finalised) background reduced by scale in both dimensions
+        (to be compared to frames resized to the same shape)
+
+        :param int scale: The reduction factor
+        :rtype: Background
+        """
+        height, width = self.data.shape[:2]
+        size = (width // scale, height // scale)
+        small_bg = Background(self.n_sds)
+        small_bg.data = Frame(cv2.resize(self.data, size, interpolation=cv2.INTER_AREA))
+        small_bg.global_avg = self.global_avg
+        if self.use_sd:
+            small_bg.std = cv2.resize(self.std, size, interpolation=cv2.INTER_AREA)
+            small_bg.use_sd = True
+            small_bg.threshold_map = small_bg.get_threshold_map()
+        return small_bg
+
     def flatten(self):
         self.data = self.data.mean(2)
 
@@ -1,7 +1,12 @@
 import csv
+import os
+
 import numpy as np
 from time import time
 
+CELL_COLUMNS = ('frame', 'time', 'x', 'y', 'area', 'centre_distance', 'border_distance', 'measure',
+                'in_roi', 'dropped')
+
 
 class TrackingResults(object):
     def __init__(self):
@@ -11,15 +16,21 @@ class TrackingResults(object):
         self.areas = []  # The area of the tracked object
         self.distances_from_arena = []
         self.in_tracking_roi = []
+        self.dropped = []  # Whether the frame was skipped by the scheduler (live streams)
 
         self.start_time = None
+        self.occupancy = None  # An optional OccupancyMap updated as the positions arrive
+        self.kinematics = None  # An optional OnlineKinematics updated as the positions arrive
+        self._n_accumulated = 0  # The number of rows already added to self.occupancy and self.kinematics
 
         self.default_pos = (-1, -1)
         self.only_defaults = True
         self.default_measure = float('NaN')
+        self.measure_names = ['measure']
         self.default_area = 0.
         self.default_distance_from_arena = (float('NaN'), float('NaN'))
         self.default_in_tracking_roi = False
+        self.default_dropped = False
 
     def _reset(self):
         self.times = []
@@ -28,6 +39,12 @@ class TrackingResults(object):
         self.areas = []  # The area of the tracked object
         self.distances_from_arena = []
         self.in_tracking_roi = []
+        self.dropped = []
+        self._n_accumulated = 0
+        if self.occupancy is not None:
+            self.occupancy.reset()
+        if self.kinematics is not None:
+            self.kinematics.reset()
 
     def reset(self):
         self._reset()
@@ -44,18 +61,96 @@ class TrackingResults(object):
     def __len__(self):
         return len(self.positions)
 
+    def set_measure_names(self, names):
+        """
+        Sets the columns of the measures. With more than one name, each measure is a tuple of values.
+
+        :param list names: The names of the values of each measure
+        """
+        if len(names) > 1:
+            self.measure_names = list(names)
+            self.default_measure = (float('NaN'),) * len(names)
+        else:
+            self.measure_names = ['measure']
+            self.default_measure = float('NaN')
+
     def _get_title(self):
-        return ["frame", "time", "x", "y", "area", "x to arena", "y to arena", "measure", "in trakcing roi"]
+        return (["frame", "time", "x", "y", "area", "x to arena", "y to arena"] + self.measure_names +
+                ["in trakcing roi", "dropped"])
 
     def get_title(self):
         return self._get_title()
 
+    def set_occupancy(self, occupancy):
+        """
+        Attaches an accumulator that is updated with each position (e.g. pyper.analysis.occupancy.OccupancyMap)
+
+        :param occupancy: An object with add(position, time) and reset() methods (None to detach)
+        """
+        self.occupancy = occupancy
+        if occupancy is not None:
+            occupancy.reset()
+            self._add_rows(0, self._n_accumulated, occupancy=occupancy)
+
+    def set_kinematics(self, kinematics):
+        """
+        Attaches an online feature extractor that is updated with each position
+        (e.g. pyper.analysis.kinematics.OnlineKinematics)
+
+        :param kinematics: An object with add(position, time, wall_distance) and reset() methods (None to detach)
+        """
+        self.kinematics = kinematics
+        if kinematics is not None:
+            kinematics.reset()
+            self._add_rows(0, self._n_accumulated, kinematics=kinematics)
+
+    def _add_rows(self, start, end, occupancy=None, kinematics=None):
+        for idx in range(start, end):
+            position = self.positions[idx]
+            if position == self.default_pos:
+                continue
+            if occupancy is not None:
+                occupancy.add(position, self.times[idx])
+            if kinematics is not None:
+                kinematics.add(position, self.times[idx], self.distances_from_arena[idx][1])
+
+    def accumulate(self):
+        """
+        Adds the rows that were not added yet to self.occupancy and self.kinematics.
+        This is called by the tracker once the frame is processed and when the next row is appended,
+        because the position of the current frame can still be overwritten until then (e.g. teleportation)
+        """
+        if self.occupancy is not None or self.kinematics is not None:
+            self._add_rows(self._n_accumulated, len(self), self.occupancy, self.kinematics)
+        self._n_accumulated = len(self)
+
+    def get_occupancy(self, shape=None, normalise=False):
+        """
+        The occupancy map of the positions so far (see OccupancyMap.get_map)
+
+        :return: The map or None if no accumulator is attached
+        """
+        if self.occupancy is None:
+            return None
+        self.accumulate()
+        return self.occupancy.get_map(shape, normalise)
+
     def to_csv(self, dest):  # FIXME: add title
         with open(dest, 'w') as out_file:
             writer = csv.writer(out_file, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
             writer.writerow(self.get_title())
             for i in range(len(self)):
                 writer.writerow(self.get_row(i))
+        if self.occupancy is not None:
+            self.accumulate()
+            self.occupancy.save(self.get_occupancy_path(dest))
+
+    @staticmethod
+    def get_occupancy_path(dest):
+        """
+        The path of the occupancy map saved alongside the csv file dest
+        """
+        return os.path.splitext(dest)[0] + '_occupancy.npy'
 
     def _get_row(self, idx):
         row = [idx]
@@ -63,13 +158,48 @@ class TrackingResults(object):
         row.extend(["{0:.2f}".format(p) for p in self.positions[idx]])
         row.append("{0:.2f}".format(self.areas[idx]))
         row.extend(["{0:.1f}".format(p) for p in self.distances_from_arena[idx]])
-        row.append("{0:.3f}".format(self.measures[idx]))
+        measure = self.measures[idx]
+        if isinstance(measure, tuple):
+            row.extend(["{0:.3f}".format(m) for m in measure])
+        else:
+            row.append("{0:.3f}".format(measure))
         row.append(self.in_tracking_roi[idx])
+        row.append(self.dropped[idx])
         return row
 
     def get_row(self, idx):
         return self._get_row(idx)
 
+    def get_cell(self, idx, column):
+        """
+        A single formatted value of row idx (formatted as in get_row), so that a view only formats
+        the cells it displays
+
+        :param int idx: The index of the row (frame)
+        :param str column: One of CELL_COLUMNS
+        :rtype: str
+        """
+        if column == 'frame':
+            return str(idx)
+        elif column == 'time':
+            return "{0:.3f}".format(self.times[idx])
+        elif column in ('x', 'y'):
+            return "{0:.2f}".format(self.positions[idx][column == 'y'])
+        elif column == 'area':
+            return "{0:.2f}".format(self.areas[idx])
+        elif column in ('centre_distance', 'border_distance'):
+            return "{0:.1f}".format(self.distances_from_arena[idx][column == 'border_distance'])
+        elif column == 'measure':
+            measure = self.measures[idx]
+            if isinstance(measure, tuple):
+                return ", ".join(["{0:.3f}".format(m) for m in measure])
+            return "{0:.3f}".format(measure)
+        elif column == 'in_roi':
+            return str(self.in_tracking_roi[idx])
+        elif column == 'dropped':
+            return str(self.dropped[idx])
+        raise KeyError('Unknown column {}, expected one of {}'.format(column, CELL_COLUMNS))
+
     def get_frame_results(self):
         return self.get_last_position(), self.get_last_dist_from_arena_pair()
 
@@ -126,6 +256,12 @@ class TrackingResults(object):
     def get_last_in_tracking_roi(self):
         return self.in_tracking_roi[-1]
 
+    def get_last_dropped(self):
+        return self.dropped[-1]
+
+    def get_n_dropped(self):
+        return sum(self.dropped)
+
     def get_last_time(self):
         return self.times[-1]
 
@@ -144,34 +280,58 @@ class TrackingResults(object):
     def append_default_in_tracking_roi(self):
         self.in_tracking_roi.append(self.default_in_tracking_roi)
 
-    def append_default_time(self):
-        if self.start_time is not None:
-            self.times.append(time() - self.start_time)
-        else:
-            self.times.append(0.0)
-            self.start_time = time()
+    def append_default_dropped(self):
+        self.dropped.append(self.default_dropped)
 
-    def _append_defaults(self):
+    def get_relative_time(self, timestamp):
+        """
+        The time (s) from self.start_time to timestamp (self.start_time is set to timestamp if None)
+
+        :param float timestamp: A time as returned by time.time()
+        """
+        if self.start_time is None:
+            self.start_time = timestamp
+        return timestamp - self.start_time
+
+    def append_default_time(self, t=None):
+        """
+        :param float t: The time (s) of the frame from self.start_time (now if None)
+        """
+        self.times.append(self.get_relative_time(time()) if t is None else t)
+
+    def _append_defaults(self, t=None):
+        self.accumulate()
         self.append_default_pos()
         self.append_default_area()
         self.append_default_measure()
         self.append_default_dist_from_arena()
         self.append_default_in_tracking_roi()
-        self.append_default_time()
+        self.append_default_dropped()
+        self.append_default_time(t)
+
+    def append_defaults(self, t=None):
+        self._append_defaults(t)
 
-    def append_defaults(self):
-        self._append_defaults()
+    def append_dropped(self, t=None):
+        """
+        Appends a row for a frame that was read from the stream but not processed
+        so that the results stay aligned with the frame indices
+        """
+        self._append_defaults(t)
+        self.dropped[-1] = True
 
-    def repeat_last(self):
+    def repeat_last(self, t=None):
         if len(self) > 0:
+            self.accumulate()
             self.repeat_last_position()
             self.repeat_last_measure()
             self.repeat_last_area()
             self.repeat_last_distance_from_arena()
             self.repeat_last_in_tracking_roi()
-            self.append_default_time()  # Time is always current
+            self.append_default_dropped()
+            self.append_default_time(t)  # Time is always current
         else:
-            self.append_defaults()
+            self.append_defaults(t)
 
     def repeat_last_measure(self):
         self.measures.append(self.measures[-1])
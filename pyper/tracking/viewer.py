@@ -1,5 +1,4 @@
 import numpy as np
-from progressbar import Percentage, Bar, ProgressBar
 
 from pyper.exceptions.exceptions import VideoStreamFrameException
 from pyper.tracking.tracking import IS_PI
@@ -40,6 +39,7 @@ class Viewer(object):
         """
         is_recording = hasattr(self._stream, 'n_frames')
         if is_recording:
+            from progressbar import Percentage, Bar, ProgressBar  # Imported on first use (slow import)
             widgets = ['Video Progress: ', Percentage(), Bar()]
             pbar = ProgressBar(widgets=widgets, maxval=self._stream.n_frames).start()
         bg_frame, track_start, track_end = [None] * 3
@@ -58,6 +58,23 @@ def strip_html_tags(html):
     return stripped_text
 
 
+def get_structure_not_found_lines(img_size, frame_idx):
+    """
+    The lines of the error message written by write_structure_not_found_msg
+
+    :param tuple img_size: The size of the image
+    :param int frame_idx: The frame at which the structure cannot be found
+    :return: A list of (text, origin)
+    """
+    lines = ("No contour found at frame: {}".format(frame_idx),
+             "Please check your parameters",
+             "And ensure specimen is there")
+    x = int(50)
+    y = int(img_size[0] / 2)
+    y_spacing = 40
+    return [(line, (x, y + i * y_spacing)) for i, line in enumerate(lines)]
+
+
 def write_structure_not_found_msg(img, img_size, frame_idx):
     """
     Write an error message on the image supplied as argument. The operation is performed in place
@@ -66,30 +83,29 @@ def write_structure_not_found_msg(img, img_size, frame_idx):
     :param img: The source image to write onto
     :param tuple img_size: The size of the source image
     """
-    line1 = "No contour found at frame: {}".format(frame_idx)
-    line2 = "Please check your parameters"
-    line3 = "And ensure specimen is there"
-    x = int(50)
-    y = int(img_size[0] / 2)
-    y_spacing = 40
     font_color = (255, 255, 0)  # yellow
     font_size = 0.75  # percent
     font_type = int(2)
-    cv2.putText(img, line1, (x, y), font_type, font_size, font_color)
-    y += y_spacing
-    cv2.putText(img, line2, (x, y), font_type, font_size, font_color)
-    y += y_spacing
-    cv2.putText(img, line3, (x, y), font_type, font_size, font_color)
+    for line, origin in get_structure_not_found_lines(img_size, frame_idx):
+        cv2.putText(img, line, origin, font_type, font_size, font_color)
 
 
-def write_structure_size_incorrect_msg(img, img_size, msg):
+def get_structure_size_incorrect_line(img_size, msg):
+    """
+    :return: The (text, origin) of the message written by write_structure_size_incorrect_msg
+    """
     x = int(50)
     y_spacing = 40
     y = int(img_size[0] / 2) - y_spacing
+    return msg, (x, y)
+
+
+def write_structure_size_incorrect_msg(img, img_size, msg):
     font_color = (255, 255, 0)  # yellow
     font_size = 0.75  # percent
     font_type = int(2)
-    cv2.putText(img, msg, (x, y), font_type, font_size, font_color)
+    line, origin = get_structure_size_incorrect_line(img_size, msg)
+    cv2.putText(img, line, origin, font_type, font_size, font_color)
 
 
 def qurl_to_str(url):  # FIXME: extract to helper module
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+***************************
+The annotation_layer module
+***************************
+
+This module hosts the AnnotationLayer and TrajectoryOverlay classes.
+Instead of drawing the contours, ROIs, trajectories and messages into the image of every frame,
+the tracker records them as lightweight vector commands and only rasterises them when the frame
+is actually displayed or written. Frames that are never shown (e.g. headless or batch runs) do
+not pay for the drawing.
+"""
+import cv2
+import numpy as np
+
+from pyper.contours.object_contour import ObjectContour
+from pyper.utilities.utils import get_structure_not_found_lines, get_structure_size_incorrect_line
+
+FONT_TYPE = 2
+
+
+class AnnotationLayer(object):
+    """
+    A list of drawing commands (in the coordinates of the frame they annotate)
+
+    Use as follows:
+
+    >>> annotations = AnnotationLayer()
+    >>> annotations.add_contour(contour, color='r')
+    >>> annotations.add_text('Frame: 12', (5, 30))
+    >>> annotations.flush(img)  # Draws into img (in place) and clears the commands
+    """
+    def __init__(self):
+        self.commands = []
+
+    def __len__(self):
+        return len(self.commands)
+
+    def clear(self):
+        del self.commands[:]
+
+    def add_contour(self, contour, color='w', line_thickness=1):
+        """
+        :param contour: The contour (array of shape [n_points, 1, 2])
+        :param str color: The color (one of ObjectContour.COLORS)
+        :param int line_thickness: The thickness in pixels of the line (-1 to fill)
+        """
+        self.commands.append((cv2.drawContours, ([contour], 0, ObjectContour.COLORS[color], line_thickness)))
+
+    def add_polyline(self, points, color=(0, 255, 0), closed=False):
+        """
+        :param points: The points as an array of shape [1, n_points, 2] (int32)
+        :param tuple color: The BGR color
+        :param bool closed: Whether to join the last point to the first
+        """
+        if len(points) > 0:
+            self.commands.append((cv2.polylines, (points, closed, color)))
+
+    def add_circle(self, centre, radius, color='w', line_thickness=-1):
+        centre = tuple(int(round(c)) for c in centre)
+        self.commands.append((cv2.circle, (centre, radius, ObjectContour.COLORS[color], line_thickness)))
+
+    def add_rectangle(self, top_left, bottom_right, color=(0, 255, 255), line_thickness=-1):
+        self.commands.append((cv2.rectangle, (top_left, bottom_right, color, line_thickness)))
+
+    def add_text(self, text, origin, font_size=1, color=(255, 255, 255)):
+        self.commands.append((cv2.putText, (text, origin, FONT_TYPE, font_size, color)))
+
+    def add_structure_not_found_msg(self, img_size, frame_idx):
+        """
+        See utils.write_structure_not_found_msg
+        """
+        for line, origin in get_structure_not_found_lines(img_size, frame_idx):
+            self.add_text(line, origin, 0.75, (255, 255, 0))
+
+    def add_structure_size_incorrect_msg(self, img_size, msg):
+        """
+        See utils.write_structure_size_incorrect_msg
+        """
+        line, origin = get_structure_size_incorrect_line(img_size, msg)
+        self.add_text(line, origin, 0.75, (255, 255, 0))
+
+    def add_overlay(self, overlay):
+        """
+        :param overlay: An object with a composite(img) method (e.g. TrajectoryOverlay)
+        """
+        self.commands.append((overlay.composite, ()))
+
+    def render(self, img):
+        """
+        Draws the commands into img (in place)
+
+        :param img: The image to draw into
+        :type img: np.ndarray
+        :return: img
+        """
+        if img is None:
+            return img
+        for draw, args in self.commands:
+            draw(img, *args)
+        return img
+
+    def flush(self, img):
+        """
+        Draws the commands into img (in place) and clears them (so that they are only drawn once)
+
+        :param img: The image to draw into
+        :type img: np.ndarray
+        :return: img
+        """
+        self.render(img)
+        self.clear()
+        return img
+
+    def flush_shapes(self, img):
+        """
+        Draws the commands other than text into img (in place) and clears them. The text commands are kept,
+        e.g. to draw the shapes before warping img and the text after (so that the text is not distorted)
+
+        :param img: The image to draw into
+        :type img: np.ndarray
+        :return: img
+        """
+        texts = [command for command in self.commands if command[0] is cv2.putText]
+        self.commands = [command for command in self.commands if command[0] is not cv2.putText]
+        self.flush(img)
+        self.commands = texts
+        return img
+
+
+class TrajectoryOverlay(object):
+    """
+    The trajectory of the specimen drawn incrementally into a persistent overlay image.
+    Each update only draws the segments of the new positions and the overlay is composited
+    onto the display frame within the bounding box of the trajectory, so that the cost per frame
+    does not grow with the length of the session.
+    In tail mode, only the last tail_length positions are drawn (as a polyline of bounded length).
+
+    Use as follows:
+
+    >>> overlay = TrajectoryOverlay()
+    >>> overlay.update(tracker.results.positions, frame.shape[:2])
+    >>> annotations.add_overlay(overlay)
+    """
+    def __init__(self, color=(0, 255, 0), tail_length=None, default_pos=(-1, -1)):
+        """
+        :param tuple color: The BGR color of the trajectory
+        :param int tail_length: The number of positions to draw (the full trajectory if None)
+        :param tuple default_pos: The position of the frames where the specimen was not found (skipped)
+        """
+        self.color = color
+        self.tail_length = tail_length
+        self.default_pos = default_pos
+        self.overlay = None
+        self.mask = None
+        self.bounding_box = None  # (x0, y0, x1, y1) of the drawn pixels
+        self._n_processed = 0  # The number of positions already drawn
+        self._last_point = None
+        self._tail = None
+
+    def reset(self):
+        self.overlay = None
+        self.mask = None
+        self.bounding_box = None
+        self._n_processed = 0
+        self._last_point = None
+        self._tail = None
+
+    def _allocate(self, shape):
+        height, width = shape
+        self.overlay = np.zeros((height, width, 3), dtype=np.uint8)
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+
+    def _extend_bounding_box(self, p1, p2):
+        x0, x1 = min(p1[0], p2[0]) - 1, max(p1[0], p2[0]) + 2  # The line can be 1 pixel wide on each side
+        y0, y1 = min(p1[1], p2[1]) - 1, max(p1[1], p2[1]) + 2
+        if self.bounding_box is not None:
+            bx0, by0, bx1, by1 = self.bounding_box
+            x0, y0, x1, y1 = min(x0, bx0), min(y0, by0), max(x1, bx1), max(y1, by1)
+        height, width = self.mask.shape
+        self.bounding_box = (max(x0, 0), max(y0, 0), min(x1, width), min(y1, height))
+
+    def update(self, positions, shape):
+        """
+        Draws the positions that were added since the last update
+
+        :param list positions: All the positions of the specimen so far (e.g. TrackingResults.positions)
+        :param tuple shape: The (height, width) of the frames
+        """
+        if len(positions) < self._n_processed or (self.mask is not None and self.mask.shape != tuple(shape)):
+            self.reset()  # New tracking session or new frame size
+        if self.tail_length is not None:
+            tail = [p for p in positions[-self.tail_length:] if p != self.default_pos]
+            self._tail = np.int32([tail]) if tail else None
+            self._n_processed = len(positions)
+            return
+        if self.mask is None:
+            self._allocate(shape)
+        for pos in positions[self._n_processed:]:
+            if pos == self.default_pos:
+                continue
+            point = (int(pos[0]), int(pos[1]))
+            if self._last_point is not None:
+                cv2.line(self.overlay, self._last_point, point, self.color)
+                cv2.line(self.mask, self._last_point, point, 255)
+                self._extend_bounding_box(self._last_point, point)
+            self._last_point = point
+        self._n_processed = len(positions)
+
+    def composite(self, img):
+        """
+        Draws the trajectory onto img (in place)
+
+        :param img: The display frame (gray or BGR)
+        :return: img
+        """
+        if self.tail_length is not None:
+            if self._tail is not None:
+                cv2.polylines(img, self._tail, False, self.color)
+            return img
+        if self.bounding_box is None:
+            return img
+        x0, y0, x1, y1 = self.bounding_box
+        mask = self.mask[y0:y1, x0:x1].astype(bool)
+        overlay = self.overlay[y0:y1, x0:x1]
+        if img.ndim == 2:
+            overlay = overlay[:, :, 0]  # Like cv2 drawing functions, only the first channel on gray images
+        else:
+            mask = mask[:, :, np.newaxis]
+        np.copyto(img[y0:y1, x0:x1], overlay, where=mask)
+        return img
@@ -1,6 +1,8 @@
 import os
 import tempfile
 
+import cv2
+
 from pyper.video.cv_wrappers.video_capture import VideoCapture, VideoCaptureOpenError
 from pyper.video.cv_wrappers.video_writer import VideoWriter, VideoWriterOpenError
 
@@ -48,3 +50,17 @@ def camera_available():
     except VideoCaptureOpenError:
         detected = False
     return detected
+
+
+def find_contours(mask, mode=cv2.RETR_LIST, method=cv2.CHAIN_APPROX_NONE, offset=(0, 0)):
+    """
+    Wraps cv2.findContours to return only the contours whatever the version of OpenCV
+    (the number of returned values changed between versions)
+
+    :param mask: The binary mask to search (it is copied as old versions of OpenCV modify it in place)
+    :param int mode: The contour retrieval mode
+    :param int method: The contour approximation method
+    :param tuple offset: The (x, y) shift added to all the points (e.g. if mask is a crop of a larger image)
+    :return: The list of contours
+    """
+    return cv2.findContours(mask.copy(), mode=mode, method=method, offset=offset)[-2]
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+***************************
+The recording_policy module
+***************************
+
+This module decides which of the frames of a live session are written to disk.
+The tracker submits every frame it would save to its recording policy, together with whether
+a recording trigger (e.g. the specimen entered the ROI, moved, or an external signal) fired for
+that frame. The policy returns the frames to write now:
+
+    * ContinuousRecording writes every frame (the default)
+    * DecimatedRecording writes one frame in n
+    * EventRecording only writes the frames around the triggers. The frames preceding a trigger
+      are kept (copied) in a ring buffer so that the onset of the event is in the video.
+
+The frames that are not written are neither converted nor encoded, so the encoding bandwidth
+(e.g. on the Raspberry Pi) only goes to the frames of interest.
+Because the videos of the last two policies miss frames, their fps does not give the time of the frames.
+The tracker saves the index and time of each frame written alongside the video instead.
+"""
+from __future__ import division
+
+from collections import deque
+
+import numpy as np
+
+from pyper.exceptions.exceptions import PyperValueError
+
+RECORDING_POLICIES = ('continuous', 'decimated', 'events')
+RECORDING_TRIGGERS = ('roi', 'motion', 'external')
+
+
+class RecordingPolicy(object):
+    """
+    Abstract class for the recording policies.
+    The items submitted are typically frames or tuples of frames (e.g. annotated and raw) that are written together.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.n_submitted = 0
+        self.n_recorded = 0
+
+    def _select(self, item, triggered):
+        raise NotImplementedError("RecordingPolicy missing method _select")
+
+    def submit(self, item, triggered=False):
+        """
+        :param item: The frame (or tuple of frames) that could be written
+        :param bool triggered: Whether a recording trigger fired for this frame
+        :return: The list of items to write (in order)
+        """
+        items = self._select(item, triggered)
+        self.n_submitted += 1
+        self.n_recorded += len(items)
+        return items
+
+
+class ContinuousRecording(RecordingPolicy):
+    def _select(self, item, triggered):
+        return [item]
+
+
+class DecimatedRecording(RecordingPolicy):
+    """
+    Writes one frame every period frames
+    """
+    def __init__(self, period=2):
+        """
+        :param int period: The number of frames submitted per frame written
+        """
+        if period < 1:
+            raise PyperValueError('period must be at least 1, got {}'.format(period))
+        self.period = period
+        RecordingPolicy.__init__(self)
+
+    def _select(self, item, triggered):
+        return [item] if self.n_submitted % self.period == 0 else []
+
+
+def copy_item(item):
+    """
+    A copy of a frame or of a tuple of frames (the tracker reuses its frame buffers).
+    The other elements of a tuple (e.g. the frame index) are kept as is.
+    """
+    if isinstance(item, tuple):
+        return tuple(element.copy() if isinstance(element, np.ndarray) else element for element in item)
+    return item.copy()
+
+
+class EventRecording(RecordingPolicy):
+    """
+    Writes the frames from pre_trigger frames before a trigger to post_trigger frames after the last trigger.
+    Triggers that fire while recording extend the recording.
+    """
+    def __init__(self, pre_trigger=30, post_trigger=90):
+        """
+        :param int pre_trigger: The number of frames before the trigger to write (size of the ring buffer)
+        :param int post_trigger: The number of frames to write after the last trigger
+        """
+        if pre_trigger < 0 or post_trigger < 0:
+            raise PyperValueError('pre_trigger and post_trigger must be positive, got {} and {}'
+                                  .format(pre_trigger, post_trigger))
+        self.pre_trigger = pre_trigger
+        self.post_trigger = post_trigger
+        RecordingPolicy.__init__(self)
+
+    def reset(self):
+        RecordingPolicy.reset(self)
+        self.ring_buffer = deque(maxlen=self.pre_trigger) if self.pre_trigger else None
+        self.n_remaining = 0  # The number of frames still to write after the last trigger
+        self.n_events = 0
+
+    @property
+    def is_recording(self):
+        return self.n_remaining > 0
+
+    def _select(self, item, triggered):
+        if triggered:
+            if not self.is_recording:
+                self.n_events += 1
+            self.n_remaining = self.post_trigger + 1  # The current frame and the post trigger frames
+        if self.is_recording:
+            self.n_remaining -= 1
+            items = list(self.ring_buffer) if self.ring_buffer else []
+            if self.ring_buffer is not None:
+                self.ring_buffer.clear()
+            items.append(item)
+            return items
+        if self.ring_buffer is not None:
+            self.ring_buffer.append(copy_item(item))
+        return []
+
+
+def create_recording_policy(name, fps=30., period=2, pre_trigger=1., post_trigger=3.):
+    """
+    Creates the recording policy from its name (e.g. from the config file)
+
+    :param str name: One of RECORDING_POLICIES
+    :param float fps: The frame rate of the recording (to convert the trigger durations to frames)
+    :param int period: For 'decimated', the number of frames per frame written
+    :param float pre_trigger: For 'events', the duration (s) before the trigger to write
+    :param float post_trigger: For 'events', the duration (s) after the last trigger to write
+    :rtype: RecordingPolicy
+    """
+    if name == 'continuous':
+        return ContinuousRecording()
+    elif name == 'decimated':
+        return DecimatedRecording(period)
+    elif name == 'events':
+        return EventRecording(int(round(pre_trigger * fps)), int(round(post_trigger * fps)))
+    raise PyperValueError('Expected one of {} for the recording policy, got: {}'.format(RECORDING_POLICIES, name))
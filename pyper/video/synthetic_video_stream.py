@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+*********************************
+The synthetic_video_stream module
+*********************************
+
+This module provides a VideoStream that generates its frames instead of reading them from
+a file or a camera. The frames are deterministic (for a given seed) and contain one or more
+moving blobs whose true positions are known, on a textured background with noise and
+illumination drift.
+It can run far above real time (e.g. for throughput and accuracy tests) or emulate a live
+camera that delivers the frames at a fixed rate with jitter (e.g. to test the frame scheduling).
+"""
+from __future__ import division
+
+import time
+
+import numpy as np
+import cv2
+
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.video.cv_wrappers.video_writer import VideoWriter
+from pyper.video.video_frame import Frame
+from pyper.video.video_stream import VideoStream, CODEC
+
+
+class SyntheticBlob(object):
+    """
+    An elliptic blob moving in straight lines at constant speed and bouncing on the borders of the frame
+    """
+    def __init__(self, start, velocity, radii=(15, 10), angle=0, level=200):
+        """
+        :param tuple start: The (x, y) position of the centre at frame 0
+        :param tuple velocity: The (x, y) displacement in pixels per frame
+        :param tuple radii: The half axes of the ellipse
+        :param float angle: The orientation of the ellipse in degrees
+        :param int level: The gray level of the blob
+        """
+        self.start = np.array(start, dtype=np.float64)
+        self.velocity = np.array(velocity, dtype=np.float64)
+        self.radii = radii
+        self.angle = angle
+        self.level = level
+
+    def get_position(self, frame_idx, size):
+        """
+        The position of the centre of the blob at frame_idx (the ground truth)
+
+        :param int frame_idx: The index of the frame
+        :param tuple size: The (width, height) of the frame
+        :return: The (x, y) position
+        """
+        margin = np.array([max(self.radii)] * 2, dtype=np.float64)
+        low = margin
+        span = np.array(size, dtype=np.float64) - 2 * margin
+        if (span <= 0).any():
+            raise PyperValueError('Blob of radii {} too big for frame of size {}'.format(self.radii, size))
+        unfolded = self.start - low + self.velocity * frame_idx
+        folded = np.mod(unfolded, 2 * span)  # Reflect on the borders
+        folded = np.where(folded > span, 2 * span - folded, folded)
+        return tuple(low + folded)
+
+    def draw(self, img, position, shift=4):
+        """
+        Draws the blob at position with sub-pixel accuracy
+
+        :param img: The image to draw into (modified in place)
+        :param tuple position: The (x, y) position of the centre
+        :param int shift: The number of fractional bits of the coordinates
+        """
+        factor = 2 ** shift
+        centre = tuple(int(round(c * factor)) for c in position)
+        axes = tuple(int(round(r * factor)) for r in self.radii)
+        color = (self.level,) * 3 if img.ndim == 3 else self.level
+        cv2.ellipse(img, centre, axes, self.angle, 0, 360, color, -1, cv2.LINE_AA, shift)
+
+
+class SyntheticVideoStream(VideoStream):
+    """
+    A subclass of VideoStream that generates deterministic frames with known ground truth
+
+    Use as follows:
+
+    >>> stream = SyntheticVideoStream(size=(1280, 720), n_frames=500, noise_sd=3,
+    ...                               blobs=[SyntheticBlob((100, 100), (4, 2.5))])
+    >>> tracker = Tracker(stream=stream, threshold=40)
+    >>> positions = tracker.track()
+    >>> errors = np.array(positions[1:]) - stream.get_ground_truth()[1:, 0]
+    """
+    N_NOISE_FRAMES = 16  # The noise patterns are precomputed and cycled through for speed
+
+    def __init__(self, save_path=None, bg_start=0, n_background_frames=1, size=(640, 480), fps=30.,
+                 n_frames=300, blobs=None, background_level=40, texture_amplitude=10, noise_sd=2.,
+                 illumination_drift=0., drift_period=10., seed=0, live=False, jitter=0.):
+        """
+        :param str save_path: The path to save the video to (not saved if None)
+        :param int bg_start: The frame to use as background frames range start
+        :param int n_background_frames: The number of frames to use for the background
+        :param tuple size: The (width, height) of the frames
+        :param float fps: The frame rate (used for the drift and the live emulation)
+        :param int n_frames: The number of frames of the stream (infinite if None)
+        :param list blobs: The SyntheticBlob objects to draw (one moving blob if None)
+        :param int background_level: The average gray level of the background
+        :param int texture_amplitude: The amplitude of the (static) background texture
+        :param float noise_sd: The standard deviation of the gaussian noise of each frame
+        :param float illumination_drift: The amplitude (gray levels) of the sinusoidal global illumination drift
+        :param float drift_period: The period (s) of the illumination drift
+        :param int seed: The seed of the random generators (same seed, same frames)
+        :param bool live: Whether to emulate a live camera (frames delivered at fps in real time)
+        :param float jitter: The maximum deviation (s) of the live frames delivery time
+        """
+        self.size = tuple(size)
+        self.width, self.height = self.size
+        self.fps = fps
+        self.n_frames = n_frames
+        self.blobs = [SyntheticBlob((size[0] / 4, size[1] / 3), (3.2, 1.7))] if blobs is None else blobs
+        self.background_level = background_level
+        self.noise_sd = noise_sd
+        self.illumination_drift = illumination_drift
+        self.drift_period = drift_period
+        self.seed = seed
+        self.is_live = live
+        self.jitter = jitter
+        self.start_time = None
+
+        rng = np.random.RandomState(seed)
+        self._background = self._make_background(rng, texture_amplitude)
+        self._noise = [np.round(rng.normal(0, noise_sd, self._background.shape)).astype(np.int16)
+                       for _ in range(SyntheticVideoStream.N_NOISE_FRAMES)] if noise_sd > 0 else None
+        VideoStream.__init__(self, save_path, bg_start, n_background_frames)
+
+    def _make_background(self, rng, amplitude):
+        """
+        A smooth random texture (so that the background subtraction is not trivial)
+        """
+        coarse = rng.uniform(-amplitude, amplitude, (max(self.height // 32, 2), max(self.width // 32, 2)))
+        texture = cv2.resize(coarse, self.size, interpolation=cv2.INTER_CUBIC)
+        return np.clip(self.background_level + texture, 0, 255).astype(np.int16)
+
+    def _start_video_capture_session(self, save_path):
+        """
+        There is no capture, the frames are generated
+
+        :param str save_path: the destination file path
+        :return: (None, VideoWriter or None)
+        """
+        video_writer = None
+        if save_path is not None:
+            video_writer = VideoWriter(save_path, CODEC, self.fps, self.size, is_color=True)
+        return None, video_writer
+
+    def get_ground_truth(self, n_frames=None):
+        """
+        The true positions of the centres of the blobs
+
+        :param int n_frames: The number of frames (defaults to the length of the stream)
+        :return: An array of shape (n_frames, n_blobs, 2)
+        """
+        n_frames = self.n_frames if n_frames is None else n_frames
+        if n_frames is None:
+            raise PyperValueError('n_frames required for an infinite stream')
+        return np.array([[blob.get_position(i, self.size) for blob in self.blobs] for i in range(n_frames)])
+
+    def get_illumination_offset(self, frame_idx):
+        t = frame_idx / self.fps
+        return self.illumination_drift * np.sin(2 * np.pi * t / self.drift_period)
+
+    def get_frame_time(self, frame_idx):
+        """
+        The time (relative to the start of the stream) at which a live camera would deliver frame_idx
+
+        :param int frame_idx: The index of the frame
+        :rtype: float
+        """
+        jitter = 0
+        if self.jitter:
+            jitter = np.random.RandomState(self.seed + frame_idx).uniform(-self.jitter, self.jitter)
+        return max(frame_idx / self.fps + jitter, 0)
+
+    def make_frame(self, frame_idx):
+        """
+        Generates frame_idx (the frames are independent of each other)
+
+        :param int frame_idx: The index of the frame
+        :return: The BGR image (uint8)
+        """
+        img = self._background.copy()
+        if self._noise is not None:
+            img += self._noise[np.random.RandomState(self.seed + frame_idx).randint(len(self._noise))]
+        offset = self.get_illumination_offset(frame_idx)
+        if offset:
+            img += int(round(offset))
+        img = np.clip(img, 0, 255).astype(np.uint8)
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        if frame_idx > self.bg_end_frame:  # The specimens enter after the background frames
+            for blob in self.blobs:
+                blob.draw(img, blob.get_position(frame_idx, self.size))
+        return img
+
+    def _wait_for_frame(self, frame_idx):
+        """
+        Blocks until the emulated camera delivers frame_idx (frames that are already late are returned at once)
+        """
+        if self.start_time is None:
+            self.start_time = time.time()
+        delay = self.start_time + self.get_frame_time(frame_idx) - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _next_frame_idx(self):
+        self.current_frame_idx += 1
+        if self.n_frames is not None and self.current_frame_idx >= self.n_frames:
+            raise EOFError("End of recording reached")
+        if self.is_live:
+            self._wait_for_frame(self.current_frame_idx)
+        return self.current_frame_idx
+
+    def read(self):
+        """
+        Returns the next frame after updating the count
+
+        :return: frame
+        :rtype: video_frame.Frame
+
+        :raises: EOFError when end of stream is reached
+        """
+        return Frame(self.make_frame(self._next_frame_idx()).astype(np.float32))
+
+    def skip(self):
+        """
+        Drops the next frame without generating it
+        """
+        self._next_frame_idx()
+
+    def save(self, frame):
+        if self.video_writer is not None:
+            VideoStream.save(self, frame)
+
+    def stop_recording(self, msg):
+        """
+        Stops recording and rewinds the stream
+
+        :param str msg: The message to print on closing.
+        """
+        print(msg)
+        if self.video_writer is not None:
+            self.video_writer.release()
+        self.current_frame_idx = -1
+        self.start_time = None
@@ -4,14 +4,28 @@
 The video_frame module
 **********************
 
-This module subclasses numpy to ease image analysis
+This module subclasses numpy to ease image analysis.
+It also provides the PreprocessingPipeline that runs a chain of pre-processing steps
+into preallocated buffers.
 
 :author: crousse
 """
+from multiprocessing.pool import ThreadPool
+
 import numpy as np
 import cv2
-from skimage.segmentation import clear_border
-from scipy import misc
+
+from pyper.exceptions.exceptions import PyperValueError
+
+
+def gaussian_kernel_size(sigma):
+    """
+    The size of the Gaussian kernel adapted to sigma (the same rule as OpenCV uses for 8 bits images)
+
+    :param float sigma: The sigma of the Gaussian filter
+    :rtype: int
+    """
+    return int(round(sigma * 3 * 2 + 1)) | 1
 
 
 class Frame(np.ndarray):
@@ -52,7 +66,8 @@ class Frame(np.ndarray):
         :return: the blurred frame
         :rtype: video_frame.Frame
         """
-        return Frame(cv2.GaussianBlur(self.copy(), (15, 15), sigma))
+        ksize = gaussian_kernel_size(sigma)
+        return Frame(cv2.GaussianBlur(self, (ksize, ksize), sigma))
 
     def denoise(self, kernel_size=3):
         """
@@ -64,7 +79,7 @@ class Frame(np.ndarray):
         :return: the denoised frame
         :rtype: video_frame.Frame
         """
-        return Frame(cv2.medianBlur(self.copy(), kernel_size))
+        return Frame(cv2.medianBlur(self, kernel_size))
         
     def gray(self, in_place=False):
         """
@@ -165,6 +180,7 @@ class Frame(np.ndarray):
         :return: the eroded mask
         :rtype: video_frame.Frame
         """
+        from skimage.segmentation import clear_border  # Imported on first use (slow import)
         return Frame(clear_border(self))
         
     def save(self, path):
@@ -173,7 +189,7 @@ class Frame(np.ndarray):
         
         :param str path: the destination path
         """
-        misc.imsave(path, self)
+        cv2.imwrite(path, self)
         
     def paint(self, text='', curve=(), text_color=(255, 255, 255), curve_color=(0, 255, 0)):  # OPTIMISE:
         if text:
@@ -211,3 +227,131 @@ class Frame(np.ndarray):
         else:
             if self._quit_pressed():
                 raise KeyboardInterrupt
+
+
+class PreprocessingPipeline(object):
+    """
+    A chain of pre-processing steps compiled once for a given frame shape.
+    Each step writes into a preallocated buffer instead of allocating a new Frame and,
+    optionally, the frame is split into horizontal stripes processed in parallel
+    (each stripe is padded with the rows required by the filters so that the
+    result is identical to processing the full frame).
+
+    .. warning:: The returned Frame is a view of an internal buffer that is overwritten by the next call
+
+    .. note:: OpenCV already parallelises most filters internally, the stripes are mostly useful when \
+    OpenCV threading is limited (e.g. cv2.setNumThreads) and several cores are available.
+
+    Use as follows:
+
+    >>> pipeline = PreprocessingPipeline(('gray', 'denoise', 'blur'), sigma=1.5)
+    >>> processed_frame = pipeline(frame)
+    """
+    STEPS = ('gray', 'denoise', 'blur')
+
+    def __init__(self, steps=STEPS, sigma=1.5, median_kernel_size=3, n_stripes=1):
+        """
+        :param tuple steps: The steps to run in order (from PreprocessingPipeline.STEPS)
+        :param float sigma: The sigma of the Gaussian blur
+        :param int median_kernel_size: The kernel size of the median filter (odd and > 1)
+        :param int n_stripes: The number of horizontal stripes processed in parallel
+        """
+        for step in steps:
+            if step not in PreprocessingPipeline.STEPS:
+                raise PyperValueError("Expected steps in {}, got: {}".format(PreprocessingPipeline.STEPS, step))
+        self.steps = tuple(steps)
+        self.sigma = sigma
+        self.median_kernel_size = median_kernel_size
+        self.blur_kernel_size = gaussian_kernel_size(sigma)
+        self.n_stripes = max(1, int(n_stripes))
+
+        self._shape = None
+        self._stripes = []
+        self._output = None
+        self._pool = None
+
+    def get_halo(self):
+        """
+        The number of extra rows each stripe needs on both sides for the filters of the chain
+        """
+        halo = 0
+        for step in self.steps:
+            if step == 'denoise':
+                halo += self.median_kernel_size // 2
+            elif step == 'blur':
+                halo += self.blur_kernel_size // 2
+        return halo
+
+    def _compile(self, shape, dtype):
+        """
+        Computes the stripes boundaries and allocates the buffers for frames of the given shape
+
+        :param tuple shape: The shape of the source frames
+        :param dtype: The data type of the source frames
+        """
+        n_rows = shape[0]
+        n_stripes = min(self.n_stripes, n_rows)
+        out_shape = shape[:2] if ('gray' in self.steps and len(shape) == 3) else shape
+        halo = self.get_halo() if n_stripes > 1 else 0
+        bounds = np.linspace(0, n_rows, n_stripes + 1).astype(int)
+        self._stripes = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            src_start = max(start - halo, 0)
+            src_end = min(end + halo, n_rows)
+            buffer_shape = (src_end - src_start,) + out_shape[1:]
+            buffers = [np.empty(buffer_shape, dtype=dtype) for _ in self.steps]
+            self._stripes.append((start, end, src_start, src_end, buffers))
+        self._output = Frame(np.empty(out_shape, dtype=dtype))
+        if self._pool is not None:
+            self._pool.close()
+        self._pool = ThreadPool(n_stripes) if n_stripes > 1 else None
+        self._shape = shape
+
+    def _run_step(self, step, src, dst):
+        if step == 'gray':
+            if src.ndim == 3:
+                cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=dst)
+            else:
+                dst[:] = src
+        elif step == 'denoise':
+            cv2.medianBlur(src, self.median_kernel_size, dst=dst)
+        elif step == 'blur':
+            ksize = (self.blur_kernel_size, self.blur_kernel_size)
+            cv2.GaussianBlur(src, ksize, self.sigma, dst=dst)
+
+    def _run_stripe(self, frame, stripe):
+        start, end, src_start, src_end, buffers = stripe
+        src = frame[src_start:src_end]
+        for step, dst in zip(self.steps, buffers):
+            self._run_step(step, src, dst)
+            src = dst
+        self._output[start:end] = src[start - src_start:end - src_start]
+
+    def __call__(self, frame):
+        """
+        Runs the chain of steps on frame
+
+        :param frame: The source frame (not modified)
+        :return: The processed frame
+        :rtype: video_frame.Frame
+        """
+        if not self.steps:
+            return frame
+        if frame.shape != self._shape:
+            self._compile(frame.shape, frame.dtype)
+        frame = np.asarray(frame)
+        if self._pool is None:
+            self._run_stripe(frame, self._stripes[0])
+        else:
+            self._pool.map(lambda stripe: self._run_stripe(frame, stripe), self._stripes)
+        return self._output
+
+    def close(self):
+        """
+        Stops the threads used to process the stripes (the pipeline is compiled again on its next call)
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._shape = None
@@ -18,7 +18,6 @@ import sys
 
 import numpy as np
 import cv2
-from skimage.transform import rescale
 
 from pyper.video.cv_wrappers.video_capture import VideoCapture, VideoCaptureGrabError, VideoCapturePropertySetError
 from pyper.exceptions.exceptions import VideoStreamIOException, VideoStreamTypeException, VideoStreamFrameException
@@ -27,10 +26,7 @@ from pyper.video.cv_wrappers.video_writer import VideoWriter
 from pyper.video.video_frame import Frame
 from pyper.config import conf
 
-IS_PI = (platform.machine()).startswith('arm')
-if IS_PI:
-    import picamera.array
-    from pyper.camera.camera import CvPiCamera
+IS_PI = (platform.machine()).startswith('arm')  # picamera is imported by PiVideoStream on first use (slow import)
 
 config = conf.config
 
@@ -47,6 +43,7 @@ class VideoStream(object):
     """
     A video stream which is supposed to be subclassed for use
     """
+    is_live = True  # Whether the frames are captured when they are read (cameras) or come from a recording
     def __init__(self, save_path, bg_start, n_background_frames):
         """
         :param str save_path: The path to save the video to (should end in container extension)
@@ -95,6 +92,13 @@ class VideoStream(object):
         This is one of the methods that are expected to change the most between 
         implementations. """
         raise NotImplementedError('This method should be defined by subclasses')
+
+    def skip(self):
+        """
+        Drops the next frame without returning it. The frame count is still updated.
+        Subclasses should overwrite this method if the frame can be skipped without decoding.
+        """
+        self.read()
     
     def _start_video_capture_session(self, src_path):
         """ Should return a stream of frames to be used by read()
@@ -137,6 +141,7 @@ class RecordedVideoStream(VideoStream):
     A subclass of VideoStream that supplies the frames from a
     video file
     """
+    is_live = False
     def __init__(self, file_path, bg_start, n_background_frames):
         """
         :param str file_path: The source file path to read for the video
@@ -221,8 +226,11 @@ class RecordedVideoStream(VideoStream):
         self.current_frame_idx += 1
         if self.current_frame_idx > self.n_frames:
             raise EOFError("End of recording reached")
-        frame = self.stream.read()
-        return Frame(frame.astype(np.float32))  # TODO: see if should change exception to VideoStreamFrameException
+        try:
+            frame = self.stream.read()
+        except VideoCaptureGrabError:  # The frame count from the metadata can be over-estimated
+            raise EOFError("End of recording reached")
+        return Frame(frame.astype(np.float32))
         
     def time_str_to_frame_idx(self, time_str):
         """
@@ -262,22 +270,24 @@ class UsbVideoStream(VideoStream):
     """
     DEFAULT_FRAME_SIZE = (640, 480)
 
-    def __init__(self, save_path, bg_start, n_background_frames, requested_fps=None):
+    def __init__(self, save_path, bg_start, n_background_frames, requested_fps=None, cam_idx=DEFAULT_CAM):
         """
         :param str save_path: The destination file path to save the video to
         :param int bg_start: The frame to use as background frames range start
         :param int n_background_frames: The number of frames to use for the background
+        :param int cam_idx: The index of the camera to open
         """
         if requested_fps is None:
             self.fps = DEFAULT_FPS
         else:
             self.fps = requested_fps
+        self.cam_idx = cam_idx
         VideoStream.__init__(self, save_path, bg_start, n_background_frames)
 
     def _start_video_capture_session(self, save_path):
         """
         Initiates a VideoCapture object to supply the frames to read
-        (from the default usb camera)
+        (from the usb camera at self.cam_idx)
         and a VideoWriter object to save a potential output
 
         :param str save_path: the destination file path
@@ -285,7 +295,7 @@ class UsbVideoStream(VideoStream):
         :return: capture and video_writer object
         :type: (VideoCapture, VideoWriter)
         """
-        capture = VideoCapture(DEFAULT_CAM)
+        capture = VideoCapture(self.cam_idx)
         try:
             capture.set("fps", self.fps)
             if capture.fps != self.fps:  # FIXME: use raise Warning
@@ -336,6 +346,18 @@ class UsbVideoStream(VideoStream):
             raise VideoStreamFrameException("UsbVideoStream frame not found")
         self.current_frame_idx += 1
         return Frame(frame.astype(np.float32))
+
+    def skip(self):
+        """
+        Grabs the next frame from the camera without decoding it
+
+        :raises: VideoStreamFrameException when no frame can be grabbed
+        """
+        try:
+            self.stream.grab()
+        except VideoCaptureGrabError:
+            raise VideoStreamFrameException("UsbVideoStream frame not found")
+        self.current_frame_idx += 1
             
     def stop_recording(self, msg):
         """
@@ -369,6 +391,7 @@ class PiVideoStream(VideoStream):
         """
         Initialises the CvPiCamera object to provide the frames
         """
+        from pyper.camera.camera import CvPiCamera
         self._cam = CvPiCamera()
         self._cam.resolution = DEFAULT_FRAME_SIZE[::-1]  # openCV flips dimensions
         if os.getuid() == 0:
@@ -387,6 +410,7 @@ class PiVideoStream(VideoStream):
         :return: array and video_writer object
         :type: (picamera.array.PiRGBArray, VideoWriter)
         """
+        import picamera.array
         video_writer = VideoWriter(save_path, CODEC, self.fps, DEFAULT_FRAME_SIZE)
         stream = picamera.array.PiRGBArray(self._cam)
         return stream, video_writer
@@ -462,6 +486,7 @@ class QuickRecordedVideoStream(RecordedVideoStream):
         
         :raises: VideoStreamIOException if video cannot be read
         """
+        from skimage.transform import rescale  # Imported on first use (slow import)
         n_frames = 0
         self.frames = []
         while True:
@@ -500,6 +525,7 @@ class ImageListVideoStream(object):
     """
     A minimalist VideoStream it just implements the read() method to return images from a list
     """
+    is_live = False
     def __init__(self, imgs_list):
         """
         :param list imgs_list: The list of images constituting the stream
@@ -0,0 +1,64 @@
+"""
+The fixtures shared by the test packages.
+The test videos are drawn frame by frame on a uniform background and written as MJPG files.
+"""
+import cv2
+import numpy as np
+import pytest
+
+
+def write_video(path, draw, shape=(240, 320), n_frames=12, fps=20, background=30):
+    """
+    :param str path: The destination of the video
+    :param draw: A function (img, frame_idx) drawing the scene on the (height, width, 3) uint8 img in place
+    :param tuple shape: The (height, width) of the frames
+    :return: path
+    """
+    height, width = shape
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height), True)
+    try:
+        for i in range(n_frames):
+            img = np.full((height, width, 3), background, dtype=np.uint8)
+            draw(img, i)
+            writer.write(img)
+    finally:
+        writer.release()
+    return path
+
+
+def draw_ellipse(img, i):
+    if i > 0:  # The first frame is the background
+        cv2.ellipse(img, (60 + 15 * i, 80 + 5 * i), (20, 12), 30, 0, 360, (220, 220, 220), -1)
+
+
+def draw_border_object_and_ellipse(img, i):
+    if i > 0:
+        cv2.rectangle(img, (0, 100), (40, 160), (220, 220, 220), -1)  # Bigger, but touches the border
+        cv2.ellipse(img, (100 + 10 * i, 80), (20, 12), 30, 0, 360, (220, 220, 220), -1)
+
+
+@pytest.fixture
+def make_video(tmpdir):
+    """
+    A factory of videos in tmpdir: make_video(draw, name='video.avi', **write_video_kwargs) -> path
+    """
+    def make(draw, name='video.avi', **kwargs):
+        return write_video(str(tmpdir.join(name)), draw, **kwargs)
+    return make
+
+
+@pytest.fixture
+def ellipse_video(make_video):
+    """
+    A factory of 320x240 videos of an ellipse moving diagonally: ellipse_video(n_frames) -> path
+    """
+    return lambda n_frames: make_video(draw_ellipse, 'ellipse.avi', n_frames=n_frames)
+
+
+@pytest.fixture
+def border_video(make_video):
+    """
+    A factory of 320x240 videos of an ellipse moving right and a bigger object touching
+    the left border: border_video(n_frames) -> path
+    """
+    return lambda n_frames: make_video(draw_border_object_and_ellipse, 'border.avi', n_frames=n_frames)
@@ -0,0 +1,73 @@
+import math
+import time
+
+import pytest
+
+from pyper.analysis.kinematics import OnlineKinematics
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.tracking.tracking import Tracker
+from pyper.video.synthetic_video_stream import SyntheticVideoStream, SyntheticBlob
+
+
+def feed(kinematics, positions, fps=10., wall_distances=None):
+    events = []
+    for i, pos in enumerate(positions):
+        kinematics.add(pos, i / fps, None if wall_distances is None else wall_distances[i])
+        events.extend((i, event) for event in kinematics.events)
+    return events
+
+
+def test_speed_and_turning_rate():
+    kinematics = OnlineKinematics(window=4)
+    feed(kinematics, [(2 * i, 0) for i in range(10)])
+    assert kinematics.speed == pytest.approx(20)
+    assert kinematics.acceleration == pytest.approx(0)
+    assert kinematics.turning_rate == pytest.approx(0)
+    kinematics.reset()
+    feed(kinematics, [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)])  # A square: 90 degrees at each corner
+    assert kinematics.turning_rate == pytest.approx(2 * (math.pi / 2) / 0.3)  # 2 turns within the window
+    with pytest.raises(PyperValueError):
+        OnlineKinematics(window=2)
+
+
+def test_immobility_bouts_and_wall_events():
+    kinematics = OnlineKinematics(window=3, immobility_speed=5, immobility_min_duration=0.5, near_wall_distance=15)
+    positions = [(10 * i, 0) for i in range(5)] + [(40, 0)] * 10 + [(40 + 10 * i, 0) for i in range(1, 5)]
+    wall_distances = [50 - 10 * min(i, 4) for i in range(len(positions))]
+    events = feed(kinematics, positions, wall_distances=wall_distances)
+    assert [event for _, event in events] == ['wall_enter', 'immobility_start', 'immobility_end']
+    assert kinematics.n_immobility_bouts == 1
+    assert not kinematics.is_immobile
+    assert kinematics.wall_fraction == pytest.approx(1.4 / 1.8)
+
+
+def test_tracker_updates_kinematics_each_frame():
+    stream = SyntheticVideoStream(size=(160, 120), n_frames=30, fps=30.,
+                                  blobs=[SyntheticBlob((40, 40), (3, 0), radii=(6, 4))])
+    kinematics = OnlineKinematics(window=5)
+    n_updates = []
+    kinematics.add_callback(lambda k: n_updates.append(k.n_positions))
+    tracker = Tracker(stream=stream, threshold=40, min_area=20, max_area=5000, teleportation_threshold=10000,
+                      bg_start=0, track_from=1, kinematics=kinematics)
+    tracker.track()
+    n_found = len([p for p in tracker.results.positions if p != tracker.results.default_pos])
+    assert n_updates == list(range(1, n_found + 1))
+    assert kinematics.n_positions == n_found > 20
+    assert kinematics.speed == pytest.approx(3 / (tracker.results.times[-1] - tracker.results.times[-2]), rel=0.5)
+
+
+@pytest.mark.parametrize('live', (False, True))
+def test_kinematics_time_base(live):
+    stream = SyntheticVideoStream(size=(160, 120), n_frames=20, fps=20., live=live,
+                                  blobs=[SyntheticBlob((40, 40), (3, 0), radii=(6, 4))])
+    kinematics = OnlineKinematics(window=5)
+    tracker = Tracker(stream=stream, threshold=40, min_area=20, max_area=5000, teleportation_threshold=10000,
+                      bg_start=0, track_from=1, kinematics=kinematics)
+    if not live:
+        tracker.after_frame_track = lambda: time.sleep(0.01)  # The processing speed must not matter
+    tracker.track()
+    if live:  # The capture times (the frames are delivered at fps)
+        assert kinematics.speed == pytest.approx(3 * 20., rel=0.3)
+    else:  # The times of the frames in the video
+        assert kinematics.time == pytest.approx(19 / 20.)
+        assert kinematics.speed == pytest.approx(3 * 20., rel=1e-3)
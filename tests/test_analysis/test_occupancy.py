@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+import pytest
+
+from pyper.analysis.occupancy import OccupancyMap
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.tracking.tracking import Tracker
+from pyper.tracking.tracking_results import TrackingResults
+from pyper.video.synthetic_video_stream import SyntheticVideoStream, SyntheticBlob
+
+
+def test_occupancy_matches_histogram():
+    rng = np.random.RandomState(0)
+    positions = rng.uniform(0, 200, (500, 2))
+    occupancy = OccupancyMap(bin_size=20)
+    for pos in positions:
+        occupancy.add(tuple(pos))
+    expected = np.histogram2d(positions[:, 1], positions[:, 0], bins=10, range=((0, 200), (0, 200)))[0]
+    assert np.array_equal(occupancy.get_map(shape=(200, 200)), expected)
+    assert occupancy.get_map(normalise=True).sum() == pytest.approx(1)
+
+
+def test_occupancy_weightings():
+    time_occupancy = OccupancyMap(bin_size=10, weighting='time')
+    speed_occupancy = OccupancyMap(bin_size=10, weighting='speed')
+    for i, pos in enumerate(((5, 5), (5, 5), (25, 5), (35, 5))):
+        time_occupancy.add(pos, i * 0.5)
+        speed_occupancy.add(pos, i * 0.5)
+    assert np.allclose(time_occupancy.get_map(), [[1, 0, 0.5, 0]])  # Credited to the bin the time is spent in
+    assert np.allclose(speed_occupancy.get_map(), [[0, 0, 40, 20]])
+    with pytest.raises(PyperValueError):
+        OccupancyMap(weighting='velocity')
+
+
+def test_results_accumulate_final_positions(tmpdir):
+    results = TrackingResults()
+    results.set_occupancy(OccupancyMap(bin_size=10))
+    for pos in ((5, 5), (15, 5), (15, 5)):
+        results.append_defaults()
+        results.update(pos, 10., float('NaN'), (None, None))
+    results.overwrite_last_pos(results.default_pos)  # e.g. teleportation
+    results.append_defaults()
+    assert np.array_equal(results.get_occupancy(), [[1, 1]])
+    dest = str(tmpdir.join('results.csv'))
+    results.to_csv(dest)
+    assert np.array_equal(np.load(results.get_occupancy_path(dest)), [[1, 1]])
+
+
+def test_tracker_occupancy_matches_positions():
+    stream = SyntheticVideoStream(size=(160, 120), n_frames=40, blobs=[SyntheticBlob((40, 40), (3, 2), radii=(6, 4))])
+    tracker = Tracker(stream=stream, threshold=40, min_area=20, max_area=5000, teleportation_threshold=10000,
+                      bg_start=0, track_from=1, occupancy_bin_size=16)
+    tracker.track()
+    positions = np.array([p for p in tracker.results.positions if p != tracker.results.default_pos])
+    expected = np.histogram2d(positions[:, 1], positions[:, 0], bins=(8, 10), range=((0, 128), (0, 160)))[0]
+    assert len(positions) > 30
+    assert np.array_equal(tracker.results.get_occupancy(), expected)
+
+
+def test_tracker_time_occupancy_uses_video_time():
+    stream = SyntheticVideoStream(size=(160, 120), n_frames=20, fps=25.,
+                                  blobs=[SyntheticBlob((40, 40), (3, 2), radii=(6, 4))])
+    tracker = Tracker(stream=stream, threshold=40, min_area=20, max_area=5000, teleportation_threshold=10000,
+                      bg_start=0, track_from=1)
+    tracker.results.set_occupancy(OccupancyMap(bin_size=16, weighting='time'))
+    tracker.after_frame_track = lambda: time.sleep(0.01)  # Slower than real time
+    tracker.track()
+    assert np.allclose(tracker.results.times, np.arange(20) / 25.)
+    n_positions = sum(p != tracker.results.default_pos for p in tracker.results.positions)
+    assert n_positions == 19
+    assert tracker.results.get_occupancy().sum() == pytest.approx((n_positions - 1) / 25.)
@@ -0,0 +1,47 @@
+import numpy as np
+
+from pyper.analysis.roi_analysis import RoiAnalysis, get_bouts, get_membership
+from pyper.contours.roi import Circle, FreehandRoi, Rectangle, RoiCollection
+
+
+def test_get_bouts():
+    starts, ends = get_bouts([True, True, False, False, True, False, True])
+    assert list(starts) == [0, 4, 6]
+    assert list(ends) == [2, 5, 7]
+
+
+def test_membership_with_missing_positions():
+    rois = RoiCollection([Rectangle(0, 0, 10, 10), FreehandRoi([(20, 0), (40, 0), (40, 20), (20, 20)])])
+    positions = [(5, 5), (-1, -1), (30, 10), (-1, -1), (50, 50)]
+    membership = get_membership(positions, rois)
+    assert membership.tolist() == [[True, False], [False, False], [False, True], [False, False], [False, False]]
+    filled = get_membership(positions, rois, fill_missing=True)
+    assert filled[:, 1].tolist() == [False, False, True, True, False]
+
+
+def test_roi_statistics():
+    # 10 fps, out for 1s, in for 2s, out for 1s, in until the end (1s)
+    positions = [(0., 0.)] * 10 + [(50., 50.)] * 20 + [(0., 0.)] * 10 + [(50., 50.)] * 10
+    analysis = RoiAnalysis(positions, RoiCollection([Circle((50, 50), 10)]), fps=10)
+    stats = analysis.get_stats(0)
+    assert stats.n_entries == 2
+    assert stats.latency == 1
+    assert list(stats.bout_durations) == [2, 1]
+    assert stats.dwell_time == 3
+    assert list(stats.exit_times) == [3]
+    assert analysis.get_events() == [(10, 0, 'entry'), (30, 0, 'exit'), (40, 0, 'entry')]
+
+
+def test_scoring_long_trajectory():  # The speed is measured by the benchmarks (roi_analysis)
+    n_frames = 30 * 3600  # One hour at 30 fps
+    t = np.arange(n_frames) / 30.
+    positions = np.column_stack((320 + 200 * np.cos(t / 5.), 240 + 200 * np.sin(t / 7.)))
+    rois = RoiCollection([Circle((320, 240), 50), Rectangle(0, 0, 200, 200),
+                          FreehandRoi([(400, 300), (600, 300), (500, 460)])])
+    analysis = RoiAnalysis(positions, rois, fps=30, shape=(480, 640))
+    summary = analysis.get_summary()
+    assert analysis.membership.shape == (n_frames, 3)
+    distances = np.hypot(positions[:, 0] - 320, positions[:, 1] - 240)
+    in_circle = analysis.membership[:, 0]
+    assert not in_circle[distances > 51].any() and in_circle[distances < 49].all()
+    assert summary[0]['dwell_time'] == in_circle.sum() / 30.
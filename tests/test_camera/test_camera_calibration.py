@@ -0,0 +1,154 @@
+import cv2
+import numpy as np
+
+from pyper.camera.camera_calibration import CameraCalibration, densify_polygon
+from pyper.contours.roi import Rectangle
+from pyper.tracking.tracking import Tracker
+
+SHAPE = (120, 160)
+
+
+def make_calibration():
+    calib = CameraCalibration(9, 6)
+    calib.camera_matrix = np.array([[150., 0, 80], [0, 150., 60], [0, 0, 1]])
+    calib.distortion_coeffs = np.array([[-0.3, 0.1, 0, 0, 0]])
+    calib.optimise_matrix(np.zeros(SHAPE, dtype=np.uint8))
+    calib.map_x, calib.map_y = calib.get_map(np.zeros(SHAPE, dtype=np.uint8))
+    return calib
+
+
+def test_points_round_trip():
+    calib = make_calibration()
+    points = np.array([[10., 10.], [80., 60.], [150., 100.]])
+    assert np.allclose(calib.distort_points(calib.undistort_points(points)), points, atol=0.1)
+
+
+def test_undistorted_points_match_remapped_frame():
+    calib = make_calibration()
+    raw = np.zeros(SHAPE, dtype=np.uint8)
+    cv2.circle(raw, (30, 25), 2, 255, -1)
+    remapped = calib.remap(raw)
+    ys, xs = np.nonzero(remapped > 127)
+    expected = calib.undistort_points([(30, 25)])[0]
+    assert np.allclose((xs.mean(), ys.mean()), expected, atol=1)
+
+
+def test_distorted_roi_contains_distorted_centre():
+    calib = make_calibration()
+    roi = Rectangle(40, 30, 60, 50)
+    source_roi = calib.distort_roi(roi)
+    assert source_roi.contains_point(tuple(calib.distort_points([(70, 55)])[0]))
+    assert len(source_roi.points) > 4  # Straight edges were resampled
+
+
+def test_densify_polygon():
+    square = np.array([[0, 0], [10, 0], [10, 10], [0, 10]])
+    dense = densify_polygon(square, 2)
+    assert len(dense) == 20
+    steps = np.linalg.norm(np.diff(np.vstack((dense, dense[:1])), axis=0), axis=1)
+    assert (steps <= 2).all()
+
+
+def draw_moving_square(img, i):
+    if i > 0:  # The first frame is the background
+        cv2.rectangle(img, (20 + i, 20), (30 + i, 30), (220, 220, 220), -1)
+
+
+def draw_still_square(img, i):
+    if i > 0:
+        cv2.rectangle(img, (20, 20), (30, 30), (220, 220, 220), -1)
+
+
+def test_tracker_points_mode_matches_frame_mode(make_video):
+    path = make_video(draw_moving_square, 'square.avi', shape=SHAPE, n_frames=10, background=20)
+
+    positions = {}
+    for mode in ('frame', 'points'):
+        tracker = Tracker(src_file_path=path, threshold=40, min_area=20, teleportation_threshold=10000,
+                          bg_start=0, track_from=1, camera_calibration=make_calibration(), calibration_mode=mode)
+        positions[mode] = tracker.track()
+    assert np.allclose(positions['frame'][1:], positions['points'][1:], atol=1)
+
+
+def test_points_mode_remaps_only_recorded_frames(make_video):
+    from pyper.video.recording_policy import DecimatedRecording
+
+    path = make_video(draw_moving_square, 'square.avi', shape=SHAPE, n_frames=10, background=20)
+    calib = make_calibration()
+    remapped = []
+    remap = calib.remap
+    calib.remap = lambda img: remapped.append(img) or remap(img)
+    tracker = Tracker(src_file_path=path, threshold=40, min_area=20, teleportation_threshold=10000,
+                      bg_start=0, track_from=20, camera_calibration=calib, calibration_mode='points',
+                      recording_policy=DecimatedRecording(period=3))
+    saved = []
+    tracker._stream.save = saved.append
+    tracker.track(record=True)
+    assert tracker.recording_policy.n_submitted == 10
+    assert len(saved) == len(remapped) == 4  # Frames 0, 3, 6 and 9
+    assert tracker.recorded_frames == [(i, i / 20.) for i in range(0, 10, 3)]
+
+
+def make_chessboard_folder(folder, n_imgs=3):
+    square = 20
+    board = np.kron((np.indices((7, 10)).sum(axis=0) % 2) * 255, np.ones((square, square))).astype(np.uint8)
+    board = cv2.copyMakeBorder(board, 40, 40, 40, 40, cv2.BORDER_CONSTANT, value=255)
+    h, w = board.shape
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    for i in range(n_imgs):
+        dst = src + np.float32([[10 * i, 5 * i], [-5 * i, 8 * i], [-8 * i, -3 * i], [6 * i, -9 * i]])
+        warped = cv2.warpPerspective(board, cv2.getPerspectiveTransform(src, dst), (w, h), borderValue=255)
+        cv2.imwrite(str(folder.join('chess_{}.png'.format(i))), cv2.cvtColor(warped, cv2.COLOR_GRAY2BGR))
+    cv2.imwrite(str(folder.join('blank.png')), np.full((h, w, 3), 255, dtype=np.uint8))
+
+
+def test_calibrate_caches_corners(tmpdir):
+    make_chessboard_folder(tmpdir)
+    calib = CameraCalibration(9, 6)
+    calib.calibrate(str(tmpdir), n_workers=2)
+    assert len(calib.src_imgs) == len(calib.detected_imgs) == len(calib.corrected_imgs) == 3
+    assert calib.corrected_imgs[0].shape == calib.src_imgs[0].shape
+    assert tmpdir.join(CameraCalibration.CORNERS_CACHE_NAME).check()
+
+    cached_calib = CameraCalibration(9, 6)
+    cached_calib.get_images(str(tmpdir))
+    cache_path = str(tmpdir.join(CameraCalibration.CORNERS_CACHE_NAME))
+    corners, _ = cached_calib.detect_corners(cached_calib.img_paths, n_workers=1, cache_path=cache_path)
+    assert corners[0] is None  # blank.png
+    assert all(c.shape == (54, 1, 2) for c in corners[1:])
+
+
+def test_save_and_load_bundle(tmpdir):
+    calib = make_calibration()
+    path = str(tmpdir.join('calibration.npz'))
+    calib.save(path)
+    loaded = CameraCalibration.load(path)
+    assert (loaded.chess_width, loaded.chess_height) == (9, 6)
+    img = np.random.randint(0, 255, SHAPE, dtype=np.uint8)
+    assert (loaded.remap(img) == calib.remap(img)).all()
+    assert loaded.src_imgs == loaded.detected_imgs == loaded.corrected_imgs == []  # Not saved in the bundle
+
+
+def test_tracker_points_mode_draws_text_after_warping(make_video):
+    path = make_video(draw_still_square, 'square.avi', shape=SHAPE, n_frames=3, background=20)
+    tracker = Tracker(src_file_path=path, threshold=40, min_area=20, max_area=50, teleportation_threshold=10000,
+                      bg_start=0, track_from=1, camera_calibration=make_calibration(), calibration_mode='points')
+    saved = []
+    tracker._stream.save = saved.append
+    for _ in range(2):
+        tracker.track_frame(record=True)
+    assert len(tracker.annotations)  # The size message is left for the output frame
+    assert all(draw is cv2.putText for draw, _ in tracker.annotations.commands)
+
+
+def test_detect_corners_skips_images_of_another_size(tmpdir):
+    make_chessboard_folder(tmpdir)
+    img = cv2.imread(str(tmpdir.join('chess_1.png')))
+    cv2.imwrite(str(tmpdir.join('chess_3.png')), cv2.resize(img, None, fx=1.5, fy=1.5))
+    calib = CameraCalibration(9, 6)
+    calib.get_images(str(tmpdir))
+    cache_path = str(tmpdir.join(CameraCalibration.CORNERS_CACHE_NAME))
+    for _ in range(2):  # Detected, then from the cache
+        corners, img_size = calib.detect_corners(calib.img_paths, n_workers=1, cache_path=cache_path)
+        assert img_size == img.shape[1::-1]
+        assert [c is not None for c in corners] == [False, True, True, True, False]
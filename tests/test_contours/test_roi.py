@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+
+from pyper.contours.roi import Circle, Ellipse, FreehandRoi, Rectangle, RoiCollection
+from pyper.tracking.tracking_results import TrackingResults
+
+
+def make_frame():
+    return np.random.RandomState(0).uniform(0, 255, (120, 160, 3)).astype(np.float32)
+
+
+def test_measure_matches_full_frame_mask():
+    frame = make_frame()
+    roi = Circle((150, 60), 30)  # Partly outside the frame
+    full_mask = np.zeros_like(frame)
+    cv2.drawContours(full_mask, [roi.points], 0, 255, -1)
+    values = np.extract(full_mask, frame)
+
+    assert (roi.to_mask(frame) == full_mask).all()
+    mean, median, maximum = roi.measure(frame, ('mean', 'median', 'max'))
+    assert np.isclose(mean, values.mean(), rtol=1e-5)
+    assert np.isclose(median, np.median(values))
+    assert maximum == values.max()
+
+
+def test_mask_cached_per_shape():
+    roi = Rectangle(10, 10, 20, 20)
+    mask, bounding_box = roi.get_mask((120, 160))
+    assert roi.get_mask((120, 160, 3))[0] is mask
+    assert roi.get_mask((60, 80))[0] is not mask
+    assert bounding_box == (slice(10, 31), slice(10, 31))
+
+
+def test_roi_outside_frame():
+    assert np.isnan(Rectangle(200, 200, 10, 10).measure(make_frame())).all()
+
+
+def test_multiple_measures_csv_columns():
+    results = TrackingResults()
+    results.set_measure_names(['roi_0_mean', 'roi_0_max'])
+    results.append_defaults()
+    results.update((10., 20.), 100., (1., 2.), (None, None))
+    assert len(results.get_row(0)) == len(results.get_title())
+    assert results.get_row(0)[7:9] == ['1.000', '2.000']
+
+
+def polygon_contains(roi, points):
+    return np.array([cv2.pointPolygonTest(roi.points, (float(x), float(y)), False) > 0 for x, y in points])
+
+
+def test_analytic_membership_matches_polygon():
+    points = np.random.RandomState(1).uniform(0, 160, (500, 2))
+    for roi in (Circle((60, 50), 30), Rectangle(10., 20., 50., 30.), Ellipse(100., 60., 60., 30.)):
+        near_border = np.abs([roi.dist_from_border(tuple(p)) for p in points]) < 1.5
+        assert (roi.contains_points(points) == polygon_contains(roi, points))[~near_border].all()
+
+
+def test_index_lookups():
+    rois = RoiCollection([Circle((60, 50), 30), Rectangle(40, 40, 60, 40), FreehandRoi([(5, 5), (50, 10), (30, 60)])])
+    ys, xs = np.mgrid[-10:130:3, -10:170:3]
+    points = np.column_stack((xs.ravel(), ys.ravel()))  # Includes points outside the frame
+    dists = np.column_stack([[roi.dist_from_border(tuple(p)) for p in points] for roi in rois])
+    index_dists = rois.dists_from_border(points, (120, 160))
+    away_from_borders = (np.abs(dists) > 1.5).all(axis=1)
+    assert (rois.contains_points(points, (120, 160)) == (dists > 0))[away_from_borders].all()
+    assert np.abs(index_dists - dists).max() < 2.5
+    assert rois.get_index((120, 160)) is rois.get_index((120, 160, 3))
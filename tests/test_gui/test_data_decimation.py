@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.gui.data_decimation import MinMaxPyramid
+
+
+def test_window_keeps_extremes_and_is_bounded():
+    rng = np.random.RandomState(0)
+    data = rng.normal(0, 1, 1000003).astype(np.float32)
+    data[123457] = 50  # A single sample peak
+    pyramid = MinMaxPyramid(data)
+    xs, ys = pyramid.get_window(0, len(data), n_pixels=800)
+    assert 800 <= len(xs) // 2 <= 2 * 800
+    assert ys.max() == 50 and ys.min() == data.min()
+    window_xs, window_ys = pyramid.get_window(123000, 124000, n_pixels=800)
+    assert window_xs[0] <= 123000 and window_xs[-1] < 124000
+    assert window_ys.max() == 50
+
+
+def test_full_resolution_when_enough_pixels():
+    data = np.arange(100, dtype=np.float32) ** 2
+    xs, ys = MinMaxPyramid(data).get_window(10, 60, n_pixels=800)
+    assert np.array_equal(xs, np.arange(10, 60))
+    assert np.array_equal(ys, data[10:60])
+
+
+def test_window_bytes():
+    pyramid = MinMaxPyramid(np.arange(11))
+    points = np.frombuffer(pyramid.get_window_bytes(0, 11, 100), dtype='<f4').reshape(-1, 2)
+    assert np.allclose(points[:, 0], np.linspace(0, 1, 11))
+    assert np.array_equal(points[:, 1], np.arange(11))
+    with pytest.raises(PyperValueError):
+        MinMaxPyramid([])
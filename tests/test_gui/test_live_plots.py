@@ -0,0 +1,51 @@
+import numpy as np
+
+from pyper.gui.live_plots import LivePlot, MapPlot
+
+
+def render_full(values, plot):
+    reference = LivePlot(lambda start: values[start:], plot.sampling_freq, ylim=plot.fixed_ylim,
+                         initial_duration=plot.initial_duration)
+    reference.ax.set_xlim(plot.ax.get_xlim())
+    reference.ax.set_ylim(plot.ax.get_ylim())
+    reference.xs, reference.ys = list(plot.xs), list(plot.ys)
+    reference._redraw()
+    return np.asarray(reference.canvas.buffer_rgba())[:, :, :3]
+
+
+def test_incremental_render_matches_full_redraw():
+    values = list(np.sin(np.arange(200) / 10.) * 50)
+    n_available = [0]
+    plot = LivePlot(lambda start: values[start:n_available[0]], sampling_freq=10, ylim=(-60, 60),
+                    initial_duration=30)
+    for n_available[0] in range(10, 200, 10):
+        img = plot.get_array()
+    assert len(plot) == 190
+    assert plot.ax.get_xlim()[1] == 30  # No rescale, only blitting
+    differences = np.abs(img.astype(int) - render_full(values[:190], plot))
+    assert (differences > 30).mean() < 1e-3  # Only the antialiasing at the joins of the segments differs
+    assert (img != render_full(values[:0], plot)).any()
+
+
+def test_render_is_cached_until_new_data():
+    values = [0., 1., 2.]
+    plot = LivePlot(lambda start: values[start:], sampling_freq=1, initial_duration=2)
+    img = plot.get_array()
+    assert plot.get_array() is img
+    values.extend([50., 3.])
+    new_img = plot.get_array()
+    assert new_img is not img
+    assert plot.ax.get_xlim()[1] == 4  # Rescaled (doubled) to fit the new data
+    assert plot.ax.get_ylim()[1] > 50
+
+
+def test_map_plot_updates_its_image_in_place():
+    plot = MapPlot(title='Occupancy')
+    plot.update(np.eye(4), bin_size=10)
+    im = plot.im
+    plot.update(np.arange(12.).reshape(3, 4) * 5, bin_size=20)
+    assert plot.im is im and len(plot.ax.images) == 1
+    assert im.get_extent() == [0, 80, 60, 0]
+    assert im.get_clim() == (0, 55)
+    plot.fig.canvas.draw()
+    assert np.asarray(plot.fig.canvas.buffer_rgba()).shape[2] == 4
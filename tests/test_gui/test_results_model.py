@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from PyQt5.QtCore import Qt
+
+from pyper.gui.results_model import ROLES, ResultsTableModel
+from pyper.tracking.tracking_results import TrackingResults
+
+
+def append_rows(results, n_rows):
+    for i in range(n_rows):
+        results.append_defaults(i / 10.)
+        results.update((10. + i, 20.), 100., float('NaN'), (None, None))
+
+
+def connect_signals(model):
+    signals = []
+    model.rowsInserted.connect(lambda parent, first, last: signals.append(('inserted', first, last)))
+    model.modelReset.connect(lambda: signals.append(('reset',)))
+    return signals
+
+
+def get_cell(model, row, role_name):
+    return model.data(model.index(row), Qt.UserRole + 1 + ROLES.index(role_name))
+
+
+def test_appended_rows_are_inserted():
+    results = TrackingResults()
+    model = ResultsTableModel(lambda: results)
+    signals = connect_signals(model)
+    model.sync()
+    append_rows(results, 3)
+    model.sync()
+    model.sync()  # Nothing new
+    append_rows(results, 2)
+    model.sync()
+
+    assert signals == [('reset',), ('inserted', 0, 2), ('inserted', 3, 4)]
+    assert model.rowCount() == 5
+    assert get_cell(model, 4, 'x') == '14.00'
+    assert get_cell(model, 4, 'frameId') == 4
+    assert get_cell(model, 4, 'dropped') is False
+
+
+def test_reset_and_new_results():
+    current = {'results': TrackingResults()}
+    append_rows(current['results'], 4)
+    model = ResultsTableModel(lambda: current['results'])
+    model.sync()
+    signals = connect_signals(model)
+
+    current['results'].reset()
+    model.sync()
+    assert signals == [('reset',)]
+    assert model.rowCount() == 0
+
+    current['results'] = TrackingResults()
+    append_rows(current['results'], 2)
+    model.sync()
+    assert signals == [('reset',), ('reset',)]
+    assert model.rowCount() == 2
+
+
+def test_jump_to_frame():
+    results = TrackingResults()
+    model = ResultsTableModel(lambda: results)
+    assert model.row_of_frame(3) == -1
+    append_rows(results, 5)
+    assert model.row_of_frame(3) == 3  # Syncs first
+    assert model.row_of_frame(10) == 4
+    assert model.row_of_frame(-2) == 0
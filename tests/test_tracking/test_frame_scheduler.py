@@ -0,0 +1,58 @@
+import pytest
+
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.tracking.frame_scheduler import FrameScheduler
+from pyper.tracking.tracking_results import TrackingResults
+
+
+def test_all_policy_never_drops():
+    scheduler = FrameScheduler(10, 'all')
+    scheduler.start(0)
+    assert scheduler.get_n_frames_to_drop(0, now=5) == 0
+
+
+def test_latest_policy_drops_accumulated_frames():
+    scheduler = FrameScheduler(10, 'latest')
+    scheduler.start(0)
+    assert scheduler.get_n_frames_to_drop(0, now=0.05) == 0
+    assert scheduler.get_n_frames_to_drop(0, now=0.55) == 4  # frames 1 to 4 are late, 5 is current
+    assert scheduler.n_dropped == 4
+
+
+def test_latest_policy_reanchors_slow_camera():
+    scheduler = FrameScheduler(10, 'latest')
+    scheduler.start(0)
+    assert scheduler.get_n_frames_to_drop(20, now=1.) == 0
+    assert scheduler.get_n_frames_to_drop(21, now=1.15) == 0
+
+
+def test_adaptive_policy_degrades_before_dropping():
+    scheduler = FrameScheduler(10, 'adaptive')
+    scheduler.start(0)
+    scheduler.frame_processed(0.25)
+    assert scheduler.degrade
+    assert scheduler.step == 1
+    scheduler.frame_processed(0.25)
+    assert scheduler.step == 3
+    assert scheduler.get_n_frames_to_drop(0, now=1.) == 2
+    for _ in range(50):
+        scheduler.frame_processed(0.01)
+    assert scheduler.step == 1
+    assert not scheduler.degrade
+
+
+def test_unknown_policy():
+    with pytest.raises(PyperValueError):
+        FrameScheduler(10, 'random')
+
+
+def test_dropped_frames_keep_results_aligned():
+    results = TrackingResults()
+    results.append_defaults()
+    results.append_dropped()
+    results.append_dropped()
+    results.append_defaults()
+    assert len(results) == len(results.dropped) == len(results.times) == 4
+    assert results.dropped == [False, True, True, False]
+    assert results.get_n_dropped() == 2
+    assert results.get_row(1)[-1] is True
@@ -0,0 +1,48 @@
+"""
+The import time of the headless tracking modules (e.g. for the start up of the CLI on a Raspberry Pi).
+The heavy optional dependencies must only be imported on first use.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HEADLESS_MODULES = ('pyper.tracking.tracking', 'pyper.cli.tracking_cli')
+LAZY_DEPENDENCIES = ('skimage', 'scipy', 'matplotlib', 'PyQt5', 'picamera', 'tqdm', 'progressbar')
+MAX_IMPORT_TIME = float(os.environ.get('PYPER_MAX_IMPORT_TIME', 1.))  # (s) Excluding numpy and cv2
+
+
+def run_python(code, import_time=False):
+    """
+    :param bool import_time: Whether to log the import times (merged with the output)
+    :return: The output of code run in a new interpreter
+    """
+    options = ['-X', 'importtime'] if import_time else []
+    return subprocess.check_output([sys.executable] + options + ['-c', code], cwd=REPO_ROOT,
+                                   stderr=subprocess.STDOUT if import_time else None, universal_newlines=True)
+
+
+def get_import_time(module):
+    """
+    :return: The time (s) to import module in a new interpreter once numpy and cv2 are loaded
+    """
+    output = run_python('import numpy, cv2; import {}'.format(module), import_time=True)
+    for line in output.splitlines():
+        if line.startswith('import time:') and line.split('|')[-1].strip() == module:
+            return int(line.split('|')[1]) / 1e6
+    raise ValueError('{} not found in the import times'.format(module))
+
+
+@pytest.mark.parametrize('module', HEADLESS_MODULES)
+def test_heavy_dependencies_not_imported(module):
+    code = 'import sys; import {}; print("loaded:" + ",".join(m for m in {} if m in sys.modules))'\
+        .format(module, LAZY_DEPENDENCIES)
+    assert run_python(code).splitlines()[-1] == 'loaded:'
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime requires Python 3.7')
+@pytest.mark.parametrize('module', HEADLESS_MODULES)
+def test_import_time(module):
+    assert get_import_time(module) < MAX_IMPORT_TIME
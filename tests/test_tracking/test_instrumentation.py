@@ -0,0 +1,71 @@
+import json
+
+from pyper.tracking.instrumentation import Instrumentation, StageStats
+from pyper.tracking.tracking import Tracker
+from pyper.video.synthetic_video_stream import SyntheticBlob, SyntheticVideoStream
+
+
+def test_stage_stats_percentiles():
+    stats = StageStats()
+    for duration in [1e-3] * 90 + [1.] * 10:
+        stats.add(duration)
+    assert stats.n == 100
+    assert abs(stats.get_mean() - (0.09 + 10) / 100) < 1e-9
+    assert 1e-3 <= stats.get_percentile(50) < 2e-3
+    assert stats.get_percentile(95) == 1.
+    assert stats.get_percentile(100) == stats.max
+
+
+def test_log_is_rate_limited(capsys):
+    instrumentation = Instrumentation(log_period=5.)
+    start = instrumentation.start_time
+    with instrumentation.stage('read'):
+        pass
+    instrumentation.frame_done()
+    assert not instrumentation.log_if_due(now=start + 1)
+    assert instrumentation.log_if_due(now=start + 6)
+    assert not instrumentation.log_if_due(now=start + 7)
+    assert capsys.readouterr().out.count('fps') == 1
+
+
+def test_disabled_instrumentation_records_nothing():
+    instrumentation = Instrumentation(enabled=False)
+    with instrumentation.stage('read'):
+        pass
+    instrumentation.count('misses')
+    assert not instrumentation.stages
+    assert not instrumentation.counters
+
+
+def test_tracker_instrumentation(tmpdir, capsys):
+    stream = SyntheticVideoStream(size=(160, 120), n_frames=10, noise_sd=2,
+                                  blobs=[SyntheticBlob((40, 40), (3, 2), radii=(8, 6))])
+    tracker = Tracker(stream=stream, threshold=40, min_area=20, max_area=1000,
+                      teleportation_threshold=10000, bg_start=0, track_from=1)
+    tracker.track()
+    summary = tracker.instrumentation.get_summary()
+    assert summary['n_frames'] == 9
+    for stage in ('read', 'preprocess', 'silhouette', 'contours', 'results'):
+        assert stage in summary['stages']
+    assert summary['stages']['read']['n'] == 10
+    assert summary['stages']['results']['n'] == 9
+
+    tracker.min_area = 500  # All the detections are now too small
+    tracker.track()
+    assert tracker.instrumentation.counters['too_small'] == 9
+    assert 'too small' not in capsys.readouterr().out  # Counted, not printed per frame
+
+    dump_path = str(tmpdir.join('instrumentation.json'))
+    tracker.instrumentation.dump(dump_path)
+    with open(dump_path) as in_file:
+        assert json.load(in_file)['counters'] == {'too_small': 9}
+
+
+def test_draw_stage_recorded_once_per_frame():
+    stream = SyntheticVideoStream(size=(160, 120), n_frames=10, noise_sd=2,
+                                  blobs=[SyntheticBlob((40, 40), (3, 2), radii=(8, 6))])
+    tracker = Tracker(stream=stream, threshold=40, min_area=20, max_area=1000,
+                      teleportation_threshold=10000, bg_start=0, track_from=1)
+    tracker._stream.save = lambda frame: None
+    tracker.track(record=True)
+    assert tracker.instrumentation.get_summary()['stages']['draw']['n'] == 9
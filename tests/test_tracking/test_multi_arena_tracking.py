@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+import pytest
+
+from pyper.analysis.occupancy import OccupancyMap
+from pyper.camera.camera_calibration import CameraCalibration
+from pyper.contours.roi import Circle, Rectangle, RoiCollection
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.tracking.multi_arena_tracking import MultiArenaTracker
+
+N_FRAMES = 20
+
+
+def draw_cages(img, i):
+    if i > 0:  # The first frame is the background
+        cv2.rectangle(img, (5 + i, 10), (13 + i, 18), (220, 220, 220), -1)  # left cage, moves right
+        cv2.rectangle(img, (70, 5 + i), (78, 13 + i), (220, 220, 220), -1)  # right cage, moves down
+
+
+@pytest.fixture
+def cages_video(make_video):
+    return make_video(draw_cages, 'cages.avi', shape=(48, 96), n_frames=N_FRAMES, background=20)
+
+
+def test_one_result_per_arena(cages_video):
+    arenas = RoiCollection([Rectangle(0, 0, 48, 48), Rectangle(48, 0, 48, 48)])
+    tracker = MultiArenaTracker(arenas, src_file_path=cages_video,
+                                threshold=40, min_area=20, teleportation_threshold=10000,
+                                bg_start=0, track_from=1)
+    left_positions, right_positions = tracker.track()
+
+    assert len(left_positions) == len(right_positions) == N_FRAMES
+    assert left_positions[0] == right_positions[0] == (-1, -1)
+    for i in (1, 10, N_FRAMES - 1):
+        assert np.allclose(left_positions[i], (9 + i, 14), atol=1)
+        assert np.allclose(right_positions[i], (74, 9 + i), atol=1)
+    assert tracker.arenas_results[0].areas[10] > 20
+    left_border_distance = tracker.arenas_results[0].distances_from_arena[10][1]
+    assert abs(left_border_distance - 14) <= 1  # Closest to the top wall
+
+
+def test_arena_accumulators_and_frame_result(cages_video):
+    arenas = RoiCollection([Rectangle(0, 0, 48, 48), Rectangle(48, 0, 48, 48)])
+    tracker = MultiArenaTracker(arenas, src_file_path=cages_video,
+                                threshold=40, min_area=20, teleportation_threshold=10000,
+                                bg_start=0, track_from=1)
+    occupancy = OccupancyMap(bin_size=4)
+    tracker.arenas_results[1].set_occupancy(occupancy)
+    for _ in range(N_FRAMES // 2):
+        frame, positions, distances = tracker.track_frame()
+
+    assert len(positions) == len(distances) == 2
+    assert np.allclose(positions[0], (9 + N_FRAMES // 2 - 1, 14), atol=1)
+    assert occupancy.n_positions == N_FRAMES // 2 - 1  # Every frame but the background
+
+
+def test_unsupported_options(cages_video):
+    arenas = RoiCollection([Rectangle(0, 0, 48, 48), Rectangle(48, 0, 48, 48)])
+    with pytest.raises(PyperValueError):
+        MultiArenaTracker(arenas, src_file_path=cages_video, threshold=40, pyramid_level=1)
+    with pytest.raises(PyperValueError):
+        MultiArenaTracker(arenas, src_file_path=cages_video, threshold=40, camera_calibration=CameraCalibration(9, 6),
+                          calibration_mode='points')
+    tracker = MultiArenaTracker(arenas, src_file_path=cages_video, threshold=40)
+    with pytest.raises(PyperValueError):
+        tracker.set_tracking_region_roi(Circle((24, 24), 10))
+
+
+def test_arena_teleportations_are_counted(cages_video):
+    arenas = RoiCollection([Rectangle(0, 0, 48, 48), Rectangle(48, 0, 48, 48)])
+    tracker = MultiArenaTracker(arenas, src_file_path=cages_video,
+                                threshold=40, min_area=20, teleportation_threshold=0.5,
+                                bg_start=0, track_from=1)
+    tracker.track()
+    assert tracker.instrumentation.counters['teleportations'] > 0
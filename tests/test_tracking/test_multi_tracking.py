@@ -0,0 +1,88 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from pyper.tracking.multi_tracking import MultiStreamTracker
+
+N_FRAMES = 30
+
+
+def draw_specimen(x_offset):
+    def draw(img, i):
+        if i > 0:  # The first frame is the background
+            cv2.rectangle(img, (x_offset + i, 15), (x_offset + 10 + i, 25), (220, 220, 220), -1)
+    return draw
+
+
+@pytest.fixture
+def sources(make_video):
+    """One video per camera, with the specimen at a different offset"""
+    return [make_video(draw_specimen(offset), 'cam_{}.avi'.format(i), shape=(48, 64), n_frames=N_FRAMES, background=20)
+            for i, offset in enumerate((5, 15))]
+
+
+def test_multi_stream_tracking(sources):
+    multi_tracker = MultiStreamTracker(sources, threshold=40, min_area=20,
+                                       teleportation_threshold=10000, bg_start=0, track_from=1)
+    positions = multi_tracker.track()
+
+    assert len(positions) == 2
+    for stream_positions, offset in zip(positions, (5, 15)):
+        assert len(stream_positions) == N_FRAMES
+        assert stream_positions[0] == (-1, -1)
+        assert abs(stream_positions[10][0] - (offset + 10 + 5)) < 1
+    assert multi_tracker.errors == [None, None]
+    assert all(fps > 0 for fps in multi_tracker.get_fps())
+    assert multi_tracker.get_aggregate_fps() >= max(multi_tracker.get_fps())
+
+    indices = multi_tracker.get_synchronised_indices()
+    assert indices.shape == (N_FRAMES, 2)
+    assert (indices[:, 0] == np.arange(N_FRAMES)).all()
+    assert (np.diff(indices[:, 1]) >= 0).all()
+
+    synchronised_positions = multi_tracker.get_synchronised_positions()
+    assert synchronised_positions.shape == (N_FRAMES, 2, 2)
+    assert np.isnan(synchronised_positions[0, 0]).all()
+
+
+def test_live_times_are_read_times(sources):
+    multi_tracker = MultiStreamTracker(sources, threshold=40, min_area=20,
+                                       teleportation_threshold=10000, bg_start=0, track_from=1)
+    read_times = [[] for _ in sources]
+    for tracker, stream_read_times in zip(multi_tracker.trackers, read_times):
+        tracker._stream.is_live = True  # Emulates a camera
+        def read(original_read=tracker._stream.read, stream_read_times=stream_read_times):
+            frame = original_read()
+            stream_read_times.append(time.time())
+            return frame
+        tracker._stream.read = read
+        tracker.after_frame_track = lambda: time.sleep(0.01)  # Processing that follows the read
+    multi_tracker.track()
+
+    for tracker, stream_read_times in zip(multi_tracker.trackers, read_times):
+        times = np.array(tracker.results.times)
+        expected = np.array(stream_read_times[:len(times)]) - multi_tracker.start_time
+        assert np.allclose(times, expected, rtol=0, atol=0.005)
+
+
+def test_recorded_times_are_video_times(sources):
+    multi_tracker = MultiStreamTracker(sources, threshold=40, min_area=20,
+                                       teleportation_threshold=10000, bg_start=0, track_from=1)
+    multi_tracker.trackers[0].after_frame_track = lambda: time.sleep(0.01)  # Slower stream
+    multi_tracker.track()
+
+    for tracker in multi_tracker.trackers:
+        assert np.allclose(tracker.results.times, np.arange(N_FRAMES) / 20., rtol=0)
+    assert (multi_tracker.get_synchronised_indices()[:, 1] == np.arange(N_FRAMES)).all()
+
+
+def test_second_run_resets_trackers(sources):
+    multi_tracker = MultiStreamTracker(sources, threshold=40, min_area=20,
+                                       teleportation_threshold=10000, bg_start=0, track_from=1)
+    for _ in range(2):
+        multi_tracker.track(record=False)
+        for tracker in multi_tracker.trackers:
+            assert tracker.instrumentation.get_summary()['n_frames'] == N_FRAMES - 1
+            assert tracker.recorded_frames == []
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.tracking.parameter_sweep import ParameterSweep, expand_grid
+from pyper.tracking.tracking import Tracker
+
+N_FRAMES = 12
+TRACKER_KWARGS = dict(teleportation_threshold=10000, bg_start=0, track_from=1)
+
+
+def test_expand_grid():
+    grid = expand_grid({'threshold': [20, 40], 'min_area': [10, 50, 100]})
+    assert len(grid) == 6
+    assert {'threshold': 40, 'min_area': 100} in grid
+    with pytest.raises(PyperValueError):
+        expand_grid({'fast': [True]})
+
+
+def test_sweep_matches_individual_runs(ellipse_video):
+    path = ellipse_video(N_FRAMES)
+    sweep = ParameterSweep({'threshold': [40, 100], 'min_area': [20, 2000]}, src_file_path=path, **TRACKER_KWARGS)
+    all_positions = sweep.track()
+    assert len(all_positions) == 4
+
+    for params, positions, summary in zip(sweep.parameter_sets, all_positions, sweep.get_summaries()):
+        assert summary['n_frames'] == N_FRAMES - 1
+        if params['min_area'] == 2000:  # The ellipse is too small
+            assert summary['n_too_small'] == summary['n_frames']
+            assert summary['detection_rate'] == 0
+        else:
+            assert summary['detection_rate'] == 1
+            tracker = Tracker(src_file_path=path, threshold=params['threshold'], min_area=params['min_area'],
+                              **TRACKER_KWARGS)
+            assert positions == tracker.track()
+    assert sweep.get_best_params()['min_area'] == 20
+
+
+def test_sweep_clears_borders_like_tracker(border_video):
+    path = border_video(N_FRAMES)
+
+    sweep = ParameterSweep({'threshold': [40, 100]}, src_file_path=path, min_area=20, clear_borders=True,
+                           **TRACKER_KWARGS)
+    all_positions = sweep.track()
+    tracker = Tracker(src_file_path=path, threshold=40, min_area=20, clear_borders=True, **TRACKER_KWARGS)
+    positions = tracker.track()
+    assert all_positions[0] == positions
+    assert np.allclose(np.array(sweep.sweep_results[0].distances_from_arena, dtype=float),
+                       np.array(tracker.results.distances_from_arena, dtype=float), equal_nan=True)
+    assert np.allclose(np.array(positions[1:])[:, 1], 80, atol=1)  # The ellipse, not the rectangle
@@ -0,0 +1,153 @@
+import cv2
+import numpy as np
+import pytest
+
+from pyper.tracking.tracking import Tracker
+
+N_FRAMES = 12
+
+
+def track(path, **kwargs):
+    tracker = Tracker(src_file_path=path, threshold=40, min_area=20, teleportation_threshold=10000,
+                      bg_start=0, track_from=1, **kwargs)
+    positions = tracker.track()
+    return np.array(positions[1:]), np.array(tracker.results.areas[1:])
+
+
+@pytest.mark.parametrize('pyramid_level', [1, 2])
+def test_pyramid_detection_matches_full_resolution(ellipse_video, pyramid_level):
+    path = ellipse_video(N_FRAMES)
+    positions, areas = track(path)
+    pyramid_positions, pyramid_areas = track(path, pyramid_level=pyramid_level)
+    assert (positions > 0).all()
+    assert np.allclose(pyramid_positions, positions, atol=0.5)
+    assert np.allclose(pyramid_areas, areas, rtol=0.02)
+
+
+def test_pyramid_falls_back_to_full_resolution(ellipse_video):
+    path = ellipse_video(N_FRAMES)
+    tracker = Tracker(src_file_path=path, threshold=40, min_area=20, teleportation_threshold=10000,
+                      bg_start=0, track_from=1, pyramid_level=2, pyramid_margin=-8)  # Box smaller than the object
+    positions = tracker.track()
+    assert np.allclose(positions[1:], track(path)[0], atol=0.5)
+
+
+def test_pyramid_clears_borders_like_full_resolution(border_video):
+    path = border_video(N_FRAMES)
+    positions, _ = track(path, clear_borders=True)
+    assert np.allclose(positions[:, 1], 80, atol=1)  # The ellipse, not the rectangle
+    for pyramid_level in (1, 2):
+        pyramid_positions, _ = track(path, clear_borders=True, pyramid_level=pyramid_level)
+        assert np.allclose(pyramid_positions, positions, atol=0.5)
+
+
+def test_pyramid_crop_pipeline_compiled_once(ellipse_video):
+    path = ellipse_video(N_FRAMES)
+    tracker = Tracker(src_file_path=path, threshold=40, min_area=20, teleportation_threshold=10000,
+                      bg_start=0, track_from=1, pyramid_level=1, pyramid_check_period=0)
+    crop_pipeline = tracker._crop_pipelines[False]
+    compile_shapes = []
+    original_compile = crop_pipeline._compile
+    crop_pipeline._compile = lambda shape, dtype: (compile_shapes.append(shape), original_compile(shape, dtype))
+    tracker.track()
+    assert len(compile_shapes) == 1
+
+
+def test_pyramid_tolerance_falls_back_on_mismatch(ellipse_video):
+    path = ellipse_video(N_FRAMES)
+    tracker = Tracker(src_file_path=path, threshold=40, min_area=20, teleportation_threshold=10000,
+                      bg_start=0, track_from=1, pyramid_level=1, pyramid_tolerance=-1, pyramid_check_period=5)
+    positions = tracker.track()
+    assert tracker.instrumentation.counters['pyramid_mismatches'] == N_FRAMES - 1  # Checked until they agree
+    assert np.allclose(positions[1:], track(path)[0])
+
+
+def draw_arena(img, i):
+    cv2.circle(img, (160, 120), 100, (120, 120, 120), -1)
+    if i > 0:
+        cv2.circle(img, (100 + 8 * i, 120), 8, (250, 250, 250), -1)
+
+
+@pytest.mark.parametrize('arena_shape', ['circle', 'contour'])
+def test_arena_distances_from_precomputed_field(make_video, arena_shape):
+    path = make_video(draw_arena, 'arena.avi', n_frames=N_FRAMES)
+    tracker = Tracker(src_file_path=path, threshold=60, min_area=20, teleportation_threshold=10000,
+                      bg_start=0, track_from=1, extract_arena=True, arena_shape=arena_shape)
+    tracker.track()
+    assert np.allclose(tracker.arena.centre, (160, 120), atol=1.5)
+    positions = np.array(tracker.results.positions[1:])
+    distances = np.array(tracker.results.distances_from_arena[1:])
+    expected_from_centre = np.hypot(positions[:, 0] - 160, positions[:, 1] - 120)
+    assert np.allclose(distances[:, 0], expected_from_centre, atol=1.5)
+    assert np.allclose(distances[:, 1], 100 - expected_from_centre, atol=1.5)
+
+
+def test_event_recording_on_roi_entry(ellipse_video):
+    from pyper.contours.roi import Circle
+    from pyper.video.recording_policy import EventRecording
+
+    path = ellipse_video(N_FRAMES)
+    tracker = Tracker(src_file_path=path, threshold=40, min_area=20, teleportation_threshold=10000,
+                      bg_start=0, track_from=1, recording_policy=EventRecording(pre_trigger=2, post_trigger=1))
+    saved = []
+    tracker._stream.save = saved.append
+    roi = Circle((60 + 15 * 6, 80 + 5 * 6), 5)  # Only the centre of frame 6 is in the ROI
+    tracker.track(roi=roi, record=True)
+    assert tracker.results.in_tracking_roi[1:].count(True) == 1
+    assert len(saved) == 4  # 2 frames before the entry, the entry and 1 frame after
+    assert tracker.recording_policy.n_submitted == N_FRAMES
+
+
+class FrameList(list):
+    def save_frame(self, frame):
+        self.append(frame)
+
+
+@pytest.mark.parametrize('record', (False, True))
+def test_continuous_raw_file_has_every_frame(ellipse_video, record):
+    tracker = Tracker(src_file_path=ellipse_video(N_FRAMES), threshold=40, min_area=20,
+                      teleportation_threshold=10000, bg_start=2, track_from=3)
+    tracker._stream.save = lambda frame: None
+    tracker.raw_out_stream = FrameList()
+    tracker.track(record=record)
+    assert len(tracker.raw_out_stream) == N_FRAMES  # Including the frames before the background
+
+
+def test_policy_raw_frames_and_recorded_frames(tmpdir, ellipse_video):
+    from pyper.tracking.tracking import get_recorded_frames_path
+    from pyper.video.recording_policy import DecimatedRecording
+
+    tracker = Tracker(src_file_path=ellipse_video(N_FRAMES), threshold=40, min_area=20,
+                      teleportation_threshold=10000, bg_start=0, track_from=1,
+                      recording_policy=DecimatedRecording(period=3))
+    saved = []
+    tracker._stream.save = saved.append
+    tracker.raw_out_stream = FrameList()
+    tracker.track(record=True)
+    assert len(saved) == len(tracker.raw_out_stream) == N_FRAMES // 3
+    assert tracker.recorded_frames == [(i, i / 20.) for i in range(0, N_FRAMES, 3)]
+
+    dest = get_recorded_frames_path(str(tmpdir.join('out.avi')))
+    assert dest.endswith('out_frames.csv')
+    tracker.save_recorded_frames(dest)
+    with open(dest) as in_file:
+        lines = in_file.read().splitlines()
+    assert lines[0] == 'frame,time'
+    assert lines[2] == '3,0.150000'
+
+
+def test_stripe_threads_released_after_track(ellipse_video):
+    import threading
+
+    def count_workers():  # The progress bar has its own (long lived) monitor thread
+        return sum(thread.name != 'tqdm_monitor' for thread in threading.enumerate())
+
+    n_workers = count_workers()
+    tracker = Tracker(src_file_path=ellipse_video(N_FRAMES), threshold=40, min_area=20,
+                      teleportation_threshold=10000, bg_start=0, track_from=1, n_preprocessing_stripes=3)
+    positions = list(tracker.track())
+    assert tracker._pipelines[False]._pool is None
+    assert count_workers() == n_workers
+    tracker.results.reset()
+    assert tracker.track() == positions  # The stripes are started again
+    assert count_workers() == n_workers
@@ -0,0 +1,63 @@
+import numpy as np
+
+from pyper.tracking.tracking_background import Background
+from pyper.video.video_frame import Frame
+
+
+def build_background(n_frames=5, shape=(40, 60), seed=0):
+    rng = np.random.RandomState(seed)
+    bg = Background(n_sds=3)
+    for _ in range(n_frames):
+        bg.build(Frame((80 + rng.normal(0, 4, shape + (3,))).astype(np.float32)))
+    bg.finalise()
+    return bg, rng
+
+
+def test_threshold_map_matches_float_threshold():
+    bg, rng = build_background()
+    assert bg.use_sd
+    assert bg.threshold_map.dtype == bg.data.dtype
+    frame = Frame((80 + rng.normal(0, 10, bg.data.shape)).astype(np.float32))
+    frame[10:20, 10:20] = 200
+
+    silhouette, diff = bg.get_silhouette(frame, threshold=20)
+    expected = np.abs(frame - bg.data) > bg.get_std_threshold()
+    assert silhouette.dtype == diff.dtype == np.uint8
+    assert set(np.unique(silhouette)) <= {0, 255}
+    assert silhouette[10:20, 10:20].all()
+    assert ((silhouette > 0) == expected).all()
+    assert (diff == np.abs(frame - bg.data).astype(np.uint8)).all()  # Truncated, not rounded
+
+
+def test_fixed_threshold_and_buffer_reuse():
+    bg = Background(n_sds=3)
+    bg.build(Frame(np.full((40, 60, 3), 50, dtype=np.float32)))
+    bg.finalise()
+    assert not bg.use_sd
+    frame = Frame(np.full((40, 60), 50, dtype=np.float32))
+    frame[5:10, 5:10] = 100
+    silhouette, diff = bg.get_silhouette(frame, threshold=20)
+    assert silhouette.sum() == 25 * 255
+    assert diff.max() == 50
+    assert bg.get_silhouette(frame, threshold=20)[0] is silhouette
+
+
+def test_fixed_threshold_truncates_like_baseline():
+    bg = Background(n_sds=3)
+    bg.build(Frame(np.full((40, 60, 3), 50, dtype=np.float32)))
+    bg.finalise()
+    rng = np.random.RandomState(1)
+    frame = Frame((50 + rng.uniform(-25, 25, (40, 60))).astype(np.float32))
+    frame[0, :4] = (70.4, 70.6, 71.0, 29.4)  # Around the boundary of threshold=20
+    expected = (np.abs(frame - bg.data).astype(np.uint8) > 20) * 255
+    for region in (None, (slice(0, 40), slice(0, 60))):
+        silhouette, _ = bg.get_silhouette(frame, threshold=20, region=region)
+        assert (silhouette == expected).all()
+    assert list(silhouette[0, :4]) == [0, 0, 255, 0]
+
+
+def test_clear_keeps_n_sds():
+    bg, _ = build_background()
+    bg.clear()
+    assert bg.n_sds == 3
+    assert bg.threshold_map is None
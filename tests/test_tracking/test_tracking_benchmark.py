@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from tests.test_tracking.tracking_benchmark import (BENCHMARKS, BenchmarkContext, DEFAULT_TOLERANCE, find_regressions,
+                                                    get_key, load_baseline, run_benchmarks, save_baseline)
+
+BASELINE_PATH = os.environ.get('PYPER_BENCHMARK_BASELINE')  # Regression checks only run if set
+
+
+def test_all_benchmarks_run():
+    results = run_benchmarks(resolutions=((160, 120),), n_iter=2, repeat=1)
+    assert list(results) == [get_key(name, (160, 120)) for name in BENCHMARKS]
+    assert all(duration > 0 for duration in results.values())
+
+
+def test_benchmarks_release_writer_and_hide_progress(capsys):
+    run_benchmarks(resolutions=((160, 120),), names=['video_writer_save', 'tracker_track'], n_iter=2, repeat=1)
+    assert 'Tracking frames' not in capsys.readouterr().err
+
+
+def test_benchmark_cleanups_run_once(tmpdir):
+    ctx = BenchmarkContext((160, 120), str(tmpdir))
+    released = []
+    ctx.add_cleanup(lambda: released.append(True))
+    ctx.cleanup()
+    ctx.cleanup()
+    assert released == [True]
+
+
+def test_find_regressions():
+    baseline = {'a@1x1': 1e-3, 'b@1x1': 1e-3, 'c@1x1': 1e-7}
+    results = {'a@1x1': 1.1e-3, 'b@1x1': 2e-3, 'c@1x1': 1e-6, 'new@1x1': 1.}
+    assert find_regressions(results, baseline, tolerance=0.25) == [('b@1x1', 1e-3, 2e-3)]
+    assert find_regressions(results, baseline, tolerance=2) == []
+
+
+def test_baseline_round_trip(tmpdir):
+    path = str(tmpdir.join('baseline.json'))
+    save_baseline({'a@1x1': 0.5}, path)
+    assert load_baseline(path) == {'a@1x1': 0.5}
+
+
+@pytest.mark.skipif(BASELINE_PATH is None, reason='PYPER_BENCHMARK_BASELINE not set')
+def test_no_regression():
+    tolerance = float(os.environ.get('PYPER_BENCHMARK_TOLERANCE', DEFAULT_TOLERANCE))
+    baseline = load_baseline(BASELINE_PATH)
+    resolutions = sorted(set(tuple(int(v) for v in key.split('@')[1].split('x')) for key in baseline))
+    results = run_benchmarks(resolutions=resolutions)
+    assert find_regressions(results, baseline, tolerance) == []
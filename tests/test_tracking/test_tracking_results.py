@@ -0,0 +1,16 @@
+from pyper.tracking.tracking_results import TrackingResults, CELL_COLUMNS
+
+
+def test_cells_match_rows():
+    results = TrackingResults()
+    results.set_measure_names(['a', 'b'])
+    for i in range(3):
+        results.append_defaults()
+        results.update((10. + i, 20.5), 100., (1.25, 2.5), (30., 5.))
+    results.append_dropped()
+    for idx in range(len(results)):
+        row = [str(value) for value in results.get_row(idx)]
+        cells = [results.get_cell(idx, column) for column in CELL_COLUMNS]
+        assert cells[:7] == row[:7]
+        assert cells[7] == ', '.join(row[7:9])  # The measure tuple in a single cell
+        assert cells[8:] == row[9:]
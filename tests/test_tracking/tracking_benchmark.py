@@ -1,47 +1,361 @@
 # -*- coding: utf-8 -*-
 """
-Created on Thu Nov 27 21:08:59 2014
+The benchmark suite of the tracking pipeline.
 
-@author: crousse
+Each benchmark times one stage (stream read, Frame operations, background, silhouette,
+contour selection, results, video writer, the end to end Tracker.track and the ROI
+scoring of a one hour trajectory) on synthetic
+videos at several resolutions. The results can be saved as a JSON baseline and later
+runs compared to it with a relative tolerance.
+
+Run as:
+    python -m tests.test_tracking.tracking_benchmark --save-baseline baseline.json
+    python -m tests.test_tracking.tracking_benchmark --baseline baseline.json --tolerance 0.2
 """
+from __future__ import print_function, division
 
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
 import timeit
+from collections import OrderedDict
+
+import cv2
 import numpy as np
 
+from pyper.analysis.roi_analysis import RoiAnalysis
+from pyper.contours.roi import Circle, FreehandRoi, Rectangle, RoiCollection
+from pyper.tracking.tracking import Tracker
+from pyper.tracking.tracking_background import Background
+from pyper.tracking.tracking_results import TrackingResults
+from pyper.video.cv_wrappers.video_writer import VideoWriter
+from pyper.video.synthetic_video_stream import SyntheticVideoStream
+from pyper.video.video_frame import Frame, PreprocessingPipeline
+from pyper.video.video_stream import RecordedVideoStream
+
+RESOLUTIONS = ((320, 240), (640, 480), (1280, 720), (1920, 1080))
+N_VIDEO_FRAMES = 10
+DEFAULT_TOLERANCE = 0.25  # Maximum relative slow down before a benchmark is considered a regression
+MIN_DELTA = 1e-5  # (s) Slow downs below this are considered as noise
+
+
+class BenchmarkTracker(Tracker):
+    """
+    A Tracker without progress bar (the bar would be timed and would clutter the benchmark output)
+    """
+    def _create_pbar(self):
+        return None
+
+
+class BenchmarkContext(object):
+    """
+    The synthetic data shared by the benchmarks at one resolution
+    """
+    def __init__(self, resolution, folder):
+        """
+        :param tuple resolution: The (width, height) of the frames
+        :param str folder: The folder to write the temporary videos to
+        """
+        self.resolution = resolution
+        self.folder = folder
+        self.cleanups = []  # The functions releasing the resources of the current benchmark
+        width, height = resolution
+        self.bg_img = np.full((height, width, 3), 30, dtype=np.uint8)
+        self.frames = []
+        for i in range(N_VIDEO_FRAMES):
+            img = self.bg_img.copy()
+            if i > 0:  # The first frame is the background
+                centre = (width // 4 + i * width // 40, height // 2)
+                cv2.ellipse(img, centre, (width // 30, height // 40), 30, 0, 360, (220, 220, 220), -1)
+            self.frames.append(img)
+        self.frame = Frame(self.frames[-1].astype(np.float32))
+        self.video_path = os.path.join(folder, 'bench_{}x{}.avi'.format(width, height))
+        writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*'MJPG'), 20, resolution, True)
+        for img in self.frames:
+            writer.write(img)
+        writer.release()
+
+    def add_cleanup(self, func):
+        self.cleanups.append(func)
+
+    def cleanup(self):
+        while self.cleanups:
+            self.cleanups.pop()()
+
+    def get_background(self, n_frames=1):
+        bg = Background(n_sds=5)
+        for img in self.frames[:n_frames]:
+            bg.build(Frame(img.astype(np.float32)))
+        bg.finalise()
+        return bg
+
+    def get_processed_frame(self):
+        return PreprocessingPipeline()(self.frame).copy()
+
+    def get_tracker(self, **kwargs):
+        return BenchmarkTracker(src_file_path=self.video_path, threshold=40, min_area=20,
+                                max_area=self.resolution[0] * self.resolution[1],
+                                teleportation_threshold=10000, bg_start=0, track_from=1, **kwargs)
+
+
+def bench_stream_read(ctx):
+    state = {'stream': RecordedVideoStream(ctx.video_path, 0, 1)}
+
+    def read():
+        try:
+            state['stream'].read()
+        except EOFError:
+            state['stream'] = RecordedVideoStream(ctx.video_path, 0, 1)
+            state['stream'].read()
+    return read
+
+
+def bench_synthetic_stream_read(ctx):
+    stream = SyntheticVideoStream(size=ctx.resolution, n_frames=None, noise_sd=2)
+    return stream.read
+
+
+def bench_frame_gray(ctx):
+    return lambda: ctx.frame.gray()
+
+
+def bench_frame_color(ctx):
+    gray_frame = ctx.frame.gray()
+    return lambda: gray_frame.color()
+
+
+def bench_frame_denoise(ctx):
+    gray_frame = ctx.frame.gray()
+    return lambda: gray_frame.denoise()
+
+
+def bench_frame_blur(ctx):
+    gray_frame = ctx.frame.gray()
+    return lambda: gray_frame.blur()
+
+
+def bench_frame_normalise(ctx):
+    gray_frame = ctx.frame.gray()
+    return lambda: gray_frame.normalise()
+
+
+def bench_frame_threshold(ctx):
+    gray_frame = Frame(ctx.frame.gray().astype(np.uint8))
+    return lambda: gray_frame.threshold(40)
+
+
+def bench_frame_erode(ctx):
+    mask = Frame(ctx.frame.gray().astype(np.uint8)).threshold(40)
+    return lambda: mask.erode()
+
+
+def bench_frame_clear_borders(ctx):
+    mask = Frame(ctx.frame.gray().astype(np.uint8)).threshold(40)
+    return lambda: mask.clear_borders()
+
+
+def bench_preprocessing_pipeline(ctx):
+    pipeline = PreprocessingPipeline()
+    return lambda: pipeline(ctx.frame)
+
+
+def bench_background_build_finalise(ctx):
+    frames = [Frame(img.astype(np.float32)) for img in ctx.frames[:3]]
+
+    def build():
+        bg = Background(n_sds=5)
+        for frame in frames:
+            bg.build(frame)
+        bg.finalise()
+    return build
+
+
+def bench_silhouette_threshold(ctx):
+    bg = ctx.get_background()
+    processed_frame = ctx.get_processed_frame()
+    return lambda: bg.get_silhouette(processed_frame, 40)
+
+
+def bench_silhouette_sd(ctx):
+    bg = ctx.get_background(n_frames=3)
+    processed_frame = ctx.get_processed_frame()
+    return lambda: bg.get_silhouette(processed_frame, 40)
+
+
+def bench_contour_selection(ctx):
+    tracker = ctx.get_tracker()
+    silhouette, _ = ctx.get_background().get_silhouette(ctx.get_processed_frame(), 40)
+    silhouette = silhouette.copy()
+    return lambda: tracker._get_biggest_contour(silhouette)
+
+
+def bench_results_append(ctx):
+    results = TrackingResults()
+
+    def append():
+        results.append_defaults()
+        results.update((10., 20.), 100., float('NaN'), (None, None))
+    return append
+
+
+def bench_video_writer_save(ctx):
+    path = os.path.join(ctx.folder, 'bench_writer.avi')
+    writer = VideoWriter(path, 'MJPG', 20, ctx.resolution, is_color=True)
+    ctx.add_cleanup(writer.release)
+    img = ctx.frames[-1]
+    return lambda: writer.save_frame(img)
+
+
+def bench_tracker_track(ctx):
+    return lambda: ctx.get_tracker().track()
+
+
+def bench_roi_analysis(ctx):
+    width, height = ctx.resolution
+    t = np.arange(30 * 3600) / 30.  # One hour at 30 fps
+    positions = np.column_stack((width / 2 * (1 + 0.6 * np.cos(t / 5.)), height / 2 * (1 + 0.8 * np.sin(t / 7.))))
+    rois = RoiCollection([Circle((width // 2, height // 2), height // 10),
+                          Rectangle(0, 0, width // 3, height // 3),
+                          FreehandRoi([(width * 5 // 8, height * 5 // 8), (width * 15 // 16, height * 5 // 8),
+                                       (width * 25 // 32, height * 15 // 16)])])
+    return lambda: RoiAnalysis(positions, rois, fps=30, shape=(height, width)).get_summary()
+
+
+BENCHMARKS = OrderedDict((func.__name__[len('bench_'):], func) for func in (
+    bench_stream_read,
+    bench_synthetic_stream_read,
+    bench_frame_gray,
+    bench_frame_color,
+    bench_frame_denoise,
+    bench_frame_blur,
+    bench_frame_normalise,
+    bench_frame_threshold,
+    bench_frame_erode,
+    bench_frame_clear_borders,
+    bench_preprocessing_pipeline,
+    bench_background_build_finalise,
+    bench_silhouette_threshold,
+    bench_silhouette_sd,
+    bench_contour_selection,
+    bench_results_append,
+    bench_video_writer_save,
+    bench_tracker_track,
+    bench_roi_analysis
+))
+SLOW_BENCHMARKS = ('tracker_track', 'background_build_finalise')  # Run with fewer iterations
+
+
+def get_key(name, resolution):
+    return '{}@{}x{}'.format(name, *resolution)
+
+
+def time_func(func, n_iter, repeat):
+    """
+    :return: The best time (s) per call over repeat runs of n_iter calls
+    """
+    func()  # warm up (e.g. buffers allocation)
+    return min(timeit.repeat(func, number=n_iter, repeat=repeat)) / n_iter
+
+
+def run_benchmarks(resolutions=RESOLUTIONS, names=None, n_iter=20, repeat=3, verbose=False):
+    """
+    Runs the benchmarks at each resolution
+
+    :param tuple resolutions: The (width, height) of the frames to benchmark
+    :param list names: The names of the benchmarks to run (all if None)
+    :param int n_iter: The number of calls per timing (divided by 10 for the slow benchmarks)
+    :param int repeat: The number of timings (the best is kept)
+    :param bool verbose: Whether to print each result
+    :return: A dictionary of benchmark key: time per call (s)
+    """
+    names = list(BENCHMARKS) if names is None else names
+    folder = tempfile.mkdtemp()
+    results = OrderedDict()
+    try:
+        for resolution in resolutions:
+            ctx = BenchmarkContext(resolution, folder)
+            for name in names:
+                n_calls = max(1, n_iter // 10) if name in SLOW_BENCHMARKS else n_iter
+                key = get_key(name, resolution)
+                try:
+                    func = BENCHMARKS[name](ctx)
+                    results[key] = time_func(func, n_calls, repeat)
+                finally:
+                    ctx.cleanup()
+                if verbose:
+                    print('{:45s} {:10.4f} ms'.format(key, results[key] * 1000))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+
+def get_metadata():
+    return {'python': platform.python_version(), 'opencv': cv2.__version__,
+            'numpy': np.__version__, 'platform': platform.platform(), 'machine': platform.machine()}
+
+
+def save_baseline(results, path):
+    with open(path, 'w') as out_file:
+        json.dump({'metadata': get_metadata(), 'results': results}, out_file, indent=2)
+
+
+def load_baseline(path):
+    with open(path) as in_file:
+        return json.load(in_file)['results']
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE, min_delta=MIN_DELTA):
+    """
+    Compares results to baseline
+
+    :param dict results: The current results (benchmark key: time)
+    :param dict baseline: The reference results (benchmark key: time)
+    :param float tolerance: The maximum relative slow down (e.g. 0.25 for 25%)
+    :param float min_delta: The minimum absolute slow down (s) to report
+    :return: A list of (key, baseline_time, current_time) for the benchmarks that regressed
+    """
+    regressions = []
+    for key, current_time in results.items():
+        if key not in baseline:
+            continue
+        reference_time = baseline[key]
+        if current_time > reference_time * (1 + tolerance) and current_time - reference_time > min_delta:
+            regressions.append((key, reference_time, current_time))
+    return regressions
+
+
+def parse_resolution(resolution_str):
+    width, height = resolution_str.lower().split('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the tracking pipeline')
+    parser.add_argument('--resolutions', nargs='+', type=parse_resolution,
+                        default=RESOLUTIONS, help='e.g. 640x480 1920x1080')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), help='Only run these benchmarks')
+    parser.add_argument('--n-iter', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save-baseline', help='The JSON file to save the results to')
+    parser.add_argument('--baseline', help='The JSON file to compare the results to')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='The maximum relative slow down (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.resolutions, args.benchmarks, args.n_iter, args.repeat, verbose=True)
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+    if args.baseline:
+        regressions = find_regressions(results, load_baseline(args.baseline), args.tolerance)
+        for key, reference_time, current_time in regressions:
+            print('REGRESSION {}: {:.4f} ms -> {:.4f} ms'.format(key, reference_time * 1000, current_time * 1000))
+        return 1 if regressions else 0
+    return 0
+
 
-class Bench(object):
-    def __init__(self):
-        self.baseSetup = 'import cv2; import numpy as np; data = np.random.rand(640, 480)'
-        
-    def blur(self, iterN=100):
-        numpySetup = self.baseSetup + '; from scipy import ndimage'
-        numpyCmd = 'test=ndimage.gaussian_filter(data, truncate=2, sigma=2)'
-        print timeit.timeit(setup=numpySetup, stmt=numpyCmd, number=iterN)/iterN
-        
-        cv2Setup = self.baseSetup + '; import cv2'
-        cv2Cmd = 'test=cv2.GaussianBlur(data, (15, 15), 2)'
-        print timeit.timeit(setup=cv2Setup, stmt=cv2Cmd, number=iterN)
-        
-    def diff(self, iterN=100):
-        baseSetup = self.baseSetup +  '; bcg=np.random.rand(640, 480)'
-        cv2Cmd = 'test=cv2.absdiff(bcg, data)'
-        numpyCmd = 'test=data - bcg'
-    
-        print timeit.timeit(setup=baseSetup, stmt=numpyCmd, number=iterN)/iterN
-        print timeit.timeit(setup=baseSetup, stmt=cv2Cmd, number=iterN)/iterN
-
-
-class Frame(np.ndarray):
-
-    def __new__(cls, input_array, info=None):
-        # Input array is an already formed ndarray instance
-        # We first cast to be our class type
-        obj = np.asarray(input_array).view(cls)
-        # add the new attribute to the created instance
-        obj.info = info
-        return obj
-
-    def __array_finalize__(self, obj):
-        # see InfoArray.__array_finalize__ for comments
-        if obj is None: return
-        self.info = getattr(obj, 'info', None)
\ No newline at end of file
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the pre-processing chain of Frame methods (gray().denoise().blur())
+with the compiled PreprocessingPipeline (full frame and stripes)
+
+Run as: python -m tests.test_video.preprocessing_benchmark
+"""
+from __future__ import print_function
+
+import timeit
+
+import cv2
+import numpy as np
+
+from pyper.video.video_frame import Frame, PreprocessingPipeline
+
+
+class Bench(object):
+    def __init__(self, shape=(480, 640, 3)):
+        self.frame = Frame(np.random.randint(0, 256, shape).astype(np.uint8))
+
+    def time(self, func, n_iter=200):
+        func()  # warm up (e.g. buffers allocation)
+        return timeit.timeit(func, number=n_iter) / n_iter
+
+    def legacy_chain(self, n_iter=200):
+        """The chain before the Gaussian kernel was sized from sigma (fixed 15x15 kernel, one copy per step)"""
+        def process():
+            gray = Frame(cv2.cvtColor(self.frame.copy(), cv2.COLOR_BGR2GRAY))
+            denoised = Frame(cv2.medianBlur(gray.copy(), 3))
+            return Frame(cv2.GaussianBlur(denoised.copy(), (15, 15), 1.5))
+        return self.time(process, n_iter)
+
+    def chain(self, n_iter=200):
+        return self.time(lambda: self.frame.gray().denoise().blur(), n_iter)
+
+    def pipeline(self, n_stripes=1, n_iter=200):
+        pipeline = PreprocessingPipeline(n_stripes=n_stripes)
+        duration = self.time(lambda: pipeline(self.frame), n_iter)
+        pipeline.close()
+        return duration
+
+    def run(self, n_iter=200):
+        chain_duration = self.legacy_chain(n_iter)
+        print('Legacy Frame methods chain: {:.3f} ms'.format(chain_duration * 1000))
+        print('Frame methods chain: {:.3f} ms'.format(self.chain(n_iter) * 1000))
+        for n_stripes in (1, 2, 4):
+            duration = self.pipeline(n_stripes, n_iter)
+            print('Pipeline, {} stripe(s): {:.3f} ms (x{:.2f})'
+                  .format(n_stripes, duration * 1000, chain_duration / duration))
+
+
+if __name__ == '__main__':
+    for shape in ((480, 640, 3), (1080, 1920, 3)):
+        print('Frame shape: {}'.format(shape))
+        Bench(shape).run()
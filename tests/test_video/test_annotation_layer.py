@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+
+from pyper.utilities.utils import write_structure_not_found_msg
+from pyper.video.annotation_layer import AnnotationLayer, TrajectoryOverlay
+
+
+def test_render_matches_direct_drawing():
+    contour = np.array([[[10, 10]], [[50, 10]], [[50, 40]], [[10, 40]]], dtype=np.int32)
+    expected = np.zeros((120, 160, 3), dtype=np.uint8)
+    cv2.drawContours(expected, [contour], 0, (0, 0, 255), 1)
+    write_structure_not_found_msg(expected, expected.shape[:2], 7)
+
+    annotations = AnnotationLayer()
+    annotations.add_contour(contour, 'r')
+    annotations.add_structure_not_found_msg((120, 160), 7)
+    img = np.zeros((120, 160, 3), dtype=np.uint8)
+    assert annotations.flush(img) is img
+    assert (img == expected).all()
+    assert len(annotations) == 0
+
+
+def test_nothing_drawn_until_rendered():
+    annotations = AnnotationLayer()
+    annotations.add_circle((20.4, 30.6), 3, 'g')
+    annotations.add_rectangle((0, 0), (5, 5))
+    annotations.add_polyline(np.int32([[(0, 0), (10, 10), (20, 5)]]))
+    img = np.zeros((50, 50, 3), dtype=np.uint8)
+    assert len(annotations) == 3
+    assert not img.any()
+    annotations.render(img)
+    assert img[31, 20, 1] == 255
+    assert len(annotations) == 3
+
+
+def test_incremental_trajectory_matches_full_polyline():
+    positions = [(10, 10), (-1, -1), (30, 15), (40, 40), (20, 35), (25, 12)]
+    expected = np.zeros((50, 60, 3), dtype=np.uint8)
+    cv2.polylines(expected, np.int32([[p for p in positions if p != (-1, -1)]]), False, (0, 255, 0))
+
+    overlay = TrajectoryOverlay()
+    for i in range(1, len(positions) + 1):  # One update per frame
+        overlay.update(positions[:i], (50, 60))
+    img = np.zeros((50, 60, 3), dtype=np.uint8)
+    overlay.composite(img)
+    assert (img == expected).all()
+
+    overlay.update(positions[:2], (50, 60))  # New session
+    img[:] = 0
+    assert not overlay.composite(img).any()
+
+
+def test_trajectory_tail():
+    positions = [(5 * i, 5 * i) for i in range(1, 9)]
+    overlay = TrajectoryOverlay(tail_length=3)
+    overlay.update(positions, (50, 50))
+    img = overlay.composite(np.zeros((50, 50, 3), dtype=np.uint8))
+    assert img[5:30, 5:30].sum() == 0
+    assert img[30:41, 30:41].any()
+
+
+def test_flush_shapes_keeps_text():
+    annotations = AnnotationLayer()
+    annotations.add_circle((20, 30), 3, 'g')
+    annotations.add_structure_not_found_msg((120, 160), 7)
+    n_texts = len(annotations) - 1
+    img = np.zeros((120, 160, 3), dtype=np.uint8)
+    annotations.flush_shapes(img)
+    assert img[30, 20, 1] == 255
+    assert img[:, :, 0].sum() == 0  # No text (cyan) drawn yet
+    assert len(annotations) == n_texts
+    annotations.flush(img)
+    assert img[:, :, 0].any()
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.video.recording_policy import ContinuousRecording, DecimatedRecording, EventRecording, \
+    create_recording_policy
+
+
+def submit_all(policy, triggers):
+    recorded = []
+    for i, triggered in enumerate(triggers):
+        recorded.extend(int(frame[0]) for frame in policy.submit(np.array([i]), triggered))
+    return recorded
+
+
+def test_continuous_recording_writes_all_frames():
+    assert submit_all(ContinuousRecording(), [False] * 5) == [0, 1, 2, 3, 4]
+
+
+def test_decimated_recording_writes_one_frame_in_period():
+    policy = DecimatedRecording(3)
+    assert submit_all(policy, [False] * 7) == [0, 3, 6]
+    assert (policy.n_submitted, policy.n_recorded) == (7, 3)
+
+
+def test_event_recording_writes_pre_and_post_trigger_frames():
+    triggers = [False] * 20
+    triggers[5] = triggers[14] = True
+    policy = EventRecording(pre_trigger=2, post_trigger=3)
+    assert submit_all(policy, triggers) == [3, 4, 5, 6, 7, 8, 12, 13, 14, 15, 16, 17]
+    assert policy.n_events == 2
+
+
+def test_event_recording_extends_on_retrigger():
+    triggers = [False] * 12
+    triggers[3] = triggers[5] = True
+    assert submit_all(EventRecording(pre_trigger=1, post_trigger=2), triggers) == [2, 3, 4, 5, 6, 7]
+
+
+def test_event_recording_buffers_copies():
+    frame = np.zeros(1)
+    policy = EventRecording(pre_trigger=1, post_trigger=0)
+    policy.submit(frame)
+    frame[0] = 1  # The buffer of the caller is reused
+    assert [f[0] for f in policy.submit(frame, True)] == [0, 1]
+
+
+def test_event_recording_buffers_frame_tuples():
+    frame = np.zeros(1)
+    policy = EventRecording(pre_trigger=1, post_trigger=0)
+    policy.submit((frame, None, (0, 0.)))
+    frame[0] = 1
+    (first, raw, info), _ = policy.submit((frame, None, (1, 0.05)), True)
+    assert first[0] == 0 and raw is None and info == (0, 0.)
+
+
+def test_create_recording_policy():
+    policy = create_recording_policy('events', fps=10, pre_trigger=0.5, post_trigger=2)
+    assert (policy.pre_trigger, policy.post_trigger) == (5, 20)
+    with pytest.raises(PyperValueError):
+        create_recording_policy('sometimes')
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from pyper.exceptions.exceptions import PyperValueError
+from pyper.video.video_frame import Frame, PreprocessingPipeline, gaussian_kernel_size
+
+
+def make_frame(shape=(120, 160, 3), seed=0):
+    return Frame(np.random.RandomState(seed).randint(0, 256, shape).astype(np.uint8))
+
+
+def test_gaussian_kernel_size():
+    assert gaussian_kernel_size(1.5) == 11
+    assert gaussian_kernel_size(1) == 7
+    assert gaussian_kernel_size(0.2) % 2 == 1
+
+
+def test_pipeline_matches_frame_methods():
+    frame = make_frame()
+    expected = frame.gray().denoise().blur()
+    result = PreprocessingPipeline(('gray', 'denoise', 'blur'))(frame)
+    assert isinstance(result, Frame)
+    assert (result == expected).all()
+
+
+@pytest.mark.parametrize('n_stripes', [2, 3, 7])
+def test_stripes_match_full_frame(n_stripes):
+    frame = make_frame()
+    expected = PreprocessingPipeline()(frame).copy()
+    pipeline = PreprocessingPipeline(n_stripes=n_stripes)
+    assert (pipeline(frame) == expected).all()
+    pipeline.close()
+
+
+def test_buffers_reused_and_recompiled_on_shape_change():
+    pipeline = PreprocessingPipeline()
+    first = pipeline(make_frame(seed=1))
+    second = pipeline(make_frame(seed=2))
+    assert first is second
+    assert pipeline(make_frame((60, 80, 3))).shape == (60, 80)
+
+
+def test_invalid_step():
+    with pytest.raises(PyperValueError):
+        PreprocessingPipeline(('gray', 'sharpen'))
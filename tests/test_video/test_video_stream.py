@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+import pytest
+
+from pyper.tracking.tracking import Tracker
+from pyper.video.synthetic_video_stream import SyntheticBlob, SyntheticVideoStream
+
+
+def test_synthetic_frames_are_deterministic():
+    first_stream = SyntheticVideoStream(size=(160, 120), n_frames=5, noise_sd=3, seed=4)
+    second_stream = SyntheticVideoStream(size=(160, 120), n_frames=5, noise_sd=3, seed=4)
+    second_stream.skip()
+    second_stream.skip()
+    frames = [first_stream.read() for _ in range(3)]
+    assert frames[0].shape == (120, 160, 3)
+    assert (frames[2] == second_stream.read()).all()
+    assert not (frames[1] == frames[2]).all()
+
+
+def test_synthetic_stream_end():
+    stream = SyntheticVideoStream(size=(64, 48), n_frames=2, blobs=[SyntheticBlob((20, 20), (1, 1), (5, 5))])
+    stream.read()
+    stream.read()
+    with pytest.raises(EOFError):
+        stream.read()
+
+
+def test_ground_truth_bounces_inside_frame():
+    blob = SyntheticBlob((20, 20), (7, -3), radii=(10, 5))
+    stream = SyntheticVideoStream(size=(100, 80), n_frames=200, blobs=[blob])
+    ground_truth = stream.get_ground_truth()
+    assert ground_truth.shape == (200, 1, 2)
+    assert (ground_truth[:, 0, 0] >= 10).all() and (ground_truth[:, 0, 0] <= 90).all()
+    assert (ground_truth[:, 0, 1] >= 10).all() and (ground_truth[:, 0, 1] <= 70).all()
+    assert np.allclose(ground_truth[1, 0], (27, 17))
+
+
+def test_tracker_accuracy_on_synthetic_stream():
+    stream = SyntheticVideoStream(size=(320, 240), n_frames=40, noise_sd=3, illumination_drift=5)
+    tracker = Tracker(stream=stream, threshold=30, min_area=50, teleportation_threshold=10000)
+    positions = np.array(tracker.track()[1:])
+    assert np.abs(positions - stream.get_ground_truth()[1:, 0]).max() < 0.5
+
+
+def test_live_emulation_drops_late_frames():
+    stream = SyntheticVideoStream(size=(160, 120), n_frames=30, fps=200, live=True, jitter=0.001)
+    tracker = Tracker(stream=stream, threshold=30, min_area=20, teleportation_threshold=10000,
+                      scheduling_policy='latest')
+    tracker.after_frame_track = lambda: time.sleep(0.02)  # Processing slower than the camera
+    start = time.time()
+    tracker.track()
+    assert time.time() - start < 30 / 200 + 0.3
+    assert len(tracker.results) == 30
+    assert tracker.results.get_n_dropped() > 10